@@ -5,33 +5,230 @@ This module provides the application factory pattern for creating Flask app inst
 Routes are organized in separate blueprint modules in the routes package.
 """
 
+import os
+from typing import Dict, Optional
+
+import click
 from flask import Flask
-from database import init_database, add_sample_data
+from flask.json.provider import DefaultJSONProvider
+from jinja2 import FileSystemBytecodeCache
+import database
+from database import (
+    Record,
+    add_sample_data,
+    archive_returned_records,
+    compact_events,
+    configure_pools,
+    configure_shards,
+    drain_loan_outbox,
+    ensure_schema,
+    reshard,
+    scan_new_overdues,
+    start_write_scheduler,
+    verify_shard_layout
+)
 from routes import register_blueprints
 
 
-def create_app():
+class LibraryJSONProvider(DefaultJSONProvider):
+    """Serializes row records from the database module, which stay records until here."""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Record):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+
+
+def create_app(config: Optional[Dict] = None):
     """
     Application factory function to create and configure Flask app.
     
+    Args:
+        config: Optional configuration overrides, applied on top of the defaults
+            and of LIBRARY_* environment variables (e.g. LIBRARY_FAST_START=true)
+    
     Returns:
         Flask: Configured Flask application instance
     """
     app = Flask(__name__)
+    app.json = LibraryJSONProvider(app)
     app.secret_key = "super secret key"
+    app.config.from_mapping(
+        DATABASE=None,  # None: keep database.DATABASE
+        FAST_START=False,
+        SEED_SAMPLE_DATA=None,  # None: seed unless FAST_START
+        TEMPLATE_CACHE_DIR=None,  # None: <instance>/jinja_cache when FAST_START
+        METRICS_ENABLED=True,
+        METRICS_MULTIPROCESS_DIR=None,  # shared directory for summing /metrics over pre-fork workers
+        SLOW_QUERY_THRESHOLD_MS=None,
+        READ_POOL_SIZE=8,
+        WRITE_POOL_SIZE=2,
+        SHARD_COUNT=1,
+        WRITE_SCHEDULER_ENABLED=False,
+        WRITE_BATCH_SIZE=64,
+        WRITE_BATCH_WINDOW_MS=2,
+        CATALOG_SNAPSHOT_ENABLED=False,
+        SEARCH_INDEX_ENABLED=False,  # trigram search index; implies the catalog snapshot
+        SEARCH_INDEX_PATH=None,  # on-disk trigram index for warm starts
+        FUZZY_SEARCH_ENABLED=False,  # typo-tolerant `fuzzy` search type; implies the catalog snapshot
+        SUGGEST_ENABLED=False,  # /api/suggest prefix completions; implies the catalog snapshot
+        FRAGMENT_CACHE_SIZE=0,  # rendered catalog rows kept; 0 disables fragment caching
+        STREAM_TEMPLATES=False,  # stream catalog and search pages from a database cursor
+        COMPRESSION_ENABLED=False,  # gzip (or brotli, if installed) for text responses
+        COMPRESSION_MIN_SIZE=1024,
+        COMPRESSION_GZIP_LEVEL=6,
+        COMPRESSION_BROTLI_QUALITY=4,
+        COMPRESSION_CACHE_BYTES=32 * 1024 * 1024,  # compressed bodies kept for repeat responses
+        OVERDUE_SCAN_INTERVAL_SECONDS=0,  # record newly overdue loans on this schedule; 0 disables
+        AVAILABILITY_STREAM_ENABLED=False,  # /api/stream/availability Server-Sent Events
+        AVAILABILITY_STREAM_HEARTBEAT_SECONDS=15,
+        AVAILABILITY_STREAM_MAX_PENDING=1000,  # books buffered per client before it must reconnect
+        AVAILABILITY_STREAM_MAX_CLIENTS=2,  # open streams per worker process; each holds a request thread
+    )
+    app.config.from_prefixed_env('LIBRARY')
+    if config:
+        app.config.update(config)
+    if app.config['DATABASE']:
+        database.DATABASE = app.config['DATABASE']
+    
+    # Serve precompiled template bytecode instead of re-parsing templates
+    _configure_template_cache(app)
+    
+    # Separate read-only and read-write connection pools
+    configure_pools(app.config['READ_POOL_SIZE'], app.config['WRITE_POOL_SIZE'])
     
-    # Initialize the database
-    init_database()
+    # Partition borrow_records by patron across SHARD_COUNT files
+    configure_shards(app.config['SHARD_COUNT'])
+    
+    # Initialize the database (constant-time check when the schema is current)
+    ensure_schema()
+    verify_shard_layout()
+    # Loan events a shard queued but did not get into the change feed
+    drain_loan_outbox()
     
     # Add sample data for testing and demonstration
-    add_sample_data()
+    seed = app.config['SEED_SAMPLE_DATA']
+    if seed is None:
+        seed = not app.config['FAST_START']
+    if seed:
+        add_sample_data()
+    
+    # Batch borrow/return/add-book writes into group commits on a single writer
+    if app.config['WRITE_SCHEDULER_ENABLED']:
+        start_write_scheduler(app.config['WRITE_BATCH_SIZE'], app.config['WRITE_BATCH_WINDOW_MS'] / 1000)
+    
+    # Record loans that became overdue since the last scan in overdue_events
+    if app.config['OVERDUE_SCAN_INTERVAL_SECONDS']:
+        from services import overdue_service
+        overdue_service.start(float(app.config['OVERDUE_SCAN_INTERVAL_SECONDS']))
+    
+    # Serve catalog, availability and search reads from an in-process snapshot
+    search_index = app.config['SEARCH_INDEX_ENABLED'] or app.config['SEARCH_INDEX_PATH'] is not None
+    fuzzy_index = app.config['FUZZY_SEARCH_ENABLED']
+    suggest = app.config['SUGGEST_ENABLED']
+    if app.config['CATALOG_SNAPSHOT_ENABLED'] or search_index or fuzzy_index or suggest:
+        from services import catalog_service
+        catalog_service.enable(search_index, app.config['SEARCH_INDEX_PATH'], fuzzy_index, suggest)
+    
+    # Record per-request latency, SQL statement counts and SQLite time
+    if app.config['METRICS_ENABLED']:
+        from services import metrics_service
+        metrics_service.init_app(app, app.config['METRICS_MULTIPROCESS_DIR'])
+    
+    # Log statements slower than the threshold with their query plans
+    if app.config['SLOW_QUERY_THRESHOLD_MS'] is not None:
+        from services import slow_query_service
+        slow_query_service.enable(float(app.config['SLOW_QUERY_THRESHOLD_MS']))
+    
+    # Compress HTML/JSON responses, reusing the bytes of repeated ones
+    if app.config['COMPRESSION_ENABLED']:
+        from services import compression_service
+        compression_service.init_app(app)
+    
+    # Assemble catalog pages from cached per-book row fragments
+    if app.config['FRAGMENT_CACHE_SIZE']:
+        from services import fragment_cache
+        fragment_cache.init_app(app, int(app.config['FRAGMENT_CACHE_SIZE']))
     
     # Register all route blueprints
     register_blueprints(app)
     
+    _register_commands(app)
+    
     return app
 
 
+def _configure_template_cache(app: Flask) -> None:
+    cache_dir = app.config['TEMPLATE_CACHE_DIR']
+    if cache_dir is None and app.config['FAST_START']:
+        cache_dir = os.path.join(app.instance_path, 'jinja_cache')
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_options = dict(app.jinja_options, bytecode_cache=FileSystemBytecodeCache(cache_dir))
+
+
+def precompile_templates(app: Flask) -> int:
+    """Compile every template once so its bytecode is in the template cache."""
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def _register_commands(app: Flask) -> None:
+    @app.cli.command('precompile-templates')
+    def precompile_templates_command():
+        """Populate the Jinja bytecode cache used by FAST_START."""
+        print(f"Compiled {precompile_templates(app)} template(s).")
+
+    @app.cli.command('reshard')
+    @click.argument('shard_count', type=int)
+    def reshard_command(shard_count):
+        """Redistribute borrow records across SHARD_COUNT files (stop the app first)."""
+        result = reshard(shard_count)
+        print(f"Moved {result['moved']} borrow record(s); now using {result['shards']} shard(s). "
+              f"Set SHARD_COUNT={result['shards']} before restarting.")
+
+    @app.cli.command('archive-loans')
+    @click.option('--days', default=365, show_default=True, help='Archive loans returned more than this many days ago.')
+    @click.option('--batch-size', default=500, show_default=True, help='Records moved per transaction.')
+    def archive_loans_command(days, batch_size):
+        """Move old returned loans out of the hot borrow_records table."""
+        print(f"Archived {archive_returned_records(days, batch_size)} borrow record(s).")
+
+    @app.cli.command('scan-overdue')
+    def scan_overdue_command():
+        """Record loans that became overdue since the previous scan and pass on uncollected holds."""
+        from services.library_service import expire_uncollected_holds
+        print(f"Recorded {scan_new_overdues()} new overdue loan(s).")
+        print(f"Expired {expire_uncollected_holds()} uncollected hold(s).")
+
+    @app.cli.command('compact-events')
+    @click.option('--keep', default=10000, show_default=True, help='Newest events always kept in full.')
+    def compact_events_command(keep):
+        """Drop change-feed events superseded by a later change to the same book or loan."""
+        print(f"Removed {compact_events(keep)} superseded event(s).")
+
+    @app.cli.command('build-search-index')
+    @click.argument('path', required=False)
+    def build_search_index_command(path):
+        """Write the trigram search index to PATH (default: SEARCH_INDEX_PATH) for warm starts."""
+        from services.catalog_service import CatalogSnapshot
+        path = path or app.config['SEARCH_INDEX_PATH']
+        if not path:
+            raise click.UsageError('Pass PATH or set SEARCH_INDEX_PATH.')
+        snapshot = CatalogSnapshot(search_index=True)
+        snapshot.save_search_index(path)
+        print(f"Indexed {len(snapshot)} book(s) into {path}.")
+
+    @app.cli.command('seed-sample-data')
+    def seed_sample_data_command():
+        """Add the sample books if the catalog is empty."""
+        add_sample_data()
+        print("Sample data ensured.")
+
+
 if __name__ == '__main__':
     app = create_app()
     app.run(debug=True, host='0.0.0.0', port=5000)
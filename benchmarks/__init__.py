@@ -0,0 +1 @@
+"""Load and performance benchmarks for the Library Management System."""
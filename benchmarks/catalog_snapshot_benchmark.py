@@ -0,0 +1,84 @@
+"""
+Catalog read benchmark: dict-per-row SQL reads against the in-process snapshot.
+
+Times the full catalog listing and title/author substring searches through
+SQL, the snapshot scan and the snapshot's trigram index, records the peak
+memory each call allocates, and reports the resident size of the snapshot
+next to the dict-per-row list the SQL path builds. Also times a cold index
+build against a warm start from the saved index file.
+
+Usage:
+    python -m benchmarks.catalog_snapshot_benchmark --books 50000 --runs 20
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import database
+from benchmarks.startup_benchmark import build_catalog
+from services import catalog_service, library_service
+
+
+def measure(call, runs: int) -> dict:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'median_ms': statistics.median(timings) * 1000, 'peak_kib': peak / 1024}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Compare SQL and snapshot catalog reads.')
+    parser.add_argument('--books', type=int, default=50_000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    original = database.DATABASE
+    with tempfile.TemporaryDirectory(prefix='library_snapshot_') as workdir:
+        build_catalog(os.path.join(workdir, 'library.db'), args.books)
+        database.DATABASE = os.path.join(workdir, 'library.db')
+        try:
+            calls = {
+                'catalog': library_service.get_catalog_books,
+                'title': lambda: library_service.search_books_in_catalog('title 12345', 'title'),
+                'author': lambda: library_service.search_books_in_catalog('thor 4321', 'author'),
+            }
+            results = {('sql', name): measure(call, args.runs) for name, call in calls.items()}
+            load_ms = {}
+            started = time.perf_counter()
+            catalog_service.enable()
+            load_ms['snapshot'] = (time.perf_counter() - started) * 1000
+            results.update({('snapshot', name): measure(call, args.runs) for name, call in calls.items()})
+            index_path = os.path.join(workdir, 'search.idx')
+            for start in ('cold', 'warm'):
+                started = time.perf_counter()
+                snapshot = catalog_service.enable(index_path=index_path)
+                load_ms[f'indexed ({start})'] = (time.perf_counter() - started) * 1000
+            results.update({('indexed', name): measure(call, args.runs) for name, call in calls.items() if name != 'catalog'})
+            footprint = snapshot.memory_footprint()
+        finally:
+            catalog_service.disable()
+            database.close_pools()
+            database.DATABASE = original
+
+    print(f"{args.books} books, median of {args.runs} runs")
+    print('load: ' + ', '.join(f"{name} {elapsed:.0f} ms" for name, elapsed in load_ms.items()))
+    print(f"{'path':<10} {'read':<8} {'median_ms':>10} {'peak_kib':>10}")
+    for (path, name), result in results.items():
+        print(f"{path:<10} {name:<8} {result['median_ms']:>10.2f} {result['peak_kib']:>10.1f}")
+    print(f"resident: snapshot {footprint['snapshot_bytes'] / 1024:.1f} KiB, "
+          f"dict rows {footprint['dict_rows_bytes'] / 1024:.1f} KiB ({footprint['ratio']}x), "
+          f"trigram index {footprint['search_index_bytes'] / 1024:.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
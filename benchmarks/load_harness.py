@@ -0,0 +1,407 @@
+"""
+Concurrent load-testing harness for the Library Management System.
+
+Drives the app returned by create_app() with many threads (optionally spread
+over several processes) running a weighted mix of borrow, return, search,
+patron status and catalog requests, then reports throughput, latency percentiles
+and the rate of "database is locked" errors taken from /metrics.
+
+Runs fully in-process against a throwaway SQLite file by default; pass --url
+to drive an already running server instead.
+
+Usage:
+    python -m benchmarks.load_harness --threads 16 --duration 10
+    python -m benchmarks.load_harness --processes 4 --threads 8 --mix search=8,catalog=2
+    python -m benchmarks.load_harness --url http://127.0.0.1:8000 --threads 32
+    python -m benchmarks.load_harness --config WRITE_SCHEDULER_ENABLED=true --mix borrow=1,return=1
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from services.metrics_service import EXPORT_INTERVAL as METRICS_EXPORT_INTERVAL  # noqa: E402
+
+DEFAULT_MIX = {'borrow': 2, 'return': 2, 'search': 4, 'status': 1, 'catalog': 1}
+SEARCH_WORDS = ('the', 'book', 'history', 'vol', 'art', 'of', 'guide', 'zzz')
+_ERRORS_RE = re.compile(r'^library_sql_errors_total\{kind="(\w+)"\} ([0-9.e+-]+)$', re.MULTILINE)
+
+
+@dataclass
+class LoadConfig:
+    threads: int = 8
+    processes: int = 1
+    duration: float = 5.0
+    requests: Optional[int] = None  # per thread; overrides duration when set
+    mix: Dict[str, int] = field(default_factory=lambda: dict(DEFAULT_MIX))
+    books: int = 200
+    url: Optional[str] = None
+    database_path: Optional[str] = None
+    app_config: Dict = field(default_factory=dict)
+    seed: int = 0
+
+
+@dataclass
+class LoadResult:
+    elapsed: float = 0.0
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+    failures: Dict[str, int] = field(default_factory=dict)  # server errors (5xx) and exceptions
+    rejections: Dict[str, int] = field(default_factory=dict)  # business failures (4xx), e.g. borrow limit
+    sql_errors: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def total_requests(self) -> int:
+        return sum(len(values) for values in self.latencies.values())
+
+    @property
+    def throughput(self) -> float:
+        return self.total_requests / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def locked_errors(self) -> float:
+        return self.sql_errors.get('locked', 0) + self.sql_errors.get('busy', 0)
+
+    def merge(self, other: 'LoadResult') -> None:
+        self.elapsed = max(self.elapsed, other.elapsed)
+        for scenario, values in other.latencies.items():
+            self.latencies.setdefault(scenario, []).extend(values)
+        for scenario, count in other.failures.items():
+            self.failures[scenario] = self.failures.get(scenario, 0) + count
+        for scenario, count in other.rejections.items():
+            self.rejections[scenario] = self.rejections.get(scenario, 0) + count
+        for kind, count in other.sql_errors.items():
+            self.sql_errors[kind] = self.sql_errors.get(kind, 0) + count
+
+    def summary(self) -> Dict:
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        total = self.total_requests
+        return {
+            'requests': total,
+            'elapsed_s': round(self.elapsed, 3),
+            'throughput_rps': round(self.throughput, 1),
+            'latency_ms': _percentiles(all_latencies),
+            'scenarios': {
+                scenario: dict(_percentiles(values), requests=len(values), failures=self.failures.get(scenario, 0),
+                               rejected=self.rejections.get(scenario, 0))
+                for scenario, values in sorted(self.latencies.items())
+            },
+            'failed_requests': sum(self.failures.values()),
+            'rejected_requests': sum(self.rejections.values()),
+            'database_locked_errors': int(self.locked_errors),
+            'database_locked_rate': round(self.locked_errors / total, 6) if total else 0.0,
+        }
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'max': 0.0}
+    ordered = sorted(values)
+
+    def pick(fraction: float) -> float:
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return round(ordered[index] * 1000, 3)
+
+    return {'p50': pick(0.50), 'p90': pick(0.90), 'p99': pick(0.99), 'max': round(ordered[-1] * 1000, 3)}
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = int(weight or 1)
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        raise ValueError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+    return mix
+
+
+def parse_config_override(text: str) -> Tuple[str, object]:
+    key, _, value = text.partition('=')
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def seed_catalog(book_count: int) -> None:
+    """Fill the current database with book_count titles with plenty of copies."""
+    database.init_database()
+    conn = database.get_db_connection()
+    conn.executemany(
+        '''
+        INSERT OR IGNORE INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, ?, ?, ?, ?)
+        ''',
+        [
+            (f"{random.choice(SEARCH_WORDS).title()} Book of History Vol {i}", f"Author {i % 97}", f"{9790000000000 + i}", 1000, 1000)
+            for i in range(book_count)
+        ]
+    )
+    conn.commit()
+    conn.close()
+
+
+class _InProcessClient:
+    """Flask test client wrapper with the same interface as _HttpClient."""
+
+    def __init__(self, app) -> None:
+        self._client = app.test_client()
+
+    def get(self, path: str) -> Tuple[int, str]:
+        response = self._client.get(path)
+        return response.status_code, response.get_data(as_text=True)
+
+    def post(self, path: str, data: Dict) -> Tuple[int, str]:
+        response = self._client.post(path, data=data)
+        return response.status_code, response.get_data(as_text=True)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class _HttpClient:
+    """Minimal HTTP client for driving an external server."""
+
+    def __init__(self, base_url: str) -> None:
+        self._base_url = base_url.rstrip('/')
+        self._opener = urllib.request.build_opener(_NoRedirect)
+
+    def _open(self, request) -> Tuple[int, str]:
+        try:
+            with self._opener.open(request, timeout=30) as response:
+                return response.status, response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read().decode('utf-8', 'replace')
+
+    def get(self, path: str) -> Tuple[int, str]:
+        return self._open(self._base_url + path)
+
+    def post(self, path: str, data: Dict) -> Tuple[int, str]:
+        body = urllib.parse.urlencode(data).encode()
+        return self._open(urllib.request.Request(self._base_url + path, data=body, method='POST'))
+
+
+class _Worker:
+    """One load-generating thread with its own patron IDs and open loans."""
+
+    def __init__(self, client, worker_id: int, config: LoadConfig, book_ids: List[int]) -> None:
+        self.client = client
+        self.rng = random.Random(config.seed * 100_003 + worker_id)
+        self.patrons = [f"{(worker_id * 7 + i) % 1_000_000:06d}" for i in range(7)]
+        self.book_ids = book_ids
+        self.loans: List[Tuple[str, int]] = []
+        self.scenarios = list(config.mix)
+        self.weights = [config.mix[name] for name in self.scenarios]
+
+    def step(self) -> Tuple[str, int]:
+        scenario = self.rng.choices(self.scenarios, self.weights)[0]
+        if scenario == 'return' and not self.loans:
+            scenario = 'borrow'
+        return scenario, getattr(self, f'_{scenario}')()
+
+    def _borrow(self) -> int:
+        patron = self.rng.choice(self.patrons)
+        book_id = self.rng.choice(self.book_ids)
+        # The JSON API reports the outcome; the /borrow form redirects either way
+        status, _ = self.client.post('/api/borrow', {'patron_id': patron, 'book_id': book_id})
+        if status == 200:
+            self.loans.append((patron, book_id))
+        return status
+
+    def _return(self) -> int:
+        patron, book_id = self.loans.pop(self.rng.randrange(len(self.loans)))
+        status, _ = self.client.post('/api/return', {'patron_id': patron, 'book_id': book_id})
+        return status
+
+    def _search(self) -> int:
+        word = self.rng.choice(SEARCH_WORDS)
+        status, _ = self.client.get(f'/api/search?q={word}&type={self.rng.choice(("title", "author"))}')
+        return status
+
+    def _status(self) -> int:
+        patron = self.rng.choice(self.patrons)
+        status, _ = self.client.get(f'/api/patron/{patron}/status')
+        return status
+
+    def _catalog(self) -> int:
+        status, _ = self.client.get('/catalog')
+        return status
+
+
+def _scrape_sql_errors(client) -> Dict[str, float]:
+    status, body = client.get('/metrics')
+    if status != 200:
+        return {}
+    return {kind: float(value) for kind, value in _ERRORS_RE.findall(body)}
+
+
+def _run_threads(config: LoadConfig, worker_offset: int = 0) -> LoadResult:
+    if config.url:
+        make_client = lambda: _HttpClient(config.url)  # noqa: E731
+    else:
+        from app import create_app
+        app = create_app(dict(config.app_config, METRICS_ENABLED=True))
+        make_client = lambda: _InProcessClient(app)  # noqa: E731
+
+    conn = database.get_db_connection() if not config.url else None
+    if conn is not None:
+        book_ids = [row['id'] for row in conn.execute('SELECT id FROM books')]
+        conn.close()
+    else:
+        book_ids = list(range(1, config.books + 1))
+
+    probe = make_client()
+    errors_before = _scrape_sql_errors(probe)
+    results = [LoadResult() for _ in range(config.threads)]
+    start_barrier = threading.Barrier(config.threads + 1)
+    deadline: List[float] = [0.0]
+
+    def run(index: int) -> None:
+        worker = _Worker(make_client(), worker_offset + index, config, book_ids)
+        result = results[index]
+        start_barrier.wait()
+        done = 0
+        while (config.requests is not None and done < config.requests) or \
+                (config.requests is None and time.perf_counter() < deadline[0]):
+            started = time.perf_counter()
+            try:
+                scenario, status = worker.step()
+                failed, rejected = status >= 500, 400 <= status < 500
+            except Exception:
+                scenario, failed, rejected = 'exception', True, False
+            result.latencies.setdefault(scenario, []).append(time.perf_counter() - started)
+            if failed:
+                result.failures[scenario] = result.failures.get(scenario, 0) + 1
+            if rejected:
+                result.rejections[scenario] = result.rejections.get(scenario, 0) + 1
+            done += 1
+
+    threads = [threading.Thread(target=run, args=(i,), daemon=True) for i in range(config.threads)]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    deadline[0] = started + config.duration
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+
+    combined = LoadResult()
+    for result in results:
+        combined.merge(result)
+    combined.elapsed = time.perf_counter() - started
+    if config.url:
+        # Workers of a pre-fork server publish their counts to the shared metrics
+        # directory periodically; wait for the final counts before the second scrape
+        time.sleep(2 * METRICS_EXPORT_INTERVAL)
+    errors_after = _scrape_sql_errors(probe)
+    combined.sql_errors = {kind: errors_after[kind] - errors_before.get(kind, 0) for kind in errors_after}
+    return combined
+
+
+def _process_entry(config: LoadConfig, index: int, queue) -> None:
+    if config.database_path:
+        database.DATABASE = config.database_path
+    queue.put(_run_threads(config, worker_offset=index * config.threads))
+
+
+def run_load(config: LoadConfig) -> LoadResult:
+    """Run the configured load and return the merged result."""
+    cleanup = None
+    if not config.url and not config.database_path:
+        handle, config.database_path = tempfile.mkstemp(prefix='library_load_', suffix='.db')
+        os.close(handle)
+        cleanup = config.database_path
+    original_database = database.DATABASE
+    try:
+        if not config.url:
+            database.DATABASE = config.database_path
+            database.configure_shards(config.app_config.get('SHARD_COUNT', 1))
+            seed_catalog(config.books)
+        if config.processes <= 1:
+            return _run_threads(config)
+
+        context = multiprocessing.get_context('spawn')
+        queue = context.Queue()
+        processes = [context.Process(target=_process_entry, args=(config, i, queue)) for i in range(config.processes)]
+        for process in processes:
+            process.start()
+        combined = LoadResult()
+        for _ in processes:
+            combined.merge(queue.get())
+        for process in processes:
+            process.join()
+        return combined
+    finally:
+        database.stop_write_scheduler()
+        database.close_pools()
+        if cleanup:
+            for path in dict.fromkeys([cleanup] + database.borrow_record_paths()):
+                for suffix in ('', '-wal', '-shm', '-journal'):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+        if not config.url:
+            database.configure_shards(1)
+        database.DATABASE = original_database
+
+
+def format_summary(summary: Dict) -> str:
+    lines = [
+        f"requests:        {summary['requests']} in {summary['elapsed_s']}s",
+        f"throughput:      {summary['throughput_rps']} req/s",
+        "latency (ms):    p50={p50} p90={p90} p99={p99} max={max}".format(**summary['latency_ms']),
+        f"failed requests: {summary['failed_requests']}",
+        f"rejected:        {summary['rejected_requests']}",
+        f"db locked:       {summary['database_locked_errors']} ({summary['database_locked_rate']:.4%})",
+        "",
+        f"{'scenario':<10} {'requests':>9} {'fail':>5} {'rej':>5} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}",
+    ]
+    for scenario, stats in summary['scenarios'].items():
+        lines.append(
+            f"{scenario:<10} {stats['requests']:>9} {stats['failures']:>5} {stats['rejected']:>5} "
+            f"{stats['p50']:>9} {stats['p90']:>9} {stats['p99']:>9} {stats['max']:>9}"
+        )
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds to run (ignored with --requests)')
+    parser.add_argument('--requests', type=int, default=None, help='requests per thread')
+    parser.add_argument('--mix', type=parse_mix, default=dict(DEFAULT_MIX), help='e.g. borrow=2,return=2,search=4')
+    parser.add_argument('--books', type=int, default=200, help='catalog size to seed')
+    parser.add_argument('--url', default=None, help='drive a running server instead of an in-process app')
+    parser.add_argument('--database', default=None, help='SQLite file to use (default: temporary file)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--config', type=parse_config_override, action='append', default=[],
+                        help='app config override KEY=VALUE (JSON values), repeatable')
+    args = parser.parse_args(argv)
+
+    config = LoadConfig(
+        threads=args.threads, processes=args.processes, duration=args.duration, requests=args.requests,
+        mix=args.mix, books=args.books, url=args.url, database_path=args.database, seed=args.seed,
+        app_config=dict(args.config)
+    )
+    print(format_summary(run_load(config).summary()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Row record benchmark: dict-per-row reads against the slotted Book/Loan records.
+
+Reads a large catalog and one patron's long list of open loans the way the
+database module used to (``dict(sqlite3.Row)`` per book; a dict and three
+``datetime`` parses per loan) and through the ``row_factory`` records it
+returns now. Reports the median time, the peak memory of a call, and the
+memory blocks and bytes still held per row by the returned list.
+
+Usage:
+    python -m benchmarks.row_records_benchmark --books 100000 --loans 20000 --runs 10
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import database
+from benchmarks.startup_benchmark import build_catalog
+
+PATRON_ID = '123456'
+
+
+def legacy_books():
+    conn = database.get_read_connection()
+    books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
+    conn.close()
+    return [dict(book) for book in books]
+
+
+def legacy_loans():
+    conn = database.get_patron_connection(PATRON_ID, read_only=True)
+    records = conn.execute('''
+        SELECT br.*, b.title, b.author
+        FROM borrow_records br
+        JOIN books b ON br.book_id = b.id
+        WHERE br.patron_id = ? AND br.return_date IS NULL
+        ORDER BY br.borrow_date
+    ''', (PATRON_ID,)).fetchall()
+    conn.close()
+    return [{
+        'book_id': record['book_id'],
+        'title': record['title'],
+        'author': record['author'],
+        'borrow_date': datetime.fromisoformat(record['borrow_date']),
+        'due_date': datetime.fromisoformat(record['due_date']),
+        'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
+    } for record in records]
+
+
+def add_loans(count: int) -> None:
+    start = datetime.now() - timedelta(days=30)
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) VALUES (?, ?, ?, ?)',
+        ((PATRON_ID, i + 1, (start + timedelta(minutes=i)).isoformat(),
+          (start + timedelta(days=14, minutes=i)).isoformat()) for i in range(count))
+    )
+    conn.commit()
+    conn.close()
+
+
+def measure(call, runs: int) -> dict:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    rows = call()
+    after = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    held = [stat for stat in after.compare_to(before, 'filename') if stat.size_diff > 0]
+    return {
+        'median_ms': statistics.median(timings) * 1000,
+        'peak_kib': peak / 1024,
+        'blocks_per_row': sum(stat.count_diff for stat in held) / len(rows),
+        'bytes_per_row': sum(stat.size_diff for stat in held) / len(rows),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Compare dict-per-row and record reads.')
+    parser.add_argument('--books', type=int, default=100_000)
+    parser.add_argument('--loans', type=int, default=20_000)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    original = database.DATABASE
+    with tempfile.TemporaryDirectory(prefix='library_records_') as workdir:
+        build_catalog(os.path.join(workdir, 'library.db'), args.books)
+        database.DATABASE = os.path.join(workdir, 'library.db')
+        try:
+            add_loans(min(args.loans, args.books))
+            calls = {
+                ('dict', 'books'): legacy_books,
+                ('record', 'books'): database.get_all_books,
+                ('dict', 'loans'): legacy_loans,
+                ('record', 'loans'): lambda: database.get_patron_borrowed_books(PATRON_ID),
+            }
+            results = {key: measure(call, args.runs) for key, call in calls.items()}
+        finally:
+            database.close_pools()
+            database.DATABASE = original
+
+    print(f"{args.books} books, {min(args.loans, args.books)} loans, median of {args.runs} runs")
+    print(f"{'rows':<8} {'read':<6} {'median_ms':>10} {'peak_kib':>10} {'blocks/row':>11} {'bytes/row':>10}")
+    for (kind, name), result in results.items():
+        print(f"{kind:<8} {name:<6} {result['median_ms']:>10.2f} {result['peak_kib']:>10.1f} "
+              f"{result['blocks_per_row']:>11.2f} {result['bytes_per_row']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Cold-start benchmark for create_app().
+
+Builds a large catalog once, then starts fresh interpreters that import the
+app, call create_app() and render a first page, comparing the legacy boot
+(DDL on every start, COUNT(*) sample-data check, templates parsed from source)
+against FAST_START (schema-version check, no seeding, precompiled templates).
+
+Usage:
+    python -m benchmarks.startup_benchmark --books 500000 --runs 7
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = r'''
+import json, sys, time
+started = time.perf_counter()
+import database
+database.DATABASE = sys.argv[1]
+mode = sys.argv[2]
+from app import create_app
+imported = time.perf_counter()
+if mode == "legacy":
+    database.init_database()
+    database.add_sample_data()
+    app = create_app({"SEED_SAMPLE_DATA": False})
+else:
+    app = create_app({"FAST_START": True, "TEMPLATE_CACHE_DIR": sys.argv[3]})
+created = time.perf_counter()
+app.test_client().get("/add_book")
+rendered = time.perf_counter()
+print(json.dumps({"import": imported - started, "create_app": created - imported,
+                  "first_render": rendered - created, "total": rendered - started}))
+'''
+
+
+def build_catalog(path: str, books: int) -> None:
+    sys.path.insert(0, ROOT)
+    import database
+    original = database.DATABASE
+    database.DATABASE = path
+    try:
+        database.init_database()
+        conn = database.get_db_connection()
+        conn.executemany(
+            'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+            ((f"Title {i}", f"Author {i % 5000}", f"{9780000000000 + i}", 3, 3) for i in range(books))
+        )
+        conn.commit()
+        conn.close()
+    finally:
+        database.close_pools()
+        database.DATABASE = original
+
+
+def run_mode(mode: str, db_path: str, cache_dir: str, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', _CHILD, db_path, mode, cache_dir],
+            cwd=ROOT, check=True, capture_output=True, text=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: statistics.median(sample[key] for sample in samples) * 1000 for key in samples[0]}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Compare legacy and FAST_START cold starts.')
+    parser.add_argument('--books', type=int, default=500_000)
+    parser.add_argument('--runs', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='library_startup_') as workdir:
+        db_path = os.path.join(workdir, 'library.db')
+        cache_dir = os.path.join(workdir, 'jinja_cache')
+        build_catalog(db_path, args.books)
+        # Warm the template bytecode cache the way `flask precompile-templates` would
+        run_mode('fast', db_path, cache_dir, 1)
+        results = {mode: run_mode(mode, db_path, cache_dir, args.runs) for mode in ('legacy', 'fast')}
+
+    print(f"median of {args.runs} cold starts, {args.books} books (ms)")
+    print(f"{'mode':<8} {'import':>9} {'create_app':>11} {'first_render':>13} {'total':>9}")
+    for mode, timing in results.items():
+        print(f"{mode:<8} {timing['import']:>9.1f} {timing['create_app']:>11.1f} "
+              f"{timing['first_render']:>13.1f} {timing['total']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
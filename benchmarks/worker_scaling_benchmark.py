@@ -0,0 +1,93 @@
+"""
+Throughput scaling of the pre-fork server with 1, 2, 4 and 8 workers.
+
+Starts gunicorn (gunicorn.conf.py + wsgi:app) against a seeded temporary
+database for each worker count and drives it over HTTP with the load harness
+using a read-heavy mix.
+
+Usage:
+    python -m benchmarks.worker_scaling_benchmark --duration 10 --threads 32
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks.load_harness import LoadConfig, parse_mix, run_load, seed_catalog
+
+import database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start")
+
+
+def run_workers(workers: int, db_path: str, args) -> dict:
+    port = _free_port()
+    env = dict(
+        os.environ,
+        WEB_WORKERS=str(workers), WEB_THREADS=str(args.worker_threads), WEB_BIND=f'127.0.0.1:{port}',
+        LIBRARY_DATABASE=db_path, LIBRARY_FAST_START='true', LIBRARY_TEMPLATE_CACHE_DIR=db_path + '.jinja'
+    )
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        url = f'http://127.0.0.1:{port}'
+        _wait_ready(url + '/catalog')
+        config = LoadConfig(threads=args.threads, duration=args.duration, mix=args.mix, url=url, books=args.books)
+        return run_load(config).summary()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Measure throughput for 1, 2, 4 and 8 gunicorn workers.')
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--worker-threads', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=32, help='load generator threads')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--books', type=int, default=2000)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('search=6,catalog=1,late_fee=2,borrow=1'))
+    args = parser.parse_args(argv)
+
+    print(f"cpu cores: {os.cpu_count()}")
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'locked':>7}")
+    baseline = None
+    with tempfile.TemporaryDirectory(prefix='library_workers_') as workdir:
+        for workers in (int(value) for value in args.workers.split(',')):
+            db_path = os.path.join(workdir, f'library_{workers}.db')
+            database.DATABASE = db_path
+            seed_catalog(args.books)
+            database.close_pools()
+            summary = run_workers(workers, db_path, args)
+            baseline = baseline or summary['throughput_rps']
+            print(f"{workers:>7} {summary['throughput_rps']:>9} {summary['latency_ms']['p50']:>9} "
+                  f"{summary['latency_ms']['p99']:>9} {summary['database_locked_errors']:>7}"
+                  f"   x{summary['throughput_rps'] / baseline:.2f}")
+
+
+if __name__ == '__main__':
+    main()
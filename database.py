@@ -3,23 +3,405 @@ Database module for Library Management System
 Handles all database operations and connections
 """
 
+import json
+import logging
+import os
+import queue
 import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+import zlib
+from collections.abc import Mapping
+from concurrent.futures import Future
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 # Database configuration
 DATABASE = 'library.db'
+SCHEMA_VERSION = 12  # stored in PRAGMA user_version; bump when the DDL changes
+JOURNAL_MODE = 'wal'  # readers never block the writer and vice versa
+READ_POOL_SIZE = 8  # idle read-only connections kept per database
+WRITE_POOL_SIZE = 2  # idle read-write connections kept per database
+SHARD_COUNT = 1  # borrow_records partitions, hashed by patron_id; 1 keeps them in DATABASE
+MEMORY_PREFIX = 'memory:'  # DATABASE = 'memory:<name>' keeps the database in process memory
 
-def get_db_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row  # This enables column access by name
+# Instrumentation hooks (metrics, tracing, query budgets in tests)
+_query_listeners: List[Callable] = []
+_connection_listeners: List[Callable] = []
+_book_write_listeners: List[Callable] = []
+
+
+def add_query_listener(listener: Callable) -> None:
+    """Register listener(sql, parameters, elapsed, error, conn) called after every statement."""
+    if listener not in _query_listeners:
+        _query_listeners.append(listener)
+
+
+def remove_query_listener(listener: Callable) -> None:
+    """Unregister a listener added with add_query_listener."""
+    if listener in _query_listeners:
+        _query_listeners.remove(listener)
+
+
+def add_connection_listener(listener: Callable) -> None:
+    """Register listener(conn) called whenever a connection is opened or checked out of a pool."""
+    if listener not in _connection_listeners:
+        _connection_listeners.append(listener)
+
+
+def remove_connection_listener(listener: Callable) -> None:
+    """Unregister a listener added with add_connection_listener."""
+    if listener in _connection_listeners:
+        _connection_listeners.remove(listener)
+
+
+def add_book_write_listener(listener: Callable) -> None:
+    """Register listener() called after this process commits a change to the books table."""
+    if listener not in _book_write_listeners:
+        _book_write_listeners.append(listener)
+
+
+def remove_book_write_listener(listener: Callable) -> None:
+    """Unregister a listener added with add_book_write_listener."""
+    if listener in _book_write_listeners:
+        _book_write_listeners.remove(listener)
+
+
+def _notify_book_write() -> None:
+    for listener in list(_book_write_listeners):
+        listener()
+
+
+def _notify_query(conn, sql, parameters, elapsed: float, error: Optional[Exception]) -> None:
+    for listener in list(_query_listeners):
+        listener(sql, parameters, elapsed, error, conn)
+
+
+class LibraryConnection(sqlite3.Connection):
+    """sqlite3 connection that reports statement timings to registered query listeners.
+
+    Timing covers statement execution up to the first result row, which for
+    the sorted/aggregated queries used here includes the bulk of the work.
+    Commits are reported as a ``COMMIT`` statement so fsync time is visible.
+    """
+
+    def execute(self, sql, parameters=(), /):
+        if not _query_listeners:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            cursor = super().execute(sql, parameters)
+        except sqlite3.Error as exc:
+            _notify_query(self, sql, parameters, time.perf_counter() - start, exc)
+            raise
+        _notify_query(self, sql, parameters, time.perf_counter() - start, None)
+        return cursor
+
+    def executemany(self, sql, seq_of_parameters, /):
+        if not _query_listeners:
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            cursor = super().executemany(sql, seq_of_parameters)
+        except sqlite3.Error as exc:
+            _notify_query(self, sql, None, time.perf_counter() - start, exc)
+            raise
+        _notify_query(self, sql, None, time.perf_counter() - start, None)
+        return cursor
+
+    def commit(self):
+        if not _query_listeners:
+            return super().commit()
+        start = time.perf_counter()
+        try:
+            super().commit()
+        except sqlite3.Error as exc:
+            _notify_query(self, 'COMMIT', (), time.perf_counter() - start, exc)
+            raise
+        _notify_query(self, 'COMMIT', (), time.perf_counter() - start, None)
+
+    _pool = None
+    path: Optional[str] = None  # database the connection was opened on (set by connect())
+
+    def close(self):
+        """Return pooled connections to their pool instead of closing them."""
+        pool = self._pool
+        if pool is not None:
+            pool.release(self)
+        else:
+            super().close()
+
+
+class ConnectionPool:
+    """
+    Reusable connections to one database file.
+
+    Keeps up to ``size`` idle connections; acquiring never blocks and opens a
+    new connection when none is idle, so size 0 disables pooling. Read-only
+    pools open the file with a ``mode=ro`` URI and ``PRAGMA query_only`` so
+    their connections can never take a write lock. When ``attach`` is given
+    (shard files), that database is attached read-only as ``library`` so
+    queries can join ``books`` without qualifying it.
+    """
+
+    def __init__(self, path: str, size: int, read_only: bool = False, attach: Optional[str] = None):
+        self.path = path
+        self.size = size
+        self.read_only = read_only
+        self.attach = attach
+        self._idle: List[LibraryConnection] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self) -> LibraryConnection:
+        conn = connect(self.path, self.read_only, factory=LibraryConnection, check_same_thread=False)
+        # Bypass the instrumented execute so pool setup never counts as a query
+        if self.attach:
+            sqlite3.Connection.execute(conn, 'ATTACH DATABASE ? AS library', (_file_uri(self.attach, True),))
+        if self.read_only:
+            sqlite3.Connection.execute(conn, 'PRAGMA query_only = 1')
+        conn._pool = self
+        return conn
+
+    def acquire(self) -> LibraryConnection:
+        try:
+            conn = self._idle.pop()
+        except IndexError:
+            conn = self._connect()
+        conn.row_factory = sqlite3.Row  # This enables column access by name
+        return conn
+
+    def release(self, conn: LibraryConnection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if not self._closed and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        sqlite3.Connection.close(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            sqlite3.Connection.close(conn)
+
+
+def _file_uri(path: str, read_only: bool = False) -> str:
+    if is_memory_database(path):
+        # mode=ro cannot be combined with mode=memory; read pools rely on query_only instead
+        return f"file:{urllib.parse.quote(path[len(MEMORY_PREFIX):])}?mode=memory&cache=shared"
+    uri = f"file:{urllib.request.pathname2url(os.path.abspath(path))}"
+    return uri + '?mode=ro' if read_only else uri
+
+
+# Connections keeping each in-memory database alive until remove_database()
+_memory_databases: Dict[str, sqlite3.Connection] = {}
+
+
+def is_memory_database(path: str) -> bool:
+    return path.startswith(MEMORY_PREFIX)
+
+
+def connect(path: str, read_only: bool = False, **kwargs) -> sqlite3.Connection:
+    """
+    Open a connection to a database file or to a ``memory:<name>`` database.
+
+    In-memory databases are shared-cache, so every connection of the process
+    opened with the same name sees the same data. They use table-level
+    locking instead of WAL, and a writer fails at once on a table a reader
+    has locked. ``read_uncommitted`` stops readers from taking those locks,
+    at the cost of isolation: unlike WAL snapshots, a read sees another
+    connection's uncommitted writes (dirty reads), including ones later
+    rolled back. Memory mode is meant for tests and single-worker runs.
+    """
+    if is_memory_database(path) and path not in _memory_databases:
+        anchor = sqlite3.connect(_file_uri(path), uri=True, check_same_thread=False)
+        if _memory_databases.setdefault(path, anchor) is not anchor:
+            anchor.close()
+    conn = sqlite3.connect(_file_uri(path, read_only), uri=True, **kwargs)
+    if isinstance(conn, LibraryConnection):
+        conn.path = path
+    if is_memory_database(path):
+        sqlite3.Connection.execute(conn, 'PRAGMA read_uncommitted = 1')
+    return conn
+
+
+def memory_databases() -> List[str]:
+    """Names of the in-memory databases currently alive in this process."""
+    return list(_memory_databases)
+
+
+def copy_database(source: str, target: str) -> None:
+    """Replace the contents of ``target`` with a consistent copy of ``source`` (SQLite backup API)."""
+    source_conn = connect(source)
+    target_conn = connect(target)
+    try:
+        source_conn.backup(target_conn)
+    finally:
+        target_conn.close()
+        source_conn.close()
+
+
+def remove_database(path: str) -> None:
+    """Delete a database file (with its WAL files) or drop an in-memory database.
+
+    Close the pools first: an in-memory database lives until its last connection closes.
+    """
+    if is_memory_database(path):
+        anchor = _memory_databases.pop(path, None)
+        if anchor is not None:
+            anchor.close()
+        return
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+_pools: Dict[Tuple[str, bool], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+_outbox_lock = threading.Lock()  # one drain at a time per process, so events keep outbox order
+
+
+def _get_pool(read_only: bool, path: Optional[str] = None) -> ConnectionPool:
+    path = path or DATABASE
+    key = (path, read_only)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                size = READ_POOL_SIZE if read_only else WRITE_POOL_SIZE
+                pool = ConnectionPool(path, size, read_only, attach=None if path == DATABASE else DATABASE)
+                _pools[key] = pool
+    return pool
+
+
+def configure_pools(read_size: Optional[int] = None, write_size: Optional[int] = None) -> None:
+    """Set the read and write pool sizes independently and drop existing pools."""
+    global READ_POOL_SIZE, WRITE_POOL_SIZE
+    if read_size is not None:
+        READ_POOL_SIZE = read_size
+    if write_size is not None:
+        WRITE_POOL_SIZE = write_size
+    close_pools()
+
+
+def close_pools() -> None:
+    """Close every idle pooled connection (e.g. before deleting a database file)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def _checkout(read_only: bool, path: Optional[str] = None) -> LibraryConnection:
+    conn = _get_pool(read_only, path).acquire()
+    for listener in list(_connection_listeners):
+        listener(conn)
     return conn
 
+
+def get_db_connection():
+    """Get a read-write database connection from the write pool; close() returns it."""
+    return _checkout(read_only=False)
+
+
+def get_read_connection():
+    """Get a read-only (mode=ro, query_only) connection from the read pool; close() returns it."""
+    return _checkout(read_only=True)
+
+# Shard router for borrow_records
+
+def shard_for_patron(patron_id: str) -> int:
+    """Stable shard index for a patron (CRC32 of the patron ID)."""
+    return zlib.crc32(str(patron_id).encode()) % SHARD_COUNT
+
+def shard_path(index: int) -> str:
+    """File holding borrow_records shard ``index``, next to DATABASE."""
+    base, ext = os.path.splitext(DATABASE)
+    return f"{base}.shard{index}{ext or '.db'}"
+
+def borrow_record_paths() -> List[str]:
+    """Every file holding borrow_records under the current layout."""
+    if SHARD_COUNT <= 1:
+        return [DATABASE]
+    return [shard_path(index) for index in range(SHARD_COUNT)]
+
+def _borrow_records_path(patron_id: str) -> str:
+    if SHARD_COUNT <= 1:
+        return DATABASE
+    return shard_path(shard_for_patron(patron_id))
+
+def get_patron_connection(patron_id: str, read_only: bool = False):
+    """
+    Get a connection for patron-scoped borrow_records queries.
+
+    Routed to the patron's shard, where ``books`` is reachable through the
+    attached main database, or to DATABASE when sharding is off.
+    """
+    return _checkout(read_only, _borrow_records_path(patron_id))
+
+def query_all_shards(sql: str, parameters: Tuple = ()) -> List[sqlite3.Row]:
+    """Run a read query against every borrow_records file and concatenate the rows."""
+    rows: List[sqlite3.Row] = []
+    for path in borrow_record_paths():
+        conn = _checkout(True, path)
+        try:
+            rows.extend(conn.execute(sql, parameters).fetchall())
+        finally:
+            conn.close()
+    return rows
+
+def configure_shards(count: int) -> None:
+    """Set the number of borrow_records shards used by this process."""
+    global SHARD_COUNT
+    if count < 1:
+        raise ValueError("Shard count must be at least 1.")
+    SHARD_COUNT = count
+    close_pools()
+
+def get_stored_shard_count() -> int:
+    """Shard count the data on disk was written with."""
+    conn = get_read_connection()
+    try:
+        row = conn.execute("SELECT value FROM library_settings WHERE key = 'shard_count'").fetchone()
+    finally:
+        conn.close()
+    return int(row['value']) if row else 1
+
+def get_catalog_id() -> Optional[str]:
+    """Random id of this database's catalog, so caches built from another database are rejected."""
+    conn = get_read_connection()
+    try:
+        row = conn.execute("SELECT value FROM library_settings WHERE key = 'catalog_id'").fetchone()
+    finally:
+        conn.close()
+    return row['value'] if row else None
+
+def verify_shard_layout() -> None:
+    """Refuse to run with a shard count that does not match the data on disk."""
+    stored = get_stored_shard_count()
+    if stored != SHARD_COUNT:
+        raise RuntimeError(
+            f"Database is partitioned into {stored} shard(s) but SHARD_COUNT is {SHARD_COUNT}. "
+            f"Start with SHARD_COUNT={stored} and run `flask reshard {SHARD_COUNT}` first."
+        )
+
 def init_database():
     """Initialize the database with required tables."""
     conn = get_db_connection()
     
+    if JOURNAL_MODE:
+        conn.execute(f'PRAGMA journal_mode = {JOURNAL_MODE}')
+    
     # Create books table
     conn.execute('''
         CREATE TABLE IF NOT EXISTS books (
@@ -32,7 +414,139 @@ def init_database():
         )
     ''')
     
+    # Per-book change counter, so in-process caches can refresh incrementally
+    _create_book_change_tracking(conn)
+    
     # Create borrow_records table
+    _create_borrow_record_tables(conn)
+    
+    # Append-only change feed served by /api/changes
+    _create_event_log(conn)
+    
+    # Per-book FIFO hold queues, next to books so a returned copy is handed
+    # to the next hold in the same transaction as the availability update
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS holds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'waiting',  -- waiting, ready, fulfilled or expired
+            expires_at TEXT,  -- pickup deadline once ready
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_holds_queue ON holds (book_id, status, id)')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_holds_expiry ON holds (expires_at) WHERE status = 'ready'")
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_holds_active
+        ON holds (patron_id, book_id) WHERE status IN ('waiting', 'ready')
+    ''')
+    
+    # Key/value settings, e.g. the shard layout the data was written with
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS library_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    ''')
+    if not conn.execute("SELECT 1 FROM library_settings WHERE key = 'shard_count'").fetchone():
+        # A database that already holds loans predates sharding
+        has_loans = conn.execute('SELECT 1 FROM borrow_records LIMIT 1').fetchone()
+        conn.execute("INSERT INTO library_settings (key, value) VALUES ('shard_count', ?)",
+                     (str(1 if has_loans else SHARD_COUNT),))
+    # Identifies this catalog's book_changes sequence to on-disk caches built from it
+    conn.execute("INSERT OR IGNORE INTO library_settings (key, value) VALUES ('catalog_id', ?)",
+                 (uuid.uuid4().hex,))
+    
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    conn.commit()
+    conn.close()
+    
+    if SHARD_COUNT > 1:
+        _init_shards()
+
+def _create_book_change_tracking(conn):
+    # book_changes holds the catalog version at which each book last changed;
+    # a deleted book keeps its row, and its missing books row marks the delete
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS book_changes (
+            book_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_book_changes_version ON book_changes (version)')
+    for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS books_after_{event.lower()} AFTER {event} ON books
+            BEGIN
+                INSERT OR REPLACE INTO book_changes (book_id, version)
+                VALUES ({row}.id, (SELECT COALESCE(MAX(version), 0) + 1 FROM book_changes));
+            END
+        ''')
+    # Books written before change tracking existed
+    conn.execute('''
+        INSERT INTO book_changes (book_id, version)
+        SELECT id, (SELECT COALESCE(MAX(version), 0) FROM book_changes) + ROW_NUMBER() OVER (ORDER BY id)
+        FROM books WHERE id NOT IN (SELECT book_id FROM book_changes)
+    ''')
+
+_BOOK_EVENT_DATA = "json_object('id', {row}.id, 'title', {row}.title, 'author', {row}.author, " \
+                   "'isbn', {row}.isbn, 'total_copies', {row}.total_copies, " \
+                   "'available_copies', {row}.available_copies)"
+_LOAN_EVENT_DATA = "json_object('patron_id', NEW.patron_id, 'book_id', NEW.book_id, " \
+                   "'borrow_date', NEW.borrow_date, 'due_date', NEW.due_date, 'return_date', NEW.return_date)"
+
+def _create_event_log(conn):
+    # seq is AUTOINCREMENT so sequence numbers are never reused, even after
+    # compaction deletes the newest rows of an entity's history
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,  -- book or loan
+            entity_key TEXT NOT NULL,
+            action TEXT NOT NULL,  -- insert, update or delete
+            data TEXT,  -- JSON state after the change; NULL for deletes
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')),
+            outbox_key TEXT  -- loan_outbox event_key of events moved from a shard
+        )
+    ''')
+    if 'outbox_key' not in {row[1] for row in conn.execute('PRAGMA table_info(events)')}:
+        conn.execute('ALTER TABLE events ADD COLUMN outbox_key TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_events_entity ON events (entity, entity_key, seq)')
+    # Workers draining the same outbox concurrently append each event once
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_events_outbox_key ON events (outbox_key) WHERE outbox_key IS NOT NULL
+    ''')
+    # Book changes are logged by triggers, so every write path is covered
+    for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+        data = 'NULL' if event == 'DELETE' else _BOOK_EVENT_DATA.format(row=row)
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS books_event_{event.lower()} AFTER {event} ON books
+            BEGIN
+                INSERT INTO events (entity, entity_key, action, data)
+                VALUES ('book', CAST({row}.id AS TEXT), '{event.lower()}', {data});
+            END
+        ''')
+    # Loans in this file likewise; shard files queue theirs in loan_outbox
+    for event in ('INSERT', 'UPDATE'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS borrow_records_event_{event.lower()} AFTER {event} ON borrow_records
+            BEGIN
+                INSERT INTO events (entity, entity_key, action, data)
+                VALUES ('loan', NEW.patron_id || ':' || NEW.book_id || ':' || NEW.borrow_date,
+                        '{event.lower()}', {_LOAN_EVENT_DATA});
+            END
+        ''')
+    # Books written before the log existed, so a consumer starting at 0 sees the whole catalog
+    conn.execute(f'''
+        INSERT INTO events (entity, entity_key, action, data)
+        SELECT 'book', CAST(id AS TEXT), 'insert', {_BOOK_EVENT_DATA.format(row='books')}
+        FROM books WHERE CAST(id AS TEXT) NOT IN (SELECT entity_key FROM events WHERE entity = 'book')
+        ORDER BY id
+    ''')
+
+def _create_borrow_record_tables(conn):
     conn.execute('''
         CREATE TABLE IF NOT EXISTS borrow_records (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -44,9 +558,104 @@ def init_database():
             FOREIGN KEY (book_id) REFERENCES books (id)
         )
     ''')
-    
-    conn.commit()
-    conn.close()
+    # Per-patron, per-book loan lookups (late fees, returns) without a table scan
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_patron_book
+        ON borrow_records (patron_id, book_id, borrow_date)
+    ''')
+    # Open loans by due date, for the incremental overdue scan
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_open_due
+        ON borrow_records (due_date) WHERE return_date IS NULL
+    ''')
+    # Loans found overdue by scan_new_overdues(), one row per loan
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS overdue_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            due_date TEXT NOT NULL,
+            detected_at TEXT NOT NULL,
+            UNIQUE (patron_id, book_id, due_date)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_overdue_events_detected ON overdue_events (detected_at)')
+    # High-water marks of incremental scans over this file's loans
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scan_checkpoints (
+            name TEXT PRIMARY KEY,
+            position TEXT NOT NULL
+        )
+    ''')
+    # Returned loans moved out of the hot table by archive_returned_records().
+    # id is the archive's own key: borrow_records ids are per file and reassigned
+    # by reshard, so the original id is kept only as the non-unique source_id
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS borrow_history_archive (
+            id INTEGER PRIMARY KEY,
+            source_id INTEGER,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            return_date TEXT NOT NULL,
+            archived_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_archive_patron_book
+        ON borrow_history_archive (patron_id, book_id, borrow_date)
+    ''')
+    archive_columns = {row[1] for row in conn.execute('PRAGMA table_info(borrow_history_archive)')}
+    if 'source_id' not in archive_columns:
+        # Archives written before source_id used the borrow_records id as their key
+        conn.execute('ALTER TABLE borrow_history_archive ADD COLUMN source_id INTEGER')
+        conn.execute('UPDATE borrow_history_archive SET source_id = id')
+
+def _create_loan_outbox(conn):
+    # A shard cannot write to DATABASE, so its loan events are queued here in
+    # the loan's own transaction and moved to events by drain_loan_outbox()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS loan_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_key TEXT,  -- random, so unique across shards and shard layouts
+            entity_key TEXT NOT NULL,
+            action TEXT NOT NULL,
+            data TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'))
+        )
+    ''')
+    if 'event_key' not in {row[1] for row in conn.execute('PRAGMA table_info(loan_outbox)')}:
+        conn.execute('ALTER TABLE loan_outbox ADD COLUMN event_key TEXT')
+        conn.execute('UPDATE loan_outbox SET event_key = lower(hex(randomblob(16)))')
+
+def _init_shards():
+    """Create the borrow_records tables in every shard file."""
+    for path in borrow_record_paths():
+        conn = connect(path)
+        try:
+            if JOURNAL_MODE:
+                conn.execute(f'PRAGMA journal_mode = {JOURNAL_MODE}')
+            _create_borrow_record_tables(conn)
+            _create_loan_outbox(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+def get_schema_version() -> int:
+    """Read the schema version stored in the database header (constant time)."""
+    conn = get_db_connection()
+    try:
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        conn.close()
+
+def ensure_schema() -> bool:
+    """Run init_database() only if the stored schema version is behind SCHEMA_VERSION."""
+    if get_schema_version() >= SCHEMA_VERSION:
+        return False
+    init_database()
+    return True
 
 def add_sample_data():
     """Add sample data to the database if it's empty."""
@@ -68,12 +677,16 @@ def add_sample_data():
             ''', (title, author, isbn, copies, copies))
         
         # Make 1984 unavailable by adding a borrow record
-        conn.execute('''
+        record_conn = conn if SHARD_COUNT <= 1 else get_patron_connection('123456')
+        record_conn.execute('''
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
         ''', ('123456', 3, 
               (datetime.now() - timedelta(days=5)).isoformat(),
               (datetime.now() + timedelta(days=9)).isoformat()))
+        if record_conn is not conn:
+            record_conn.commit()
+            record_conn.close()
         
         # Update available copies for 1984
         conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
@@ -82,57 +695,167 @@ def add_sample_data():
     
     conn.close()
 
+# Row records
+
+class Record(Mapping):
+    """
+    Read-only row with one slot per column and no per-row ``__dict__``.
+
+    Records are built directly by a cursor ``row_factory``, so no
+    ``sqlite3.Row`` or dict is allocated per row. They read like the dicts
+    they replace (``row['title']``, ``dict(row)``, ``row == {...}``) and like
+    objects in templates (``row.title``); ``to_dict()`` converts one at the
+    JSON boundary.
+    """
+
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """``row_factory`` for queries selecting exactly ``_fields``, in order."""
+        return cls(*row)
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{field}={self[field]!r}' for field in self._fields)})"
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in self._fields}
+
+
+class Book(Record):
+    __slots__ = _fields = ('id', 'title', 'author', 'isbn', 'total_copies', 'available_copies')
+
+    def __init__(self, id, title, author, isbn, total_copies, available_copies):
+        self.id = id
+        self.title = title
+        self.author = author
+        self.isbn = isbn
+        self.total_copies = total_copies
+        self.available_copies = available_copies
+
+
+class Loan(Record):
+    """An open loan; dates stay ISO text until first read as datetimes."""
+
+    __slots__ = ('book_id', 'title', 'author', 'is_overdue', '_borrow_date', '_due_date')
+    _fields = ('book_id', 'title', 'author', 'borrow_date', 'due_date', 'is_overdue')
+
+    def __init__(self, book_id, title, author, borrow_date, due_date, is_overdue):
+        self.book_id = book_id
+        self.title = title
+        self.author = author
+        self._borrow_date = borrow_date
+        self._due_date = due_date
+        self.is_overdue = bool(is_overdue)
+
+    @property
+    def borrow_date(self) -> datetime:
+        if isinstance(self._borrow_date, str):
+            self._borrow_date = datetime.fromisoformat(self._borrow_date)
+        return self._borrow_date
+
+    @property
+    def due_date(self) -> datetime:
+        if isinstance(self._due_date, str):
+            self._due_date = datetime.fromisoformat(self._due_date)
+        return self._due_date
+
+
+BOOK_COLUMNS = ', '.join(Book._fields)
+
+
+def _fetch_records(conn, record: type, sql: str, parameters=()) -> List:
+    cursor = conn.execute(sql, parameters)
+    cursor.row_factory = record.from_row
+    return cursor.fetchall()
+
 # Helper Functions for Database Operations
 
-def get_all_books() -> List[Dict]:
+def get_all_books() -> List[Book]:
     """Get all books from the database."""
-    conn = get_db_connection()
-    books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
+    conn = get_read_connection()
+    books = _fetch_records(conn, Book, f'SELECT {BOOK_COLUMNS} FROM books ORDER BY title')
     conn.close()
-    return [dict(book) for book in books]
+    return books
 
-def get_book_by_id(book_id: int) -> Optional[Dict]:
+def iter_query(sql: str, parameters: Tuple = (), batch_size: int = 500,
+               record: Optional[type] = None) -> Iterator[Mapping]:
+    """Yield the rows of a read query as dicts (or ``record`` instances), batch_size at a time.
+    
+    The read connection stays checked out until the iterator is exhausted or closed.
+    """
+    conn = get_read_connection()
+    try:
+        cursor = conn.execute(sql, parameters)
+        if record is not None:
+            cursor.row_factory = record.from_row
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from (rows if record is not None else map(dict, rows))
+    finally:
+        conn.close()
+
+def iter_all_books() -> Iterator[Book]:
+    """Stream all books ordered by title without materializing the catalog."""
+    return iter_query(f'SELECT {BOOK_COLUMNS} FROM books ORDER BY title', record=Book)
+
+def get_book_changes(since_version: int = 0) -> List[Dict]:
+    """Get books changed after since_version, oldest change first (id is None for deleted books)."""
+    conn = get_read_connection()
+    rows = conn.execute('''
+        SELECT c.version, c.book_id, b.id, b.title, b.author, b.isbn, b.total_copies, b.available_copies
+        FROM book_changes c LEFT JOIN books b ON b.id = c.book_id
+        WHERE c.version > ?
+        ORDER BY c.version
+    ''', (since_version,)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def get_book_by_id(book_id: int) -> Optional[Book]:
     """Get a specific book by ID."""
-    conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
+    conn = get_read_connection()
+    books = _fetch_records(conn, Book, f'SELECT {BOOK_COLUMNS} FROM books WHERE id = ?', (book_id,))
     conn.close()
-    return dict(book) if book else None
+    return books[0] if books else None
 
-def get_book_by_isbn(isbn: str) -> Optional[Dict]:
+def get_book_by_isbn(isbn: str) -> Optional[Book]:
     """Get a specific book by ISBN."""
-    conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
+    conn = get_read_connection()
+    books = _fetch_records(conn, Book, f'SELECT {BOOK_COLUMNS} FROM books WHERE isbn = ?', (isbn,))
     conn.close()
-    return dict(book) if book else None
+    return books[0] if books else None
 
-def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
+def get_patron_borrowed_books(patron_id: str) -> List[Loan]:
     """Get currently borrowed books for a patron."""
-    conn = get_db_connection()
-    records = conn.execute('''
-        SELECT br.*, b.title, b.author 
+    conn = get_patron_connection(patron_id, read_only=True)
+    # Overdue is decided against one clock reading in SQL; dates are parsed only if read
+    loans = _fetch_records(conn, Loan, '''
+        SELECT br.book_id, b.title, b.author, br.borrow_date, br.due_date, br.due_date < ? AS is_overdue
         FROM borrow_records br 
         JOIN books b ON br.book_id = b.id 
         WHERE br.patron_id = ? AND br.return_date IS NULL
         ORDER BY br.borrow_date
-    ''', (patron_id,)).fetchall()
+    ''', (datetime.now().isoformat(), patron_id))
     conn.close()
-    
-    borrowed_books = []
-    for record in records:
-        borrowed_books.append({
-            'book_id': record['book_id'],
-            'title': record['title'],
-            'author': record['author'],
-            'borrow_date': datetime.fromisoformat(record['borrow_date']),
-            'due_date': datetime.fromisoformat(record['due_date']),
-            'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
-        })
-    
-    return borrowed_books
+    return loans
 
 def get_patron_borrow_count(patron_id: str) -> int:
     """Get the number of books currently borrowed by a patron."""
-    conn = get_db_connection()
+    conn = get_patron_connection(patron_id, read_only=True)
     count = conn.execute('''
         SELECT COUNT(*) as count FROM borrow_records 
         WHERE patron_id = ? AND return_date IS NULL
@@ -140,62 +863,673 @@ def get_patron_borrow_count(patron_id: str) -> int:
     conn.close()
     return count
 
+def get_library_loan_summary() -> Dict:
+    """Library-wide loan totals, fanned out across every borrow_records shard."""
+    now = datetime.now().isoformat()
+    rows = query_all_shards('''
+        SELECT COUNT(*) AS active,
+               COALESCE(SUM(due_date < ?), 0) AS overdue,
+               COUNT(DISTINCT patron_id) AS patrons
+        FROM borrow_records
+        WHERE return_date IS NULL
+    ''', (now,))
+    return {
+        'active_loans': sum(row['active'] for row in rows),
+        'overdue_loans': sum(row['overdue'] for row in rows),
+        # A patron lives in exactly one shard, so per-shard distinct counts add up
+        'patrons_with_loans': sum(row['patrons'] for row in rows),
+    }
+
+def get_borrow_counts() -> Dict[int, int]:
+    """Number of times each book has been borrowed, including archived loans."""
+    rows = query_all_shards('''
+        SELECT book_id, SUM(loans) AS loans FROM (
+            SELECT book_id, COUNT(*) AS loans FROM borrow_records GROUP BY book_id
+            UNION ALL
+            SELECT book_id, COUNT(*) AS loans FROM borrow_history_archive GROUP BY book_id
+        ) GROUP BY book_id
+    ''')
+    counts: Dict[int, int] = {}
+    for row in rows:
+        counts[row['book_id']] = counts.get(row['book_id'], 0) + row['loans']
+    return counts
+
+def archive_returned_records(older_than_days: int = 365, batch_size: int = 500) -> int:
+    """
+    Move returned loans older than ``older_than_days`` into borrow_history_archive.
+
+    Works through every borrow_records file in small batches, each moved in
+    its own transaction (through the write scheduler when it is running), so
+    concurrent borrows and returns are never blocked for long. Returns the
+    number of records archived.
+    """
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
+    archived_at = datetime.now().isoformat()
+
+    def move_batch(conn):
+        ids = [row[0] for row in conn.execute('''
+            SELECT id FROM borrow_records
+            WHERE return_date IS NOT NULL AND return_date < ?
+            ORDER BY id
+            LIMIT ?
+        ''', (cutoff, batch_size))]
+        if not ids:
+            return 0
+        placeholders = ','.join('?' * len(ids))
+        conn.execute(f'''
+            INSERT INTO borrow_history_archive (source_id, patron_id, book_id, borrow_date, due_date, return_date, archived_at)
+            SELECT id, patron_id, book_id, borrow_date, due_date, return_date, ?
+            FROM borrow_records WHERE id IN ({placeholders})
+        ''', (archived_at, *ids))
+        conn.execute(f'DELETE FROM borrow_records WHERE id IN ({placeholders})', ids)
+        return len(ids)
+
+    total = 0
+    for path in borrow_record_paths():
+        while True:
+            moved = _run_write(move_batch, path)
+            total += moved
+            if moved < batch_size:
+                break
+    return total
+
+def scan_new_overdues(now: Optional[datetime] = None) -> int:
+    """
+    Record loans that became overdue since the previous scan in overdue_events.
+
+    Each borrow_records file keeps a high-water mark in scan_checkpoints. A
+    scan reads only the open loans due in [mark, now) through the partial
+    index idx_borrow_records_open_due, so its cost follows the number of new
+    overdues rather than the number of loans; the first scan catches up on
+    every open overdue loan. Concurrent scans (one per worker) are harmless:
+    events are unique per loan and the mark only moves forward. Returns the
+    number of events recorded.
+    """
+    until = (now or datetime.now()).isoformat()
+
+    def operation(conn):
+        row = conn.execute("SELECT position FROM scan_checkpoints WHERE name = 'overdue'").fetchone()
+        since = row['position'] if row else ''
+        if since >= until:
+            return 0
+        recorded = conn.execute('''
+            INSERT OR IGNORE INTO overdue_events (patron_id, book_id, due_date, detected_at)
+            SELECT patron_id, book_id, due_date, ? FROM borrow_records
+            WHERE return_date IS NULL AND due_date >= ? AND due_date < ?
+        ''', (until, since, until)).rowcount
+        conn.execute('''
+            INSERT INTO scan_checkpoints (name, position) VALUES ('overdue', ?)
+            ON CONFLICT (name) DO UPDATE SET position = MAX(position, excluded.position)
+        ''', (until,))
+        return recorded
+
+    return sum(_run_write(operation, path) for path in borrow_record_paths())
+
+def get_overdue_events(detected_after: str = '') -> List[Dict]:
+    """Overdue events detected after an ISO timestamp, oldest first, across shards."""
+    rows = query_all_shards('''
+        SELECT patron_id, book_id, due_date, detected_at FROM overdue_events
+        WHERE detected_at > ?
+    ''', (detected_after,))
+    return sorted((dict(row) for row in rows), key=lambda row: (row['detected_at'], row['due_date']))
+
+# Hold queues
+
+def _queue_position(conn, book_id: int, hold_id: int) -> int:
+    return conn.execute('''
+        SELECT COUNT(*) FROM holds WHERE book_id = ? AND status = 'waiting' AND id <= ?
+    ''', (book_id, hold_id)).fetchone()[0]
+
+def _hand_off_copy(conn, book_id: int, expires_at: str) -> Optional[str]:
+    """Reserve a freed copy for the head of the book's queue, or shelve it when nobody waits."""
+    shelved = conn.execute('''
+        UPDATE books SET available_copies = available_copies + 1
+        WHERE id = ? AND NOT EXISTS (SELECT 1 FROM holds WHERE book_id = ? AND status = 'waiting')
+    ''', (book_id, book_id)).rowcount
+    if shelved:
+        return None
+    head = conn.execute('''
+        UPDATE holds SET status = 'ready', expires_at = ?
+        WHERE id = (SELECT id FROM holds WHERE book_id = ? AND status = 'waiting' ORDER BY id LIMIT 1)
+        RETURNING patron_id
+    ''', (expires_at, book_id)).fetchone()
+    return head['patron_id'] if head else None
+
+def _expire_ready_holds(conn, now: str, expires_at: str, book_id: Optional[int] = None) -> int:
+    if book_id is None:
+        expired = conn.execute('''
+            SELECT id, book_id FROM holds WHERE status = 'ready' AND expires_at < ? ORDER BY expires_at
+        ''', (now,)).fetchall()
+    else:
+        expired = conn.execute('''
+            SELECT id, book_id FROM holds WHERE book_id = ? AND status = 'ready' AND expires_at < ?
+        ''', (book_id, now)).fetchall()
+    for hold in expired:
+        conn.execute("UPDATE holds SET status = 'expired' WHERE id = ?", (hold['id'],))
+        _hand_off_copy(conn, hold['book_id'], expires_at)
+    return len(expired)
+
+def insert_hold(patron_id: str, book_id: int, now: datetime, expires_at: datetime) -> Tuple[str, int]:
+    """
+    Queue a hold for a book with no available copy.
+
+    Returns ('placed', position), ('duplicate', position) when the patron
+    already holds the book (position 0 once their copy is ready), or
+    ('available', 0) when a copy can be borrowed instead.
+    """
+    expired = []
+
+    def operation(conn):
+        expired.append(_expire_ready_holds(conn, now.isoformat(), expires_at.isoformat(), book_id))
+        existing = conn.execute('''
+            SELECT id, status FROM holds
+            WHERE patron_id = ? AND book_id = ? AND status IN ('waiting', 'ready')
+        ''', (patron_id, book_id)).fetchone()
+        if existing is not None:
+            position = 0 if existing['status'] == 'ready' else _queue_position(conn, book_id, existing['id'])
+            return 'duplicate', position
+        available = conn.execute('SELECT available_copies FROM books WHERE id = ?', (book_id,)).fetchone()
+        if available is None or available[0] > 0:
+            return 'available', 0
+        hold_id = conn.execute('''
+            INSERT INTO holds (patron_id, book_id, created_at) VALUES (?, ?, ?)
+        ''', (patron_id, book_id, now.isoformat())).lastrowid
+        return 'placed', _queue_position(conn, book_id, hold_id)
+
+    result = _run_write(operation)
+    if any(expired):
+        _notify_book_write()
+    return result
+
+def settle_ready_holds(patron_id: str, book_id: int, now: datetime, expires_at: datetime) -> bool:
+    """
+    Pass on the book's lapsed ready holds, then say whether a copy is reserved for the patron.
+
+    Runs on every borrow, so an uncollected copy moves along its queue even
+    when no background scan runs. Only reads unless a pickup window has lapsed.
+    """
+    expired = []
+
+    def operation(conn):
+        ready = conn.execute('''
+            SELECT patron_id, expires_at FROM holds WHERE book_id = ? AND status = 'ready'
+        ''', (book_id,)).fetchall()
+        if any(hold['expires_at'] < now.isoformat() for hold in ready):
+            expired.append(_expire_ready_holds(conn, now.isoformat(), expires_at.isoformat(), book_id))
+            ready = conn.execute('''
+                SELECT patron_id, expires_at FROM holds WHERE book_id = ? AND status = 'ready'
+            ''', (book_id,)).fetchall()
+        return any(hold['patron_id'] == patron_id for hold in ready)
+
+    result = _run_write(operation)
+    if expired:
+        _notify_book_write()
+    return result
+
+def claim_ready_hold(patron_id: str, book_id: int, now: datetime) -> Optional[int]:
+    """
+    Mark the patron's ready hold fulfilled; the reserved copy becomes their loan.
+
+    Returns the claimed hold's id, or None when the patron has no ready hold.
+    Loans may live in a shard, so the caller records the loan in a separate
+    transaction and gives the copy back with restore_hold if that fails.
+    """
+    def operation(conn):
+        row = conn.execute('''
+            UPDATE holds SET status = 'fulfilled'
+            WHERE patron_id = ? AND book_id = ? AND status = 'ready' AND expires_at >= ?
+            RETURNING id
+        ''', (patron_id, book_id, now.isoformat())).fetchone()
+        return row['id'] if row else None
+    try:
+        return _run_write(operation)
+    except Exception as e:
+        return None
+
+def restore_hold(hold_id: int) -> bool:
+    """Put a claimed hold back to ready, keeping its pickup deadline, when its loan was not recorded."""
+    def operation(conn):
+        conn.execute("UPDATE holds SET status = 'ready' WHERE id = ? AND status = 'fulfilled'", (hold_id,))
+    try:
+        _run_write(operation)
+    except Exception as e:
+        return False
+    return True
+
+def release_copy(book_id: int, now: datetime, expires_at: datetime) -> Tuple[bool, Optional[str]]:
+    """
+    Put a returned copy back: to the next hold in the book's queue, or on the shelf.
+
+    The queue head is read and reserved in the same transaction as the
+    availability update. Returns (success, patron_id the copy is reserved for).
+    """
+    def operation(conn):
+        reserved_for = _hand_off_copy(conn, book_id, expires_at.isoformat())
+        if reserved_for is not None:
+            # The book has a queue; pass on copies whose pickup window lapsed as well
+            _expire_ready_holds(conn, now.isoformat(), expires_at.isoformat(), book_id)
+        return reserved_for
+    try:
+        reserved_for = _run_write(operation)
+    except Exception as e:
+        return False, None
+    _notify_book_write()
+    return True, reserved_for
+
+def expire_holds(now: datetime, expires_at: datetime) -> int:
+    """
+    Expire ready holds past their pickup deadline, passing each copy along its queue.
+
+    Reads only the expired range of idx_holds_expiry. Returns the number of holds expired.
+    """
+    expired = _run_write(lambda conn: _expire_ready_holds(conn, now.isoformat(), expires_at.isoformat()))
+    if expired:
+        _notify_book_write()
+    return expired
+
 def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
     """Insert a new book into the database."""
-    conn = get_db_connection()
-    try:
+    def operation(conn):
         conn.execute('''
             INSERT INTO books (title, author, isbn, total_copies, available_copies)
             VALUES (?, ?, ?, ?, ?)
         ''', (title, author, isbn, total_copies, available_copies))
-        conn.commit()
-        conn.close()
-        return True
+    try:
+        _run_write(operation)
     except Exception as e:
-        conn.close()
         return False
+    _notify_book_write()
+    return True
 
 def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
     """Insert a new borrow record into the database."""
-    conn = get_db_connection()
-    try:
-        conn.execute('''
+    def operation(conn):
+        return conn.execute('''
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
-        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
-        conn.commit()
-        conn.close()
+            RETURNING patron_id, book_id, borrow_date, due_date, return_date
+        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat())).fetchall()
+    try:
+        _run_loan_write(operation, patron_id, 'insert')
         return True
     except Exception as e:
-        conn.close()
         return False
 
 def update_book_availability(book_id: int, change: int) -> bool:
     """Update the available copies of a book by a given amount (+1 for return, -1 for borrow)."""
-    conn = get_db_connection()
-    try:
+    def operation(conn):
         conn.execute('''
             UPDATE books SET available_copies = available_copies + ? WHERE id = ?
         ''', (change, book_id))
-        conn.commit()
-        conn.close()
-        return True
+    try:
+        _run_write(operation)
     except Exception as e:
-        conn.close()
         return False
+    _notify_book_write()
+    return True
 
 def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime) -> bool:
     """Update the return date for a borrow record."""
-    conn = get_db_connection()
-    try:
-        conn.execute('''
+    def operation(conn):
+        return conn.execute('''
             UPDATE borrow_records 
             SET return_date = ? 
             WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
-        ''', (return_date.isoformat(), patron_id, book_id))
-        conn.commit()
-        conn.close()
+            RETURNING patron_id, book_id, borrow_date, due_date, return_date
+        ''', (return_date.isoformat(), patron_id, book_id)).fetchall()
+    try:
+        _run_loan_write(operation, patron_id, 'update')
         return True
     except Exception as e:
-        conn.close()
         return False
+
+# Change feed
+
+def _queue_loan_events(conn, loans, action: str) -> None:
+    conn.executemany('''
+        INSERT INTO loan_outbox (event_key, entity_key, action, data) VALUES (?, ?, ?, ?)
+    ''', [
+        (uuid.uuid4().hex, f"{loan['patron_id']}:{loan['book_id']}:{loan['borrow_date']}", action,
+         json.dumps(dict(loan)))
+        for loan in loans
+    ])
+
+def _append_loan_events(conn, events) -> int:
+    return conn.executemany('''
+        INSERT OR IGNORE INTO events (entity, entity_key, action, data, created_at, outbox_key)
+        VALUES ('loan', ?, ?, ?, ?, ?)
+    ''', [(event['entity_key'], event['action'], event['data'], event['created_at'], event['event_key'])
+          for event in events]).rowcount
+
+def _run_loan_write(operation: Callable, patron_id: str, action: str) -> None:
+    """
+    Run a borrow_records write that returns the loans it changed.
+
+    In DATABASE, triggers log the change in the write's own transaction. A
+    shard queues its loans in loan_outbox in that transaction instead, and
+    the outbox is drained into DATABASE once the shard commits. A failed
+    drain is logged and retried by the next one; it never fails the write.
+    """
+    path = _borrow_records_path(patron_id)
+    if path == DATABASE:
+        _run_write(operation, path)
+        return
+
+    def queued(conn):
+        loans = operation(conn)
+        _queue_loan_events(conn, loans, action)
+        return loans
+
+    if _run_write(queued, path):
+        try:
+            drain_loan_outbox([path])
+        except Exception:
+            logger.exception("Moving loan events from %s to the change feed failed", path)
+
+def drain_loan_outbox(paths: Optional[Iterable[str]] = None) -> int:
+    """
+    Move loan events queued in shard outboxes into events, oldest first.
+
+    Runs after every shard loan write and at startup, in every worker. An
+    event is appended once however often it is read: events keeps its
+    outbox event_key under a unique index, so a repeat after a crash between
+    appending and clearing, or from another worker draining the same rows,
+    is ignored. Returns the number of events appended.
+    """
+    moved = 0
+    for path in borrow_record_paths() if paths is None else paths:
+        if path == DATABASE:
+            continue
+        with _outbox_lock:
+            conn = _checkout(True, path)
+            try:
+                events = conn.execute(
+                    'SELECT id, event_key, entity_key, action, data, created_at FROM loan_outbox ORDER BY id'
+                ).fetchall()
+            finally:
+                conn.close()
+            if not events:
+                continue
+            moved += _run_write(lambda conn: _append_loan_events(conn, events))
+            last_id = events[-1]['id']
+            _run_write(lambda conn: conn.execute('DELETE FROM loan_outbox WHERE id <= ?', (last_id,)), path)
+    return moved
+
+def get_changes(since: int = 0, limit: int = 100) -> List[Dict]:
+    """Change events with a sequence number above ``since``, in sequence order."""
+    rows = iter_query('''
+        SELECT seq, entity, entity_key, action, data, created_at FROM events
+        WHERE seq > ? ORDER BY seq LIMIT ?
+    ''', (since, limit))
+    return [dict(row, data=json.loads(row['data']) if row['data'] is not None else None) for row in rows]
+
+def get_latest_change_seq() -> int:
+    conn = get_read_connection()
+    try:
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM events").fetchone()[0]
+    finally:
+        conn.close()
+
+def compact_events(keep_latest: int = 10000, batch_size: int = 5000) -> int:
+    """
+    Drop superseded events older than the newest ``keep_latest`` ones.
+
+    An event is superseded when a later event exists for the same entity, so
+    the log keeps the latest state of every book and loan (deletes included)
+    and a consumer replaying from any sequence number, even 0, still ends up
+    in sync. Works in batches; returns the number of events removed.
+    """
+    def delete_batch(conn):
+        horizon = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM events").fetchone()[0] - keep_latest
+        return conn.execute('''
+            DELETE FROM events WHERE seq IN (
+                SELECT e.seq FROM events e
+                WHERE e.seq <= ? AND EXISTS (
+                    SELECT 1 FROM events later
+                    WHERE later.entity = e.entity AND later.entity_key = e.entity_key AND later.seq > e.seq
+                )
+                ORDER BY e.seq
+                LIMIT ?
+            )
+        ''', (horizon, batch_size)).rowcount
+
+    total = 0
+    while True:
+        removed = _run_write(delete_batch)
+        total += removed
+        if removed < batch_size:
+            return total
+
+# Group-commit write scheduler
+
+class WriteScheduler:
+    """
+    Single writer thread that applies queued write operations in batches.
+
+    Operations are callables taking a connection. Each batch runs in one
+    BEGIN IMMEDIATE transaction and is closed by a single COMMIT once
+    batch_size operations are queued or batch_window seconds have passed since
+    the first one arrived. Every operation runs inside its own SAVEPOINT so a
+    failing operation is rolled back without affecting the rest of the batch.
+    """
+
+    _STOP = object()
+
+    def __init__(self, path: str, batch_size: int = 64, batch_window: float = 0.002):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='library-write-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Drain queued operations and stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, operation: Callable) -> Future:
+        future: Future = Future()
+        self._queue.put((operation, future))
+        return future
+
+    def _collect(self) -> Tuple[List[Tuple[Callable, Future]], bool]:
+        batch = []
+        first = self._queue.get()
+        if first is self._STOP:
+            return batch, True
+        batch.append(first)
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        conn = connect(self.path, factory=LibraryConnection, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        stopping = False
+        try:
+            while not stopping:
+                batch, stopping = self._collect()
+                if batch:
+                    self._apply(conn, batch)
+        finally:
+            conn.close()
+
+    def _apply(self, conn: sqlite3.Connection, batch: List[Tuple[Callable, Future]]) -> None:
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for operation, future in batch:
+                conn.execute('SAVEPOINT write_op')
+                try:
+                    outcomes.append((future, operation(conn), None))
+                except Exception as exc:
+                    conn.execute('ROLLBACK TO write_op')
+                    outcomes.append((future, None, exc))
+                conn.execute('RELEASE write_op')
+            conn.commit()
+        except Exception as exc:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_write_schedulers: Dict[str, WriteScheduler] = {}
+
+
+def start_write_scheduler(batch_size: int = 64, batch_window: float = 0.002) -> WriteScheduler:
+    """Route write helpers through one group-commit writer per database file (main and shards)."""
+    stop_write_scheduler()
+    for path in dict.fromkeys([DATABASE] + borrow_record_paths()):
+        scheduler = WriteScheduler(path, batch_size, batch_window)
+        scheduler.start()
+        _write_schedulers[path] = scheduler
+    return _write_schedulers[DATABASE]
+
+
+def stop_write_scheduler() -> None:
+    while _write_schedulers:
+        _, scheduler = _write_schedulers.popitem()
+        scheduler.stop()
+
+
+# Pools a forked child inherited, referenced for its lifetime so their
+# connections are never finalized there
+_inherited_pools: List[Dict[Tuple[str, bool], ConnectionPool]] = []
+
+
+def _reinit_after_fork() -> None:
+    """
+    Give a forked worker its own pools and writer threads.
+
+    Connections inherited from the parent are never closed in the child:
+    that could checkpoint or unlock the parent's WAL. Dropping the pools
+    would let garbage collection close them, so they are parked in
+    _inherited_pools instead. A writer thread's connection stays referenced
+    by that thread's frame, which the child neither runs nor frees.
+    gunicorn.conf.py closes the master's pools before forking, so workers
+    normally inherit none.
+    """
+    global _pools, _pools_lock, _outbox_lock, _write_schedulers
+    _inherited_pools.append(_pools)
+    _pools = {}
+    _pools_lock = threading.Lock()
+    _outbox_lock = threading.Lock()
+    inherited, _write_schedulers = _write_schedulers, {}
+    for path, scheduler in inherited.items():
+        _write_schedulers[path] = WriteScheduler(path, scheduler.batch_size, scheduler.batch_window)
+        _write_schedulers[path].start()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+
+def _run_write(operation: Callable, path: Optional[str] = None):
+    """Run a write operation through the file's scheduler if active, otherwise in its own transaction."""
+    path = path or DATABASE
+    scheduler = _write_schedulers.get(path)
+    if scheduler is not None:
+        return scheduler.submit(operation).result()
+    conn = _checkout(False, path)
+    try:
+        result = operation(conn)
+        conn.commit()
+        return result
+    finally:
+        conn.close()
+
+
+# Resharding
+
+_SHARDED_TABLES = {
+    'borrow_records': ('patron_id', 'book_id', 'borrow_date', 'due_date', 'return_date'),
+    'borrow_history_archive': ('source_id', 'patron_id', 'book_id', 'borrow_date', 'due_date', 'return_date', 'archived_at'),
+    'overdue_events': ('patron_id', 'book_id', 'due_date', 'detected_at'),
+}
+
+def reshard(new_count: int) -> Dict[str, int]:
+    """
+    Move borrow_records into a layout with ``new_count`` shards.
+
+    Run with the application stopped and a backup taken: records (current
+    and archived) are copied to their new file before being deleted from the
+    old one, so an interrupted run can leave duplicates but never loses a
+    loan. Record IDs are reassigned by the destination file.
+    """
+    global SHARD_COUNT
+    if new_count < 1:
+        raise ValueError("Shard count must be at least 1.")
+    drain_loan_outbox()
+    stop_write_scheduler()
+    close_pools()
+    old_paths = borrow_record_paths()
+    SHARD_COUNT = new_count
+    if new_count > 1:
+        _init_shards()
+
+    moved = 0
+    for source in old_paths:
+        for table, columns in _SHARDED_TABLES.items():
+            moved += _move_shard_rows(source, table, columns)
+
+    conn = connect(DATABASE)
+    try:
+        conn.execute("INSERT OR REPLACE INTO library_settings (key, value) VALUES ('shard_count', ?)", (str(new_count),))
+        conn.commit()
+    finally:
+        conn.close()
+
+    # Drop shard files that are no longer part of the layout (now empty)
+    for path in set(old_paths) - set(borrow_record_paths()) - {DATABASE}:
+        remove_database(path)
+    return {'moved': moved, 'shards': new_count}
+
+
+def _move_shard_rows(source: str, table: str, columns: Tuple[str, ...]) -> int:
+    """Move the rows of ``table`` in ``source`` whose patron now routes elsewhere."""
+    conn = connect(source)
+    conn.row_factory = sqlite3.Row
+    moved = 0
+    try:
+        by_target: Dict[str, List[sqlite3.Row]] = {}
+        for row in conn.execute(f"SELECT id, {', '.join(columns)} FROM {table}"):
+            target = _borrow_records_path(row['patron_id'])
+            if target != source:
+                by_target.setdefault(target, []).append(row)
+        for target, rows in by_target.items():
+            target_conn = connect(target)
+            try:
+                target_conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    [tuple(row[column] for column in columns) for row in rows]
+                )
+                target_conn.commit()
+            finally:
+                target_conn.close()
+            conn.executemany(f'DELETE FROM {table} WHERE id = ?', [(row['id'],) for row in rows])
+            conn.commit()
+            moved += len(rows)
+    finally:
+        conn.close()
+    return moved
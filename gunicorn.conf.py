@@ -0,0 +1,58 @@
+"""
+Gunicorn configuration for the pre-fork production server.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Tuned through environment variables:
+    WEB_WORKERS            worker processes (default: CPU count)
+    WEB_THREADS            threads per worker (default: 4); each open availability stream
+                           holds one, up to AVAILABILITY_STREAM_MAX_CLIENTS per worker
+    WEB_BIND               listen address (default: 0.0.0.0:5000)
+    WEB_MAX_REQUESTS       recycle a worker after this many requests (default: 5000, 0 disables)
+    WEB_PRELOAD            load the app once in the master before forking (default: true)
+    LIBRARY_METRICS_MULTIPROCESS_DIR
+                           where workers share /metrics totals (default: a new temporary directory)
+
+Send SIGHUP to the master for a graceful reload: new workers are started with
+fresh code and configuration while the old ones finish their requests.
+"""
+
+import os
+import tempfile
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_WORKERS', os.cpu_count() or 1))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+
+# Worker recycling bounds memory growth; jitter avoids all workers restarting together
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 5000))
+max_requests_jitter = max(max_requests // 10, 0)
+
+graceful_timeout = 30
+timeout = 60
+keepalive = 5
+
+# Preloading shares the imported code and templates between workers. Database
+# pools, the write scheduler and metric shards are recreated in each worker
+# after fork (see database._reinit_after_fork).
+preload_app = os.environ.get('WEB_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+# Each worker exports its metrics here, so a scrape served by any worker reports
+# the sum over all of them. Kept across SIGHUP reloads (the master's environment
+# persists), so counters only reset when the server restarts.
+os.environ.setdefault('LIBRARY_METRICS_MULTIPROCESS_DIR', tempfile.mkdtemp(prefix='library_metrics_'))
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', None)
+errorlog = '-'
+
+
+def pre_fork(server, worker):
+    # With preload the master may hold pooled connections from app start-up; closing
+    # them here, in their owner, means no worker inherits an open database handle
+    import database
+    database.close_pools()
+
+
+def post_fork(server, worker):
+    server.log.info("Worker %s ready with per-process connection pools", worker.pid)
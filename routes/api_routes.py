@@ -2,11 +2,25 @@
 API Routes - JSON API endpoints
 """
 
-from flask import Blueprint, jsonify, request
-from services.library_service import calculate_late_fee_for_book, search_books_in_catalog
+from flask import Blueprint, Response, current_app, jsonify, request
+from services.library_service import (
+    borrow_book_by_patron,
+    calculate_late_fee_for_book,
+    calculate_late_fees,
+    get_change_feed,
+    get_loan_summary_report,
+    get_patron_status_report,
+    get_search_suggestions,
+    return_book_by_patron,
+    search_books_in_catalog,
+    suggestions_available
+)
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+MAX_LATE_FEE_BATCH = 1000
+MAX_CHANGES_PAGE = 1000
+
 @api_bp.route('/late_fee/<patron_id>/<int:book_id>')
 def get_late_fee(patron_id, book_id):
     """
@@ -16,6 +30,86 @@ def get_late_fee(patron_id, book_id):
     result = calculate_late_fee_for_book(patron_id, book_id)
     return jsonify(result), 501 if 'not implemented' in result.get('status', '') else 200
 
+@api_bp.route('/late_fees', methods=['POST'])
+def get_late_fees():
+    """
+    Late fees for a batch of loans, one result per (patron_id, book_id) pair.
+    Batch form of R4: Late Fee Calculation, resolved in one query per shard
+    """
+    payload = request.get_json(silent=True)
+    loans = payload.get('loans') if isinstance(payload, dict) else payload
+    if not isinstance(loans, list):
+        return jsonify({'error': 'Request body must be a JSON list of [patron_id, book_id] pairs'}), 400
+    if len(loans) > MAX_LATE_FEE_BATCH:
+        return jsonify({'error': f'At most {MAX_LATE_FEE_BATCH} loans per request'}), 400
+
+    pairs = []
+    for loan in loans:
+        if isinstance(loan, dict):
+            pairs.append((loan.get('patron_id'), loan.get('book_id')))
+        elif isinstance(loan, list) and len(loan) == 2:
+            pairs.append((loan[0], loan[1]))
+        else:
+            return jsonify({'error': 'Each loan must be a [patron_id, book_id] pair'}), 400
+    # Non-string patron ids fail validation like malformed strings do
+    fees = calculate_late_fees([
+        (patron_id if isinstance(patron_id, str) else None, book_id) for patron_id, book_id in pairs
+    ])
+    results = [
+        dict(result, patron_id=patron_id, book_id=book_id)
+        for (patron_id, book_id), result in zip(pairs, fees)
+    ]
+    return jsonify({'results': results, 'count': len(results)})
+
+def _loan_request():
+    """patron_id and book_id from a JSON body or form fields, as stripped strings."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = request.form
+    return str(data.get('patron_id', '')).strip(), str(data.get('book_id', '')).strip()
+
+@api_bp.route('/borrow', methods=['POST'])
+def borrow_api():
+    """
+    Borrow a book and report the outcome, unlike the redirecting /borrow form.
+    API endpoint for R3: Book Borrowing
+    """
+    patron_id, book_id = _loan_request()
+    try:
+        book_id = int(book_id)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid book ID.'}), 400
+    success, message = borrow_book_by_patron(patron_id, book_id)
+    return jsonify({'success': success, 'message': message}), 200 if success else 400
+
+@api_bp.route('/return', methods=['POST'])
+def return_api():
+    """
+    Return a book and report the outcome.
+    API endpoint for R4: Book Return Processing
+    """
+    patron_id, book_id = _loan_request()
+    if not book_id:
+        return jsonify({'success': False, 'message': 'Invalid book ID.'}), 400
+    success, message = return_book_by_patron(patron_id, book_id)
+    return jsonify({'success': success, 'message': message}), 200 if success else 400
+
+@api_bp.route('/loans/summary')
+def loan_summary():
+    """
+    Library-wide loan totals: open loans, overdue loans and patrons with loans.
+    """
+    return jsonify(get_loan_summary_report())
+
+@api_bp.route('/patron/<patron_id>/status')
+def patron_status(patron_id):
+    """
+    Current loans with late fees, totals and borrowing history for a patron.
+    API endpoint for R7: Patron Status Report
+    """
+    report = get_patron_status_report(patron_id)
+    return jsonify(report), 200 if report['status'] == 'success' else 400
+
 @api_bp.route('/search')
 def search_books_api():
     """
@@ -37,3 +131,99 @@ def search_books_api():
         'results': books,
         'count': len(books)
     })
+
+@api_bp.route('/suggest')
+def suggest():
+    """
+    Prefix completions for search-as-you-type, most borrowed first.
+    Served from memory; enabled by setting SUGGEST_ENABLED in the app configuration.
+    """
+    prefix = request.args.get('q', '')
+    suggest_type = request.args.get('type', 'title')
+    limit = request.args.get('limit', 10, type=int)
+    
+    if suggest_type not in ('title', 'author'):
+        return jsonify({'error': 'Suggestion type must be title or author'}), 400
+    if not suggestions_available():
+        return jsonify({'error': 'Suggestions are not enabled'}), 404
+    
+    suggestions = get_search_suggestions(prefix, suggest_type, limit)
+    return jsonify({
+        'query': prefix,
+        'type': suggest_type,
+        'suggestions': suggestions,
+        'count': len(suggestions)
+    })
+
+@api_bp.route('/changes')
+def changes():
+    """
+    Book and loan changes after sequence number `since`, oldest first.
+    Consumers store `next_since` and poll again; starting from 0 replays the
+    latest state of every book and loan.
+    """
+    since = request.args.get('since', 0, type=int)
+    limit = request.args.get('limit', 100, type=int)
+    if since < 0 or not 1 <= limit <= MAX_CHANGES_PAGE:
+        return jsonify({'error': f'since must be >= 0 and limit between 1 and {MAX_CHANGES_PAGE}'}), 400
+    
+    return jsonify(get_change_feed(since, limit))
+
+@api_bp.route('/stream/availability')
+def availability_stream():
+    """
+    Server-Sent Events stream of book availability as borrows and returns commit.
+    Event ids are change-feed sequence numbers, so a reconnecting EventSource
+    resumes after its Last-Event-ID. Enabled by setting AVAILABILITY_STREAM_ENABLED;
+    a worker already serving AVAILABILITY_STREAM_MAX_CLIENTS streams answers 503.
+    """
+    if not current_app.config['AVAILABILITY_STREAM_ENABLED']:
+        return jsonify({'error': 'Availability stream is not enabled'}), 404
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    try:
+        last_event_id = int(last_event_id) if last_event_id is not None else None
+    except ValueError:
+        last_event_id = None
+    
+    from services import availability_stream
+    publisher = availability_stream.get_publisher()
+    subscriber = publisher.subscribe(int(current_app.config['AVAILABILITY_STREAM_MAX_PENDING']),
+                                     current_app.config['AVAILABILITY_STREAM_MAX_CLIENTS'])
+    if subscriber is None:
+        # Every stream holds a worker thread; past the cap the client waits and retries
+        return Response(f"retry: {availability_stream.RETRY_MS}\n\n", status=503, mimetype='text/event-stream',
+                        headers={'Retry-After': str(availability_stream.RETRY_MS // 1000),
+                                 'Cache-Control': 'no-cache'})
+    events = availability_stream.stream(
+        publisher,
+        last_event_id,
+        float(current_app.config['AVAILABILITY_STREAM_HEARTBEAT_SECONDS']),
+        int(current_app.config['AVAILABILITY_STREAM_MAX_PENDING']),
+        subscriber
+    )
+    response = Response(events, mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Releases the slot even when the client leaves before the stream starts
+    response.call_on_close(lambda: publisher.unsubscribe(subscriber))
+    return response
+
+@api_bp.route('/debug/slow_queries')
+def slow_queries():
+    """
+    Slow-query log aggregated per statement.
+    Enabled by setting SLOW_QUERY_THRESHOLD_MS in the app configuration.
+    """
+    from services.slow_query_service import get_slow_query_summary
+    return jsonify(get_slow_query_summary())
+
+@api_bp.route('/debug/catalog_snapshot')
+def catalog_snapshot():
+    """
+    Size of the in-process catalog snapshot against the dict-per-row catalog.
+    Enabled by setting CATALOG_SNAPSHOT_ENABLED in the app configuration.
+    """
+    from services.catalog_service import get_catalog_snapshot
+    snapshot = get_catalog_snapshot()
+    if snapshot is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(snapshot.memory_footprint(), enabled=True))
@@ -2,9 +2,10 @@
 Catalog Routes - Book catalog related endpoints
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import get_all_books
-from services.library_service import add_book_to_catalog
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash
+from markupsafe import Markup
+from services.library_service import add_book_to_catalog, get_catalog_books, iter_catalog_books
+from .streaming import peek_rows, stream_page
 
 catalog_bp = Blueprint('catalog', __name__)
 
@@ -19,8 +20,35 @@ def catalog():
     Display all books in the catalog.
     Implements R2: Book Catalog Display
     """
-    books = get_all_books()
-    return render_template('catalog.html', books=books)
+    stream_context = _availability_stream_context()
+    if current_app.config['STREAM_TEMPLATES']:
+        # Send the page head and first rows while later rows are still being read
+        return stream_page('catalog.html', books=peek_rows(iter_catalog_books()), catalog_row=_cached_row_renderer(),
+                           **stream_context)
+    books = get_catalog_books()
+    return render_template('catalog.html', books=books, catalog_row=_cached_row_renderer(), **stream_context)
+
+def _availability_stream_context():
+    """Where the page's availability stream starts, read before the rows so no change falls in between."""
+    if not current_app.config['AVAILABILITY_STREAM_ENABLED']:
+        return {}
+    from services import availability_stream
+    return {'availability_since': availability_stream.latest_event_id(),
+            'availability_retry_ms': availability_stream.RETRY_MS}
+
+def _cached_row_renderer():
+    """Row renderer going through the fragment cache, or None to render rows inline."""
+    cache = current_app.extensions.get('fragment_cache')
+    if cache is None:
+        return None
+    render_row = current_app.jinja_env.get_template('_catalog_row.html').module.catalog_row
+    
+    def catalog_row(book):
+        # Row version: every field the row renders, so a changed availability re-renders it
+        version = (book['title'], book['author'], book['isbn'], book['total_copies'], book['available_copies'])
+        return Markup(cache.get_or_render(('catalog_row', book['id']), version, lambda: str(render_row(book))))
+    
+    return catalog_row
 
 @catalog_bp.route('/add_book', methods=['GET', 'POST'])
 def add_book():
@@ -0,0 +1,13 @@
+"""
+Metrics Routes - Prometheus scrape endpoint
+"""
+
+from flask import Blueprint, Response
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """Expose collected request and database metrics in Prometheus text format."""
+    from services.metrics_service import registry
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
@@ -2,8 +2,14 @@
 Search Routes - Book search functionality
 """
 
-from flask import Blueprint, render_template, request, flash
-from services.library_service import search_books_in_catalog
+from flask import Blueprint, current_app, render_template, request, flash
+from services.library_service import (
+    fuzzy_search_available,
+    iter_search_results,
+    search_books_in_catalog,
+    suggestions_available
+)
+from .streaming import peek_rows, stream_page
 
 search_bp = Blueprint('search', __name__)
 
@@ -15,14 +21,26 @@ def search_books():
     """
     search_term = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'title')
+    fuzzy_enabled = fuzzy_search_available()
+    suggest_enabled = suggestions_available()
     
     if not search_term:
-        return render_template('search.html', books=[], search_term='', search_type=search_type)
+        return render_template('search.html', books=[], search_term='', search_type=search_type,
+                               fuzzy_enabled=fuzzy_enabled, suggest_enabled=suggest_enabled)
     
-    # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
+    # Use business logic function; in streaming mode rows are rendered as they are fetched
+    streaming = current_app.config['STREAM_TEMPLATES']
+    if streaming:
+        books = peek_rows(iter_search_results(search_term, search_type))
+    else:
+        books = search_books_in_catalog(search_term, search_type)
     
-    if not books:
-        flash('Search functionality is not yet implemented.', 'error')
+    # Likely a misspelling: offer close matches instead of an empty page
+    if not books and fuzzy_enabled and search_type in ('title', 'author'):
+        books = search_books_in_catalog(search_term, 'fuzzy')
+        if books:
+            flash(f'No exact matches for "{search_term}"; showing close matches.', 'info')
     
-    return render_template('search.html', books=books, search_term=search_term, search_type=search_type)
+    render = stream_page if streaming else render_template
+    return render('search.html', books=books, search_term=search_term, search_type=search_type,
+                  fuzzy_enabled=fuzzy_enabled, suggest_enabled=suggest_enabled)
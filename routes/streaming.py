@@ -0,0 +1,31 @@
+"""
+Streaming helpers - render large pages while their rows are still being fetched
+"""
+
+from itertools import chain
+from typing import Iterable
+
+from flask import current_app, get_flashed_messages, stream_with_context
+
+# Template output pieces gathered into each chunk written to the client
+STREAM_BUFFER_SIZE = 100
+
+
+def stream_page(template_name: str, **context):
+    """Like render_template, but the response body is generated as the template runs."""
+    app = current_app._get_current_object()
+    # Pop flashed messages now: the session cookie is written before the body streams
+    get_flashed_messages(with_categories=True)
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(STREAM_BUFFER_SIZE)
+    return app.response_class(stream_with_context(stream))
+
+
+def peek_rows(rows: Iterable):
+    """The rows, lazily, as an iterable that is falsy when there are none (for {% if books %})."""
+    iterator = iter(rows)
+    first = next(iterator, None)
+    if first is None:
+        return []
+    return chain([first], iterator)
@@ -1,5 +1,41 @@
-"""Service layer package exposing shared business and integration modules."""
+"""Service layer package exposing shared business and integration modules.
 
-from .library_service import *
+Submodules are imported lazily so that importing one service (or the package
+itself) does not pull in every other subsystem at startup.
+"""
 
-__all__ = [name for name in globals() if not name.startswith('_')]
+import importlib
+import importlib.util
+
+# library_service's own API; every other public name it holds still resolves below
+__all__ = [
+    'DATE_OUTPUT_FORMAT',
+    'MAX_LATE_FEE',
+    'HOLD_PICKUP_DAYS',
+    'add_book_to_catalog',
+    'borrow_book_by_patron',
+    'return_book_by_patron',
+    'place_hold',
+    'expire_uncollected_holds',
+    'calculate_late_fee_for_book',
+    'calculate_late_fees',
+    'pay_late_fees',
+    'refund_late_fee_payment',
+    'get_catalog_books',
+    'iter_catalog_books',
+    'iter_search_results',
+    'search_books_in_catalog',
+    'fuzzy_search_available',
+    'suggestions_available',
+    'get_search_suggestions',
+    'get_patron_status_report',
+    'get_loan_summary_report',
+    'get_change_feed',
+]
+
+
+def __getattr__(name):
+    # Submodules (``from services import catalog_service``) must not load library_service
+    if name in __all__ or (not name.startswith('_') and importlib.util.find_spec(f'{__name__}.{name}') is None):
+        return getattr(importlib.import_module('.library_service', __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
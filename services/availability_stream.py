@@ -0,0 +1,237 @@
+"""Live availability updates for Server-Sent Events clients.
+
+One publisher thread per process follows the ``events`` change feed and fans
+book availability changes out to every subscribed stream. It wakes as soon as
+a local borrow or return commits (book-write listener) and otherwise polls
+the feed, which also picks up writes made by other workers.
+
+Each subscriber has a bounded pending set keyed by book, so a slow client
+only ever receives the latest availability of a book. A client that falls
+more than ``max_pending`` books behind is disconnected; it reconnects with
+``Last-Event-ID`` (the feed sequence number) and catches up from the
+database instead of from memory.
+
+Every open stream holds a request thread for as long as the client stays, so
+a worker accepts at most ``max_subscribers`` of them and turns further
+clients away, leaving its remaining threads for ordinary requests.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+
+import database
+
+POLL_INTERVAL = 1.0  # seconds between feed reads when no local write wakes the publisher
+RETRY_MS = 3000  # reconnection delay suggested to EventSource clients
+_REPLAY_PAGE = 500
+
+logger = logging.getLogger(__name__)
+
+
+def _availability(change: Dict) -> Optional[Dict]:
+    if change['entity'] != 'book':
+        return None
+    data = change['data'] or {}
+    return {
+        'id': change['seq'],
+        'book_id': int(change['entity_key']),
+        'available_copies': data.get('available_copies'),
+        'total_copies': data.get('total_copies'),
+    }
+
+
+def format_event(update: Dict) -> str:
+    data = {key: value for key, value in update.items() if key != 'id'}
+    return f"id: {update['id']}\nevent: availability\ndata: {json.dumps(data)}\n\n"
+
+
+class Subscriber:
+    """Pending updates of one stream, coalesced per book and bounded in size."""
+
+    def __init__(self, max_pending: int) -> None:
+        self.max_pending = max_pending
+        self.lagged = False
+        self._pending: 'OrderedDict[int, Dict]' = OrderedDict()
+        self._ready = threading.Condition()
+
+    def offer(self, update: Dict) -> None:
+        with self._ready:
+            book_id = update['book_id']
+            if book_id in self._pending:
+                # Newer state replaces the unsent one and moves to the back, keeping ids increasing
+                del self._pending[book_id]
+            elif len(self._pending) >= self.max_pending:
+                self.lagged = True
+                self._ready.notify()
+                return
+            self._pending[book_id] = update
+            self._ready.notify()
+
+    def take(self, timeout: float) -> List[Dict]:
+        """Wait up to timeout for updates; returns them oldest first (empty on timeout)."""
+        with self._ready:
+            if not self._pending and not self.lagged:
+                self._ready.wait(timeout)
+            updates = list(self._pending.values())
+            self._pending.clear()
+            return updates
+
+
+class AvailabilityPublisher:
+    """Follows the change feed and fans availability updates out to subscribers."""
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL) -> None:
+        self.poll_interval = poll_interval
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_seq = 0
+
+    def subscribe(self, max_pending: int, max_subscribers: Optional[int] = None) -> Optional[Subscriber]:
+        """Add a subscriber, or return None when max_subscribers streams are already open."""
+        subscriber = Subscriber(max_pending)
+        with self._lock:
+            if max_subscribers is not None and len(self._subscribers) >= max_subscribers:
+                return None
+            if self._thread is None:
+                self._last_seq = database.get_latest_change_seq()
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='library-availability-publisher', daemon=True)
+                self._thread.start()
+                database.add_book_write_listener(self.wake)
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def stop(self) -> None:
+        database.remove_book_write_listener(self.wake)
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join()
+
+    def publish_new(self) -> int:
+        """Fan out feed entries written since the last call; returns updates published."""
+        published = 0
+        while True:
+            changes = database.get_changes(self._last_seq, _REPLAY_PAGE)
+            if not changes:
+                return published
+            self._last_seq = changes[-1]['seq']
+            with self._lock:
+                subscribers = list(self._subscribers)
+            for change in changes:
+                update = _availability(change)
+                if update is None:
+                    continue
+                for subscriber in subscribers:
+                    subscriber.offer(update)
+                published += 1
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.publish_new()
+            except Exception:
+                # The next wake-up or poll retries from the same sequence number
+                logger.exception("Publishing availability updates failed")
+
+
+def latest_event_id() -> int:
+    """Feed position a page rendered now is current to; its stream starts after it."""
+    return database.get_latest_change_seq()
+
+
+def replay(since: int) -> List[Dict]:
+    """Latest availability of every book changed after feed sequence ``since``, oldest first."""
+    latest: 'OrderedDict[int, Dict]' = OrderedDict()
+    while True:
+        changes = database.get_changes(since, _REPLAY_PAGE)
+        for change in changes:
+            update = _availability(change)
+            if update is not None:
+                latest.pop(update['book_id'], None)
+                latest[update['book_id']] = update
+        if len(changes) < _REPLAY_PAGE:
+            return list(latest.values())
+        since = changes[-1]['seq']
+
+
+def stream(publisher: AvailabilityPublisher, last_event_id: Optional[int],
+           heartbeat: float, max_pending: int, subscriber: Optional[Subscriber] = None) -> Iterator[str]:
+    """
+    SSE lines for one client: catch-up after last_event_id, then live updates and heartbeats.
+
+    Pass a subscriber already taken from the publisher to stream through it
+    (and release it on close); otherwise one is subscribed here.
+    """
+    # Subscribe before replaying so nothing committed in between is missed
+    if subscriber is None:
+        subscriber = publisher.subscribe(max_pending)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        sent = 0
+        if last_event_id is not None:
+            for update in replay(last_event_id):
+                yield format_event(update)
+                sent = update['id']
+        while True:
+            updates = subscriber.take(heartbeat)
+            if subscriber.lagged:
+                # Too far behind to buffer; the client resumes from its Last-Event-ID
+                return
+            if not updates:
+                yield ": heartbeat\n\n"
+                continue
+            for update in updates:
+                if update['id'] > sent:
+                    yield format_event(update)
+                    sent = update['id']
+    finally:
+        publisher.unsubscribe(subscriber)
+
+
+_publisher: Optional[AvailabilityPublisher] = None
+
+
+def get_publisher() -> AvailabilityPublisher:
+    global _publisher
+    if _publisher is None:
+        _publisher = AvailabilityPublisher()
+    return _publisher
+
+
+def stop() -> None:
+    global _publisher
+    if _publisher is not None:
+        _publisher.stop()
+        _publisher = None
+
+
+def _reinit_after_fork() -> None:
+    # Threads and locks do not survive fork; each worker starts its own publisher on demand
+    global _publisher
+    _publisher = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
@@ -0,0 +1,346 @@
+"""In-process catalog snapshot for the read-mostly catalog, availability and search paths.
+
+Books are held in column form: integer columns in ``array('q')`` and string
+columns as lists of interned strings, so repeated authors share one object and
+no per-row dict or ``sqlite3.Row`` is kept. The snapshot follows the
+``book_changes`` counter maintained by triggers on ``books`` and applies only
+the rows changed since the version it last saw. Changes are read from SQLite
+before the snapshot's lock is taken, so readers only ever wait for the
+in-memory update. Rows are handed out as read-only ``database.Book`` records,
+built the first time a book is read after it changed and shared by every
+later read.
+
+With ``search_index`` the snapshot also keeps trigram indexes over the
+normalized titles and authors, so substring search intersects posting lists
+instead of scanning every book. The indexes can be saved to disk and loaded on
+the next start, after which only books changed since the save are indexed.
+With ``fuzzy_index`` it keeps a deletion dictionary over title and author
+tokens for the typo-tolerant ``fuzzy`` search type, and with ``suggest``
+popularity-ranked prefix completions that are answered from memory alone.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+import database
+
+from . import trigram_index
+from .fuzzy_index import FuzzyIndex
+from .suggest_index import PrefixSuggester
+from .trigram_index import TrigramIndex
+
+
+class CatalogSnapshot:
+    """Column-oriented copy of the books table, refreshed from book_changes."""
+
+    def __init__(self, search_index: bool = False, fuzzy_index: bool = False, suggest: bool = False) -> None:
+        self._lock = threading.Lock()
+        self.version = 0
+        self._ids = array('q')
+        self._total = array('q')
+        self._available = array('q')
+        self._titles: List[str] = []
+        self._authors: List[str] = []
+        self._isbns: List[str] = []
+        self._titles_lower: List[str] = []
+        self._authors_lower: List[str] = []
+        self._records: List[Optional[database.Book]] = []  # built on first read after a change
+        self._positions: Dict[int, int] = {}
+        self._order: Optional[List[int]] = None  # positions sorted by title, rebuilt lazily
+        self._indexes: Dict[str, TrigramIndex] = (
+            {'title': TrigramIndex(), 'author': TrigramIndex()} if search_index else {}
+        )
+        self._indexed_version = 0  # books last changed at or before this are already indexed
+        self._fuzzy: Optional[FuzzyIndex] = FuzzyIndex() if fuzzy_index else None
+        self._suggesters: Dict[str, PrefixSuggester] = (
+            {'title': PrefixSuggester(), 'author': PrefixSuggester()} if suggest else {}
+        )
+        # Loans per book, the suggestion weight; a drop in available copies counts as a loan
+        self._popularity: Dict[int, int] = database.get_borrow_counts() if suggest else {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def refresh(self) -> int:
+        """Apply books changed since the last refresh; returns how many changes were applied."""
+        changes = database.get_book_changes(self.version)
+        with self._lock:
+            return self._apply(changes)
+
+    def _apply(self, changes: List[Dict]) -> int:
+        applied = 0
+        for change in changes:
+            if change['version'] <= self.version:
+                # A concurrent refresh read from an older version and got here first
+                continue
+            if change['id'] is None:
+                self._remove(change['book_id'])
+            else:
+                self._upsert(change)
+            self.version = change['version']
+            applied += 1
+        self._indexed_version = max(self._indexed_version, self.version)
+        return applied
+
+    def _upsert(self, book: Dict) -> None:
+        intern = sys.intern
+        title, author = intern(book['title']), intern(book['author'])
+        position = self._positions.get(book['id'])
+        if position is None:
+            self._positions[book['id']] = len(self._ids)
+            self._ids.append(book['id'])
+            self._total.append(book['total_copies'])
+            self._available.append(book['available_copies'])
+            self._titles.append(title)
+            self._authors.append(author)
+            self._isbns.append(book['isbn'])
+            self._titles_lower.append(intern(title.lower()))
+            self._authors_lower.append(intern(author.lower()))
+            self._records.append(None)
+            self._order = None
+            if self._indexes and book['version'] > self._indexed_version:
+                self._indexes['title'].add(book['id'], self._titles_lower[-1])
+                self._indexes['author'].add(book['id'], self._authors_lower[-1])
+            if self._fuzzy is not None:
+                self._fuzzy.add(book['id'], 'title', title)
+                self._fuzzy.add(book['id'], 'author', author)
+            if self._suggesters:
+                popularity = self._popularity.get(book['id'], 0)
+                self._suggesters['title'].add(title, popularity)
+                self._suggesters['author'].add(author, popularity)
+            return
+        self._records[position] = None
+        borrowed = self._available[position] - book['available_copies']
+        self._total[position] = book['total_copies']
+        self._available[position] = book['available_copies']
+        if self._titles[position] is not title:
+            if self._fuzzy is not None:
+                self._fuzzy.remove(book['id'], 'title', self._titles[position])
+                self._fuzzy.add(book['id'], 'title', title)
+            if self._suggesters:
+                popularity = self._popularity.get(book['id'], 0)
+                self._suggesters['title'].remove(self._titles[position], popularity)
+                self._suggesters['title'].add(title, popularity)
+            self._titles[position] = title
+            self._titles_lower[position] = intern(title.lower())
+            self._order = None
+            if self._indexes:
+                self._indexes['title'].add(book['id'], self._titles_lower[position])
+        if self._authors[position] is not author:
+            if self._fuzzy is not None:
+                self._fuzzy.remove(book['id'], 'author', self._authors[position])
+                self._fuzzy.add(book['id'], 'author', author)
+            if self._suggesters:
+                popularity = self._popularity.get(book['id'], 0)
+                self._suggesters['author'].remove(self._authors[position], popularity)
+                self._suggesters['author'].add(author, popularity)
+            self._authors[position] = author
+            self._authors_lower[position] = intern(author.lower())
+            if self._indexes:
+                self._indexes['author'].add(book['id'], self._authors_lower[position])
+        self._isbns[position] = book['isbn']
+        if self._suggesters and borrowed > 0:
+            self._popularity[book['id']] = self._popularity.get(book['id'], 0) + borrowed
+            self._suggesters['title'].bump(title, borrowed)
+            self._suggesters['author'].bump(author, borrowed)
+
+    def _remove(self, book_id: int) -> None:
+        position = self._positions.pop(book_id, None)
+        if position is None:
+            return
+        if self._fuzzy is not None:
+            self._fuzzy.remove(book_id, 'title', self._titles[position])
+            self._fuzzy.remove(book_id, 'author', self._authors[position])
+        if self._suggesters:
+            popularity = self._popularity.pop(book_id, 0)
+            self._suggesters['title'].remove(self._titles[position], popularity)
+            self._suggesters['author'].remove(self._authors[position], popularity)
+        # Move the last row into the freed slot so the columns stay dense
+        last = len(self._ids) - 1
+        for column in (self._ids, self._total, self._available, self._titles,
+                       self._authors, self._isbns, self._titles_lower, self._authors_lower, self._records):
+            column[position] = column[last]
+            del column[last]
+        if position != last:
+            self._positions[self._ids[position]] = position
+        self._order = None
+
+    def _row(self, position: int) -> database.Book:
+        record = self._records[position]
+        if record is None:
+            record = self._records[position] = database.Book(
+                self._ids[position], self._titles[position], self._authors[position],
+                self._isbns[position], self._total[position], self._available[position]
+            )
+        return record
+
+    def _title_order(self) -> List[int]:
+        if self._order is None:
+            titles, ids = self._titles, self._ids
+            self._order = sorted(range(len(ids)), key=lambda position: (titles[position], ids[position]))
+        return self._order
+
+    def books(self) -> List[database.Book]:
+        """All books ordered by title, as returned by database.get_all_books()."""
+        self.refresh()
+        with self._lock:
+            return [self._row(position) for position in self._title_order()]
+
+    def get(self, book_id: int) -> Optional[database.Book]:
+        self.refresh()
+        with self._lock:
+            position = self._positions.get(book_id)
+            return self._row(position) if position is not None else None
+
+    def search(self, term: str, search_type: str) -> List[database.Book]:
+        """Same matching as search_books_in_catalog: substring on title/author, exact ISBN."""
+        self.refresh()
+        with self._lock:
+            if search_type == 'isbn':
+                isbn = term.replace('-', '')
+                return [self._row(position) for position, value in enumerate(self._isbns) if value == isbn]
+            column = self._titles_lower if search_type == 'title' else self._authors_lower
+            needle = term.lower()
+            index = self._indexes.get(search_type)
+            candidates = index.candidates(needle) if index is not None else None
+            if candidates is None:
+                return [self._row(position) for position in self._title_order() if needle in column[position]]
+            # Candidates may include stale postings of retitled or deleted books
+            positions = [self._positions.get(book_id) for book_id in candidates]
+            matches = [position for position in positions if position is not None and needle in column[position]]
+            matches.sort(key=lambda position: (self._titles[position], self._ids[position]))
+            return [self._row(position) for position in matches]
+
+    @property
+    def fuzzy_enabled(self) -> bool:
+        return self._fuzzy is not None
+
+    def fuzzy_search(self, term: str, limit: int = 50) -> List[Dict]:
+        """Books whose title or author tokens are within a few edits of every query token,
+        nearest first, each with its total edit ``distance``."""
+        self.refresh()
+        with self._lock:
+            if self._fuzzy is None:
+                return []
+            matches = [(distance, self._positions[book_id]) for book_id, distance in self._fuzzy.search(term)
+                       if book_id in self._positions]
+            matches.sort(key=lambda match: (match[0], self._titles[match[1]], self._ids[match[1]]))
+            return [dict(self._row(position), distance=distance) for distance, position in matches[:limit]]
+
+    @property
+    def suggest_enabled(self) -> bool:
+        return bool(self._suggesters)
+
+    def suggest(self, prefix: str, field: str, limit: int = 10) -> List[Dict]:
+        """Most borrowed titles or authors starting with prefix. Never touches SQLite:
+        the snapshot is brought up to date by catalog reads and by this process's book writes."""
+        with self._lock:
+            suggester = self._suggesters.get(field)
+            if suggester is None:
+                return []
+            return [{'text': text, 'loans': loans} for text, loans in suggester.complete(prefix, limit)]
+
+    def load_search_index(self, path: str) -> bool:
+        """Adopt trigram indexes saved for this catalog; call before the first refresh."""
+        loaded = trigram_index.load(path, database.get_catalog_id())
+        if loaded is None:
+            return False
+        with self._lock:
+            self._indexed_version, self._indexes = loaded
+        return True
+
+    def save_search_index(self, path: str) -> None:
+        """Write the trigram indexes, without stale postings, for a warm start."""
+        self.refresh()
+        with self._lock:
+            for index in self._indexes.values():
+                index.compact(self._positions)
+            trigram_index.save(path, database.get_catalog_id(), self._indexed_version, self._indexes)
+
+    def memory_footprint(self) -> Dict:
+        """Bytes held by the snapshot versus the same catalog as a list of one dict per book."""
+        self.refresh()
+        with self._lock:
+            seen = set()
+            snapshot_bytes = sys.getsizeof(self._positions) + sys.getsizeof(self._order or [])
+            snapshot_bytes += sys.getsizeof(self._records) + sum(
+                sys.getsizeof(record) for record in self._records if record is not None
+            )
+            for column in (self._ids, self._total, self._available):
+                snapshot_bytes += sys.getsizeof(column)
+            for column in (self._titles, self._authors, self._isbns, self._titles_lower, self._authors_lower):
+                snapshot_bytes += sys.getsizeof(column)
+                for value in column:
+                    if id(value) not in seen:
+                        seen.add(id(value))
+                        snapshot_bytes += sys.getsizeof(value)
+            books = len(self._ids)
+            index_bytes = sum(index.nbytes() for index in self._indexes.values())
+        # get_all_books() returns slotted records; measure the dict-per-row form they replaced
+        rows = [dict(book) for book in database.get_all_books()]
+        dict_rows_bytes = sys.getsizeof(rows) + sum(
+            sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values()) for row in rows
+        )
+        return {
+            'books': books,
+            'version': self.version,
+            'snapshot_bytes': snapshot_bytes,
+            'dict_rows_bytes': dict_rows_bytes,
+            'search_index_bytes': index_bytes,
+            'ratio': round(dict_rows_bytes / snapshot_bytes, 2) if snapshot_bytes else None,
+        }
+
+    def _reinit_after_fork(self) -> None:
+        # The lock may have been held by another thread at fork time
+        self._lock = threading.Lock()
+
+
+_snapshot: Optional[CatalogSnapshot] = None
+
+
+def enable(search_index: bool = False, index_path: Optional[str] = None,
+           fuzzy_index: bool = False, suggest: bool = False) -> CatalogSnapshot:
+    """Load the catalog snapshot and serve catalog reads from it.
+
+    With ``index_path`` the trigram indexes are loaded from that file when it
+    was saved for this catalog, and written to it after a cold build.
+    """
+    global _snapshot
+    snapshot = CatalogSnapshot(search_index=search_index or index_path is not None,
+                               fuzzy_index=fuzzy_index, suggest=suggest)
+    warm = index_path is not None and snapshot.load_search_index(index_path)
+    snapshot.refresh()
+    if index_path is not None and not warm:
+        snapshot.save_search_index(index_path)
+    _snapshot = snapshot
+    database.add_book_write_listener(_refresh_after_write)
+    return snapshot
+
+
+def disable() -> None:
+    global _snapshot
+    database.remove_book_write_listener(_refresh_after_write)
+    _snapshot = None
+
+
+def _refresh_after_write() -> None:
+    # Keeps reads that skip the refresh probe (suggestions) current with local writes
+    if _snapshot is not None:
+        _snapshot.refresh()
+
+
+def get_catalog_snapshot() -> Optional[CatalogSnapshot]:
+    return _snapshot
+
+
+def _reinit_after_fork() -> None:
+    if _snapshot is not None:
+        _snapshot._reinit_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
@@ -0,0 +1,151 @@
+"""Response compression negotiated from Accept-Encoding.
+
+HTML, JSON and other text responses above a size threshold are compressed
+with brotli when the ``brotli`` package is installed and the client accepts
+it, otherwise with gzip. Buffered GET responses are compressed once: their
+compressed bytes are kept in a cache bounded by total size and keyed by a
+digest of the uncompressed body, so a repeated catalog page or search is
+served without compressing it again, and a changed page never gets stale
+bytes. Streamed responses are compressed chunk by chunk, flushing after each
+chunk so the first rows still reach the browser immediately.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Iterable, Iterator, Optional, Tuple
+
+from flask import Flask, request
+
+from .metrics_service import record_cache_access
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'image/svg+xml',
+}
+
+
+class CompressedCache:
+    """LRU of compressed bodies, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Tuple[str, bytes], bytes]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: Tuple[str, bytes], body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class Compressor:
+    """after_request hook compressing eligible responses."""
+
+    def __init__(self, min_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4,
+                 cache_bytes: int = 32 * 1024 * 1024) -> None:
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = CompressedCache(cache_bytes) if cache_bytes > 0 else None
+
+    def choose_encoding(self, accept_encodings) -> Optional[str]:
+        if brotli is not None and accept_encodings.quality('br') > 0:
+            return 'br'
+        if accept_encodings.quality('gzip') > 0:
+            return 'gzip'
+        return None
+
+    def compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def _compress_stream(self, encoding: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            for chunk in chunks:
+                yield compressor.process(chunk) + compressor.flush()
+            yield compressor.finish()
+            return
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+    def __call__(self, response):
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add('Accept-Encoding')
+        if (response.status_code != 200 or 'Content-Encoding' in response.headers
+                or response.direct_passthrough):
+            return response
+        encoding = self.choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._compress_stream(encoding, response.iter_encoded())
+            response.headers.pop('Content-Length', None)
+            response.headers['Content-Encoding'] = encoding
+            return response
+
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+        if self.cache is not None and request.method == 'GET':
+            key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+            compressed = self.cache.get(key)
+            record_cache_access('compression', compressed is not None)
+            if compressed is None:
+                compressed = self.compress(encoding, body)
+                self.cache.put(key, compressed)
+        else:
+            compressed = self.compress(encoding, body)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def init_app(app: Flask) -> Compressor:
+    """Compress responses according to the app's COMPRESSION_* settings."""
+    compressor = Compressor(
+        min_size=int(app.config['COMPRESSION_MIN_SIZE']),
+        gzip_level=int(app.config['COMPRESSION_GZIP_LEVEL']),
+        brotli_quality=int(app.config['COMPRESSION_BROTLI_QUALITY']),
+        cache_bytes=int(app.config['COMPRESSION_CACHE_BYTES']),
+    )
+    app.extensions['compressor'] = compressor
+    app.after_request(compressor)
+    return compressor
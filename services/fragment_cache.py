@@ -0,0 +1,69 @@
+"""Bounded cache of rendered template fragments.
+
+Each fragment is stored under a key (e.g. ``('catalog_row', book_id)``)
+together with the row version it was rendered from; a lookup with a different
+version re-renders and replaces it, so stale markup is never served. Least
+recently used fragments are evicted once ``max_entries`` is reached.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Tuple
+
+from flask import Flask
+
+from .metrics_service import record_cache_access
+
+
+class FragmentCache:
+    """LRU map of key -> (version, rendered markup)."""
+
+    def __init__(self, max_entries: int, name: str = 'fragment') -> None:
+        self.max_entries = max_entries
+        self.name = name
+        self._entries: 'OrderedDict[Hashable, Tuple[Hashable, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_render(self, key: Hashable, version: Hashable, render: Callable[[], str]) -> str:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                hit = True
+            else:
+                self.misses += 1
+                hit = False
+        record_cache_access(self.name, hit)
+        if hit:
+            return entry[1]
+        # Rendered outside the lock; two threads may render the same row once each
+        markup = render()
+        with self._lock:
+            self._entries[key] = (version, markup)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return markup
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+def init_app(app: Flask, max_entries: int) -> FragmentCache:
+    """Give the app a fragment cache, found by views under app.extensions['fragment_cache']."""
+    cache = app.extensions['fragment_cache'] = FragmentCache(max_entries)
+    return cache
@@ -0,0 +1,126 @@
+"""Typo-tolerant token search using a SymSpell-style deletion dictionary.
+
+Every token of a title or author is stored together with the strings obtained
+by deleting up to ``max_distance`` characters from it. A misspelled query
+token is expanded the same way; tokens sharing a deletion variant with it are
+candidates, and the true (optimal string alignment) distance confirms them.
+Lookups depend on the vocabulary size, not on the number of books.
+"""
+from __future__ import annotations
+
+import re
+from array import array
+from typing import Dict, Iterable, List, Set, Tuple
+
+MAX_DISTANCE = 2
+_TOKEN = re.compile(r'[^\W_]+')
+
+
+def tokenize(text: str) -> Set[str]:
+    # Numbers (volume numbers, years) are left to the exact search types
+    return {token for token in _TOKEN.findall(text.lower()) if not token.isdigit()}
+
+
+def allowed_distance(token: str) -> int:
+    """Edits tolerated for a token; short words would otherwise match almost anything."""
+    if len(token) <= 2:
+        return 0
+    if len(token) <= 4:
+        return 1
+    return MAX_DISTANCE
+
+
+def _deletes(token: str, distance: int) -> Set[str]:
+    variants = {token}
+    frontier = {token}
+    for _ in range(distance):
+        frontier = {word[:index] + word[index + 1:] for word in frontier for index in range(len(word))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(left: str, right: str, limit: int) -> int:
+    """Optimal string alignment distance, or limit + 1 once it is known to exceed limit."""
+    if abs(len(left) - len(right)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(right) + 1))
+    for i in range(1, len(left) + 1):
+        current = [i] + [0] * len(right)
+        for j in range(1, len(right) + 1):
+            cost = 0 if left[i - 1] == right[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and left[i - 1] == right[j - 2] and left[i - 2] == right[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class FuzzyIndex:
+    """Deletion dictionary over the tokens of each field, with book ids per token."""
+
+    def __init__(self, fields: Iterable[str] = ('title', 'author')) -> None:
+        self._deletions: Dict[str, Set[str]] = {}
+        self._books: Dict[str, Dict[str, array]] = {field: {} for field in fields}
+
+    def add(self, book_id: int, field: str, text: str) -> None:
+        books = self._books[field]
+        for token in tokenize(text):
+            ids = books.get(token)
+            if ids is None:
+                books[token] = array('q', (book_id,))
+                for variant in _deletes(token, allowed_distance(token)):
+                    self._deletions.setdefault(variant, set()).add(token)
+            else:
+                ids.append(book_id)
+
+    def remove(self, book_id: int, field: str, text: str) -> None:
+        books = self._books[field]
+        for token in tokenize(text):
+            ids = books.get(token)
+            if ids is not None and book_id in ids:
+                ids.remove(book_id)
+        # Emptied tokens stay in the deletion dictionary and simply match no books
+
+    def _similar_tokens(self, token: str) -> Dict[str, int]:
+        limit = allowed_distance(token)
+        similar: Dict[str, int] = {}
+        for variant in _deletes(token, limit):
+            for candidate in self._deletions.get(variant, ()):
+                if candidate not in similar:
+                    similar[candidate] = edit_distance(token, candidate, min(limit, allowed_distance(candidate)))
+        return {candidate: distance for candidate, distance in similar.items()
+                if distance <= min(limit, allowed_distance(candidate))}
+
+    def search(self, query: str) -> List[Tuple[int, int]]:
+        """(book_id, distance) for books where every query token closely matches a token
+        of the same field, nearest first."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        expansions = {token: self._similar_tokens(token) for token in tokens}
+        best: Dict[int, int] = {}
+        for field, books in self._books.items():
+            scores = None
+            # Rarest query token first, so later tokens only score its candidates
+            for token in sorted(tokens, key=lambda token: sum(len(books.get(word, ())) for word in expansions[token])):
+                token_scores: Dict[int, int] = {}
+                for word, distance in expansions[token].items():
+                    for book_id in books.get(word, ()):
+                        if scores is not None and book_id not in scores:
+                            continue
+                        if distance < token_scores.get(book_id, MAX_DISTANCE + 1):
+                            token_scores[book_id] = distance
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {book_id: scores[book_id] + distance for book_id, distance in token_scores.items()}
+                if not scores:
+                    break
+            for book_id, distance in (scores or {}).items():
+                if distance < best.get(book_id, len(tokens) * MAX_DISTANCE + 1):
+                    best[book_id] = distance
+        return sorted(best.items(), key=lambda item: item[1])
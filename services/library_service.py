@@ -3,8 +3,10 @@ Library Service Module - Business Logic Functions
 Contains all the core business logic for the Library Management System
 """
 
+import json
+import sys
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from database import (
     get_book_by_id,
@@ -15,13 +17,30 @@ from database import (
     update_book_availability,
     update_borrow_record_return_date,
     get_all_books,
-    get_db_connection,
-    get_patron_borrowed_books
+    iter_all_books,
+    iter_query,
+    get_read_connection,
+    get_patron_connection,
+    shard_for_patron,
+    insert_hold,
+    settle_ready_holds,
+    claim_ready_hold,
+    restore_hold,
+    release_copy,
+    expire_holds,
+    get_changes,
+    get_library_loan_summary,
+    Book,
+    BOOK_COLUMNS
 )
 from .payment_service import PaymentGateway, PaymentGatewayError
 
 DATE_OUTPUT_FORMAT = "%Y-%m-%d"
 MAX_LATE_FEE = 15.00
+HOLD_PICKUP_DAYS = 3  # a copy reserved for a hold waits this long before passing to the next patron
+# Columns shared by borrow_records and borrow_history_archive, so history
+# lookups can read both tables transparently
+_LOAN_COLUMNS = "id, patron_id, book_id, borrow_date, due_date, return_date"
 
 
 def _normalize_patron_id(patron_id: Optional[str]) -> str:
@@ -60,8 +79,27 @@ def _calculate_overdue_metrics(due_date: datetime, reference: Optional[datetime]
     return days_overdue, round(fee, 2)
 
 
+def _catalog_snapshot():
+    """
+    The in-process catalog snapshot, or None when it is not enabled.
+
+    Only catalog_service.enable() creates one, so until something imports
+    catalog_service there is none, and this module never imports it (or the
+    search indexes it loads) itself.
+    """
+    catalog_service = sys.modules.get(f'{__package__}.catalog_service')
+    return catalog_service.get_catalog_snapshot() if catalog_service is not None else None
+
+
+def _find_book(book_id: int) -> Optional[Dict]:
+    snapshot = _catalog_snapshot()
+    if snapshot is not None:
+        return snapshot.get(book_id)
+    return get_book_by_id(book_id)
+
+
 def _get_active_borrow_record(patron_id: str, book_id: int) -> Optional[Dict]:
-    conn = get_db_connection()
+    conn = get_patron_connection(patron_id, read_only=True)
     try:
         row = conn.execute(
             """
@@ -80,54 +118,72 @@ def _get_active_borrow_record(patron_id: str, book_id: int) -> Optional[Dict]:
 
 
 def _get_latest_borrow_record(patron_id: str, book_id: int) -> Optional[Dict]:
-    conn = get_db_connection()
+    conn = get_patron_connection(patron_id, read_only=True)
     try:
         row = conn.execute(
-            """
+            f"""
             SELECT br.*, b.title, b.author
-            FROM borrow_records br
+            FROM (
+                SELECT {_LOAN_COLUMNS} FROM borrow_records WHERE patron_id = ? AND book_id = ?
+                UNION ALL
+                SELECT {_LOAN_COLUMNS} FROM borrow_history_archive WHERE patron_id = ? AND book_id = ?
+            ) br
             JOIN books b ON br.book_id = b.id
-            WHERE br.patron_id = ? AND br.book_id = ?
             ORDER BY br.borrow_date DESC
             LIMIT 1
             """,
-            (patron_id, book_id)
+            (patron_id, book_id, patron_id, book_id)
         ).fetchone()
     finally:
         conn.close()
     return dict(row) if row else None
 
 
-def _get_patron_borrow_history(patron_id: str) -> List[Dict]:
-    conn = get_db_connection()
+def _get_patron_loans(patron_id: str, reference: datetime) -> List[Dict]:
+    """
+    Every loan of a patron, newest first, in one round trip.
+    
+    Open loans carry days_overdue and late_fee as of reference (the same
+    rules as _calculate_overdue_metrics) and every row carries the totals
+    over open loans, so the status report needs no further queries.
+    """
+    conn = get_patron_connection(patron_id, read_only=True)
     try:
         rows = conn.execute(
-            """
-            SELECT br.*, b.title, b.author
-            FROM borrow_records br
-            JOIN books b ON br.book_id = b.id
-            WHERE br.patron_id = ?
-            ORDER BY br.borrow_date DESC
+            f"""
+            WITH loans AS (
+                SELECT {_LOAN_COLUMNS} FROM borrow_records WHERE patron_id = :patron_id
+                UNION ALL
+                SELECT {_LOAN_COLUMNS} FROM borrow_history_archive WHERE patron_id = :patron_id
+            ),
+            overdue AS (
+                SELECT l.*, b.title, b.author,
+                       CASE WHEN l.return_date IS NULL AND julianday(:now) > julianday(l.due_date)
+                            THEN CAST(julianday(date(:now)) - julianday(date(l.due_date)) AS INTEGER)
+                            ELSE 0 END AS days_overdue
+                FROM loans l
+                JOIN books b ON l.book_id = b.id
+            ),
+            priced AS (
+                SELECT *,
+                       ROUND(MIN(MIN(days_overdue, 7) * 0.50 + MAX(days_overdue - 7, 0) * 1.00, 15.00), 2) AS late_fee
+                FROM overdue
+            )
+            SELECT p.book_id, p.title, p.author,
+                   date(p.borrow_date) AS borrow_date,
+                   date(p.due_date) AS due_date,
+                   date(p.return_date) AS return_date,
+                   p.days_overdue, p.late_fee,
+                   SUM(p.return_date IS NULL) OVER () AS total_borrowed,
+                   ROUND(SUM(CASE WHEN p.return_date IS NULL THEN p.late_fee ELSE 0.0 END) OVER (), 2) AS total_late_fees
+            FROM priced p
+            ORDER BY p.borrow_date DESC
             """,
-            (patron_id,)
+            {'patron_id': patron_id, 'now': reference.isoformat()}
         ).fetchall()
     finally:
         conn.close()
-
-    history: List[Dict] = []
-    for row in rows:
-        borrow_date = datetime.fromisoformat(row["borrow_date"])
-        due_date = datetime.fromisoformat(row["due_date"])
-        return_date = _safe_datetime_from_iso(row["return_date"])
-        history.append({
-            "book_id": row["book_id"],
-            "title": row["title"],
-            "author": row["author"],
-            "borrow_date": _format_date(borrow_date),
-            "due_date": _format_date(due_date),
-            "return_date": _format_date(return_date)
-        })
-    return history
+    return [dict(row) for row in rows]
 
 
 def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
@@ -194,11 +250,18 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
         return False, "Invalid patron ID. Must be exactly 6 digits."
     
     # Check if book exists and is available
-    book = get_book_by_id(book_id)
+    book = _find_book(book_id)
     if not book:
         return False, "Book not found."
     
-    if book['available_copies'] <= 0:
+    # A copy reserved for this patron's hold is theirs to borrow; it is taken
+    # ahead of any shelf copy so the reservation does not sit unused until expiry.
+    # Lapsed pickups are passed on first, which may shelve a copy or reserve it for this patron
+    now = datetime.now()
+    has_hold = settle_ready_holds(normalized_patron_id, book_id, now, now + timedelta(days=HOLD_PICKUP_DAYS))
+    if not has_hold and book['available_copies'] <= 0:
+        book = _find_book(book_id)
+    if not has_hold and book['available_copies'] <= 0:
         return False, "This book is currently not available."
     
     # Check patron's current borrowed books count
@@ -211,14 +274,21 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     borrow_date = datetime.now()
     due_date = borrow_date + timedelta(days=14)
     
+    hold_id = claim_ready_hold(normalized_patron_id, book_id, borrow_date) if has_hold else None
+    if hold_id is None and book['available_copies'] <= 0:
+        return False, "This book is currently not available."
+    
     # Insert borrow record and update availability
     borrow_success = insert_borrow_record(normalized_patron_id, book_id, borrow_date, due_date)
     if not borrow_success:
+        if hold_id is not None:
+            restore_hold(hold_id)
         return False, "Database error occurred while creating borrow record."
     
-    availability_success = update_book_availability(book_id, -1)
-    if not availability_success:
-        return False, "Database error occurred while updating book availability."
+    if hold_id is None:
+        availability_success = update_book_availability(book_id, -1)
+        if not availability_success:
+            return False, "Database error occurred while updating book availability."
     
     return True, f'Successfully borrowed "{book["title"]}". Due date: {due_date.strftime("%Y-%m-%d")}.'
 
@@ -246,7 +316,7 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
         except (TypeError, ValueError):
             candidate_id = None
         if candidate_id and candidate_id > 0:
-            book = get_book_by_id(candidate_id)
+            book = _find_book(candidate_id)
             if book:
                 book_id_int = candidate_id
 
@@ -277,52 +347,81 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not update_borrow_record_return_date(normalized_patron_id, book_id_int, now):
         return False, "Database error occurred while updating borrow record."
 
-    if not update_book_availability(book_id_int, 1):
+    # The copy goes to the next patron on hold, if any, in the same transaction
+    released, reserved_for = release_copy(book_id_int, now, now + timedelta(days=HOLD_PICKUP_DAYS))
+    if not released:
         return False, "Database error occurred while updating book availability."
 
     if fee_amount > 0:
         message = f'Book "{book["title"]}" successfully returned. Late fee due: ${fee_amount:.2f}.'
     else:
         message = f'Book "{book["title"]}" successfully returned. No late fees.'
+    if reserved_for:
+        message += " The copy is reserved for the next patron on hold."
 
     return True, message
 
 
-def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
+def place_hold(patron_id: str, book_id: int) -> Tuple[bool, str]:
     """
-    Calculate late fees for a specific book.
+    Queue a patron for the next copy of an unavailable book.
     
-    Implements R5: Late Fee Calculation API
+    Returned copies are reserved for the oldest hold first; the patron then
+    has HOLD_PICKUP_DAYS to borrow it before it passes to the next in line.
     """
     is_valid, normalized_patron_id, error_message = _validate_patron_id(patron_id)
     if not is_valid:
-        return {'fee_amount': 0.0, 'days_overdue': 0, 'status': error_message}
+        return False, error_message
+
+    book = _find_book(book_id)
+    if not book:
+        return False, "Book not found."
+
+    now = datetime.now()
+    outcome, position = insert_hold(normalized_patron_id, book['id'], now, now + timedelta(days=HOLD_PICKUP_DAYS))
+    if outcome == 'available':
+        return False, "A copy of this book is available; borrow it instead."
+    if outcome == 'duplicate':
+        if position == 0:
+            return False, f'A copy of "{book["title"]}" is already reserved for you.'
+        return False, f'You already have a hold on "{book["title"]}" (position {position} in line).'
+    return True, f'Hold placed on "{book["title"]}". You are number {position} in line.'
+
+
+def expire_uncollected_holds() -> int:
+    """Pass copies whose pickup window has lapsed to the next hold; returns holds expired."""
+    now = datetime.now()
+    return expire_holds(now, now + timedelta(days=HOLD_PICKUP_DAYS))
+
+
+def _validate_late_fee_request(patron_id: str, book_id) -> Tuple[Optional[Dict], str, int]:
+    """(error result or None, normalized patron id, book id) for a late fee lookup."""
+    is_valid, normalized_patron_id, error_message = _validate_patron_id(patron_id)
+    if not is_valid:
+        return {'fee_amount': 0.0, 'days_overdue': 0, 'status': error_message}, normalized_patron_id, 0
 
     try:
         book_id_int = int(book_id)
     except (TypeError, ValueError):
-        return {'fee_amount': 0.0, 'days_overdue': 0, 'status': "Invalid book ID."}
+        return {'fee_amount': 0.0, 'days_overdue': 0, 'status': "Invalid book ID."}, normalized_patron_id, 0
 
     if book_id_int <= 0:
-        return {'fee_amount': 0.0, 'days_overdue': 0, 'status': "Invalid book ID."}
+        return {'fee_amount': 0.0, 'days_overdue': 0, 'status': "Invalid book ID."}, normalized_patron_id, 0
+    return None, normalized_patron_id, book_id_int
 
-    book = get_book_by_id(book_id_int)
-    if not book:
-        return {'fee_amount': 0.0, 'days_overdue': 0, 'status': "Book not found."}
-
-    active_record = _get_active_borrow_record(normalized_patron_id, book_id_int)
-    record = active_record or _get_latest_borrow_record(normalized_patron_id, book_id_int)
 
+def _late_fee_result(record: Optional[Dict], active: bool) -> Dict:
+    """Late fee for the loan record picked for a patron and book (active first, else latest)."""
     if not record:
         return {'fee_amount': 0.0, 'days_overdue': 0, 'status': "Book is not borrowed by this patron."}
 
     due_date = datetime.fromisoformat(record['due_date'])
     return_date = _safe_datetime_from_iso(record.get('return_date'))
 
-    reference_point = return_date if return_date and not active_record else None
+    reference_point = return_date if return_date and not active else None
     days_overdue, fee_amount = _calculate_overdue_metrics(due_date, reference_point)
 
-    if active_record:
+    if active:
         status = "No outstanding late fees." if days_overdue == 0 else f"Book overdue by {days_overdue} day(s)."
     else:
         if return_date:
@@ -342,6 +441,99 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     }
 
 
+def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
+    """
+    Calculate late fees for a specific book.
+    
+    Implements R5: Late Fee Calculation API
+    """
+    error, normalized_patron_id, book_id_int = _validate_late_fee_request(patron_id, book_id)
+    if error:
+        return error
+
+    book = _find_book(book_id_int)
+    if not book:
+        return {'fee_amount': 0.0, 'days_overdue': 0, 'status': "Book not found."}
+
+    active_record = _get_active_borrow_record(normalized_patron_id, book_id_int)
+    record = active_record or _get_latest_borrow_record(normalized_patron_id, book_id_int)
+    return _late_fee_result(record, active_record is not None)
+
+
+def _get_loans_for_keys(patron_id: str, keys: List[Tuple[int, str, int]]) -> Dict[int, Dict]:
+    """
+    The loan record calculate_late_fee_for_book would pick for each key, in one query.
+    
+    keys are (index, patron_id, book_id) on the shard of patron_id, passed as
+    one JSON key table. Returns index -> row with book_exists, due_date,
+    return_date and active (None dates when the patron never borrowed the book).
+    """
+    conn = get_patron_connection(patron_id, read_only=True)
+    try:
+        rows = conn.execute(
+            """
+            WITH keys AS (
+                SELECT json_extract(value, '$[0]') AS idx,
+                       json_extract(value, '$[1]') AS patron_id,
+                       json_extract(value, '$[2]') AS book_id
+                FROM json_each(:keys)
+            ),
+            matches AS (
+                SELECT k.idx, br.borrow_date, br.due_date, br.return_date
+                FROM keys k
+                JOIN borrow_records br ON br.patron_id = k.patron_id AND br.book_id = k.book_id
+                UNION ALL
+                SELECT k.idx, a.borrow_date, a.due_date, a.return_date
+                FROM keys k
+                JOIN borrow_history_archive a ON a.patron_id = k.patron_id AND a.book_id = k.book_id
+            ),
+            ranked AS (
+                SELECT idx, due_date, return_date,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY idx ORDER BY return_date IS NULL DESC, borrow_date DESC
+                       ) AS position
+                FROM matches
+            )
+            SELECT k.idx, b.id IS NOT NULL AS book_exists,
+                   r.due_date, r.return_date, r.return_date IS NULL AS active
+            FROM keys k
+            LEFT JOIN books b ON b.id = k.book_id
+            LEFT JOIN ranked r ON r.idx = k.idx AND r.position = 1
+            """,
+            {'keys': json.dumps(keys)}
+        ).fetchall()
+    finally:
+        conn.close()
+    return {row['idx']: dict(row) for row in rows}
+
+
+def calculate_late_fees(requests: List[Tuple[str, int]]) -> List[Dict]:
+    """
+    Late fees for many (patron_id, book_id) pairs, one result per pair in order.
+    
+    Same results as calculate_late_fee_for_book for each pair, resolved with
+    one query per borrow_records shard instead of up to three per pair.
+    """
+    results: List[Optional[Dict]] = [None] * len(requests)
+    by_shard: Dict[int, List[Tuple[int, str, int]]] = {}
+    for index, (patron_id, book_id) in enumerate(requests):
+        error, normalized_patron_id, book_id_int = _validate_late_fee_request(patron_id, book_id)
+        if error:
+            results[index] = error
+        else:
+            by_shard.setdefault(shard_for_patron(normalized_patron_id), []).append(
+                (index, normalized_patron_id, book_id_int))
+
+    for keys in by_shard.values():
+        for index, row in _get_loans_for_keys(keys[0][1], keys).items():
+            if not row['book_exists']:
+                results[index] = {'fee_amount': 0.0, 'days_overdue': 0, 'status': "Book not found."}
+            else:
+                record = row if row['due_date'] is not None else None
+                results[index] = _late_fee_result(record, bool(row['active']))
+    return results
+
+
 def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway) -> Dict:
     """Collect outstanding late fees for a patron by invoking the payment gateway."""
     if payment_gateway is None:
@@ -387,7 +579,7 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway)
             'amount': 0.0
         }
 
-    book = get_book_by_id(book_id_int)
+    book = _find_book(book_id_int)
     if not book:
         return {
             'success': False,
@@ -530,48 +722,148 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
     }
 
 
-def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
+def fuzzy_search_available() -> bool:
+    """Whether the typo-tolerant ``fuzzy`` search type is enabled."""
+    snapshot = _catalog_snapshot()
+    return snapshot is not None and snapshot.fuzzy_enabled
+
+
+def suggestions_available() -> bool:
+    """Whether prefix suggestions (``/api/suggest``) are enabled."""
+    snapshot = _catalog_snapshot()
+    return snapshot is not None and snapshot.suggest_enabled
+
+
+def get_search_suggestions(prefix: str, suggest_type: str, limit: int = 10) -> List[Dict]:
     """
-    Search for books in the catalog.
+    Most borrowed titles or author names starting with prefix, for search-as-you-type.
     
-    Implements R6: Book Search Functionality
+    Answered from the catalog snapshot's prefix index without querying the database.
     """
-    if not isinstance(search_type, str):
+    if not isinstance(prefix, str) or suggest_type not in {"title", "author"}:
+        return []
+    snapshot = _catalog_snapshot()
+    if snapshot is None:
         return []
+    return snapshot.suggest(prefix, suggest_type, max(1, min(limit, 50)))
+
+
+def get_catalog_books() -> List[Dict]:
+    """
+    Get every book ordered by title, from the catalog snapshot when it is enabled.
+    
+    Implements R2: Book Catalog Display
+    """
+    snapshot = _catalog_snapshot()
+    if snapshot is not None:
+        return snapshot.books()
+    return get_all_books()
+
+
+def _normalize_search(search_term: str, search_type: str) -> Optional[Tuple[str, str]]:
+    if not isinstance(search_type, str):
+        return None
 
     search_type_normalized = search_type.strip().lower()
-    if search_type_normalized not in {"title", "author", "isbn"}:
-        return []
+    if search_type_normalized not in {"title", "author", "isbn", "fuzzy"}:
+        return None
 
     if not isinstance(search_term, str):
-        return []
+        return None
 
     term = search_term.strip()
     if not term:
+        return None
+    return term, search_type_normalized
+
+
+def _search_statement(term: str, search_type: str) -> Tuple[str, Tuple]:
+    if search_type == "title":
+        return f"SELECT {BOOK_COLUMNS} FROM books WHERE LOWER(title) LIKE ? ORDER BY title", (f"%{term.lower()}%",)
+    if search_type == "author":
+        return f"SELECT {BOOK_COLUMNS} FROM books WHERE LOWER(author) LIKE ? ORDER BY title", (f"%{term.lower()}%",)
+    return f"SELECT {BOOK_COLUMNS} FROM books WHERE isbn = ?", (term.replace("-", ""),)
+
+
+def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
+    """
+    Search for books in the catalog.
+    
+    Implements R6: Book Search Functionality
+    """
+    normalized = _normalize_search(search_term, search_type)
+    if normalized is None:
         return []
+    term, search_type_normalized = normalized
 
-    conn = get_db_connection()
+    snapshot = _catalog_snapshot()
+    if search_type_normalized == "fuzzy":
+        # Typo-tolerant matching needs the snapshot's fuzzy index (FUZZY_SEARCH_ENABLED)
+        return snapshot.fuzzy_search(term) if snapshot is not None else []
+    if snapshot is not None:
+        return snapshot.search(term, search_type_normalized)
+
+    conn = get_read_connection()
     try:
-        if search_type_normalized == "title":
-            rows = conn.execute(
-                "SELECT * FROM books WHERE LOWER(title) LIKE ? ORDER BY title",
-                (f"%{term.lower()}%",)
-            ).fetchall()
-        elif search_type_normalized == "author":
-            rows = conn.execute(
-                "SELECT * FROM books WHERE LOWER(author) LIKE ? ORDER BY title",
-                (f"%{term.lower()}%",)
-            ).fetchall()
-        else:
-            normalized_isbn = term.replace("-", "")
-            rows = conn.execute(
-                "SELECT * FROM books WHERE isbn = ?",
-                (normalized_isbn,)
-            ).fetchall()
+        cursor = conn.execute(*_search_statement(term, search_type_normalized))
+        cursor.row_factory = Book.from_row
+        return cursor.fetchall()
     finally:
         conn.close()
 
-    return [dict(row) for row in rows]
+
+def iter_search_results(search_term: str, search_type: str) -> Iterator[Dict]:
+    """
+    Search results streamed from a database cursor, for pages rendered as rows arrive.
+    
+    Same matching as search_books_in_catalog; in-memory search paths return their list.
+    """
+    normalized = _normalize_search(search_term, search_type)
+    if normalized is None:
+        return iter(())
+    term, search_type_normalized = normalized
+    if search_type_normalized == "fuzzy" or _catalog_snapshot() is not None:
+        return iter(search_books_in_catalog(term, search_type_normalized))
+    return iter_query(*_search_statement(term, search_type_normalized), record=Book)
+
+
+def iter_catalog_books() -> Iterator[Dict]:
+    """
+    Every book ordered by title, streamed from a database cursor.
+    
+    Same rows as get_catalog_books; with the catalog snapshot enabled they come from memory.
+    Implements R2: Book Catalog Display
+    """
+    snapshot = _catalog_snapshot()
+    if snapshot is not None:
+        return iter(snapshot.books())
+    return iter_all_books()
+
+
+def get_change_feed(since: int = 0, limit: int = 100) -> Dict:
+    """
+    One page of the book and loan change feed after sequence number since.
+    
+    Consumers resume from next_since; has_more means another page is ready.
+    """
+    changes = get_changes(since, limit)
+    return {
+        'changes': changes,
+        'count': len(changes),
+        'next_since': changes[-1]['seq'] if changes else since,
+        'has_more': len(changes) == limit
+    }
+
+
+def get_loan_summary_report() -> Dict:
+    """
+    Library-wide totals of open loans, overdue loans and patrons holding books.
+
+    Counts come from every borrow_records shard, so they cover the whole library.
+    """
+    summary = get_library_loan_summary()
+    summary['generated_at'] = datetime.now().strftime(DATE_OUTPUT_FORMAT)
+    return summary
 
 
 def get_patron_status_report(patron_id: str) -> Dict:
@@ -591,33 +883,37 @@ def get_patron_status_report(patron_id: str) -> Dict:
             'history': []
         }
 
-    borrowed_books = get_patron_borrowed_books(normalized_patron_id)
-    now = datetime.now()
-    borrowed_summaries: List[Dict] = []
-    total_late_fees = 0.0
-
-    for book in borrowed_books:
-        due_date = book['due_date'] if isinstance(book['due_date'], datetime) else datetime.fromisoformat(book['due_date'])
-        borrow_date = book['borrow_date'] if isinstance(book['borrow_date'], datetime) else datetime.fromisoformat(book['borrow_date'])
-        days_overdue, fee_amount = _calculate_overdue_metrics(due_date, now)
-        borrowed_summaries.append({
-            'book_id': book['book_id'],
-            'title': book['title'],
-            'author': book['author'],
-            'borrow_date': _format_date(borrow_date),
-            'due_date': _format_date(due_date),
-            'days_overdue': days_overdue,
-            'late_fee': fee_amount
-        })
-        total_late_fees += fee_amount
-
-    history = _get_patron_borrow_history(normalized_patron_id)
+    loans = _get_patron_loans(normalized_patron_id, datetime.now())
+    # Open loans oldest first, history newest first
+    borrowed_summaries = [
+        {
+            'book_id': loan['book_id'],
+            'title': loan['title'],
+            'author': loan['author'],
+            'borrow_date': loan['borrow_date'],
+            'due_date': loan['due_date'],
+            'days_overdue': loan['days_overdue'],
+            'late_fee': loan['late_fee']
+        }
+        for loan in reversed(loans) if loan['return_date'] is None
+    ]
+    history = [
+        {
+            'book_id': loan['book_id'],
+            'title': loan['title'],
+            'author': loan['author'],
+            'borrow_date': loan['borrow_date'],
+            'due_date': loan['due_date'],
+            'return_date': loan['return_date']
+        }
+        for loan in loans
+    ]
 
     return {
         'patron_id': normalized_patron_id,
         'status': 'success',
         'borrowed_books': borrowed_summaries,
-        'total_borrowed': len(borrowed_summaries),
-        'total_late_fees': round(total_late_fees, 2),
+        'total_borrowed': loans[0]['total_borrowed'] if loans else 0,
+        'total_late_fees': loans[0]['total_late_fees'] if loans else 0.0,
         'history': history
     }
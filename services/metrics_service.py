@@ -0,0 +1,385 @@
+"""Per-request performance metrics exposed in the Prometheus text format.
+
+Observations are written to a shard owned by the recording thread, so the hot
+path never takes a lock. Shards are only merged when ``/metrics`` is scraped.
+
+Under a pre-fork server each worker has its own registry. With a multiprocess
+directory (``METRICS_MULTIPROCESS_DIR``) every process writes its totals to a
+file there every ``EXPORT_INTERVAL`` seconds and at exit, and a scrape served
+by any worker merges all files. Files of exited workers are folded into one
+``retired.json`` so their counts, and the counters, never go backwards.
+"""
+from __future__ import annotations
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+import weakref
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import Flask, g, request
+
+import database
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+DB_TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+EXPORT_INTERVAL = 1.0  # seconds between multiprocess exports; bounds how stale other workers' counts are
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - pre-fork servers are POSIX-only
+    fcntl = None
+
+
+class _Shard:
+    """Metric values recorded by a single thread."""
+
+    __slots__ = ('counters', 'histograms')
+
+    def __init__(self) -> None:
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        # value layout: [bucket_0, ..., bucket_n, +Inf, sum]
+        self.histograms: Dict[Tuple[str, Labels], List[float]] = {}
+
+    def merge_into(self, other: '_Shard') -> None:
+        for key, value in list(self.counters.items()):
+            other.counters[key] = other.counters.get(key, 0) + value
+        for key, values in list(self.histograms.items()):
+            target = other.histograms.get(key)
+            if target is None:
+                other.histograms[key] = list(values)
+            else:
+                for index, value in enumerate(values):
+                    target[index] += value
+
+    def to_json(self) -> Dict:
+        return {
+            'counters': [[name, [list(label) for label in labels], value] for (name, labels), value in self.counters.items()],
+            'histograms': [[name, [list(label) for label in labels], values] for (name, labels), values in self.histograms.items()],
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict) -> '_Shard':
+        shard = cls()
+        for name, labels, value in data['counters']:
+            shard.counters[(name, tuple(tuple(label) for label in labels))] = value
+        for name, labels, values in data['histograms']:
+            shard.histograms[(name, tuple(tuple(label) for label in labels))] = values
+        return shard
+
+
+class _ShardHandle:
+    """Thread-local owner of a shard; its collection retires the shard."""
+
+    __slots__ = ('shard', '__weakref__')
+
+    def __init__(self, shard: _Shard) -> None:
+        self.shard = shard
+
+
+class MetricsRegistry:
+    """Counters and histograms aggregated from per-thread shards."""
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._retired = _Shard()
+        self._lock = threading.Lock()  # only taken on thread start/exit and on scrape
+        self._metadata: Dict[str, Tuple[str, str, Tuple[float, ...]]] = {}
+        self._directory: Optional[str] = None
+        self._export_path: Optional[str] = None
+        self._exporter: Optional[threading.Thread] = None
+        self._exporter_stop = threading.Event()
+
+    def counter(self, name: str, help_text: str) -> None:
+        self._metadata[name] = ('counter', help_text, ())
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float]) -> None:
+        self._metadata[name] = ('histogram', help_text, tuple(buckets))
+
+    def _shard(self) -> _Shard:
+        handle = getattr(self._local, 'handle', None)
+        if handle is None:
+            shard = _Shard()
+            handle = _ShardHandle(shard)
+            with self._lock:
+                self._shards.append(shard)
+            weakref.finalize(handle, self._retire, shard)
+            self._local.handle = handle
+        return handle.shard
+
+    def _retire(self, shard: _Shard) -> None:
+        with self._lock:
+            shard.merge_into(self._retired)
+            if shard in self._shards:
+                self._shards.remove(shard)
+
+    def inc(self, name: str, labels: Labels = (), amount: float = 1) -> None:
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: Labels = ()) -> None:
+        histograms = self._shard().histograms
+        key = (name, labels)
+        buckets = self._metadata[name][2]
+        values = histograms.get(key)
+        if values is None:
+            values = histograms[key] = [0.0] * (len(buckets) + 2)
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                values[index] += 1
+                break
+        else:
+            values[len(buckets)] += 1
+        values[-1] += value
+
+    def snapshot(self) -> _Shard:
+        """Merge every shard into a single consistent-enough view."""
+        merged = _Shard()
+        with self._lock:
+            self._retired.merge_into(merged)
+            shards = list(self._shards)
+        for shard in shards:
+            shard.merge_into(merged)
+        return merged
+
+    def enable_multiprocess(self, directory: str, interval: float = EXPORT_INTERVAL) -> None:
+        """Export this process's totals to ``directory`` and render the sum over every process there."""
+        self.disable_multiprocess()
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._interval = interval
+        self._start_exporter()
+
+    def disable_multiprocess(self) -> None:
+        thread, self._exporter = self._exporter, None
+        if thread is not None:
+            self._exporter_stop.set()
+            thread.join()
+        self._directory = self._export_path = None
+
+    def _start_exporter(self) -> None:
+        # The pid lets a scrape tell exited workers apart; the suffix survives pid reuse
+        self._export_path = os.path.join(self._directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json")
+        self._exporter_stop = threading.Event()
+        self._exporter = threading.Thread(target=self._export_loop, name='library-metrics-exporter', daemon=True)
+        self._exporter.start()
+
+    def _export_loop(self) -> None:
+        while not self._exporter_stop.wait(self._interval):
+            self.export()
+
+    def export(self) -> None:
+        """Write this process's totals to its file in the multiprocess directory."""
+        path = self._export_path
+        if path is None:
+            return
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as handle:
+            json.dump(self.snapshot().to_json(), handle)
+        os.replace(temporary, path)
+
+    def _collect_processes(self) -> _Shard:
+        """Sum of every process's exported totals, folding exited workers into retired.json."""
+        self.export()
+        merged = _Shard()
+        retired_path = os.path.join(self._directory, 'retired.json')
+        with open(os.path.join(self._directory, '.lock'), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            retired = _read_export(retired_path) or _Shard()
+            exited = []
+            for path in glob.glob(os.path.join(self._directory, '*-*.json')):
+                shard = _read_export(path)
+                if shard is None:
+                    continue
+                if _process_alive(os.path.basename(path).split('-', 1)[0]):
+                    shard.merge_into(merged)
+                else:
+                    shard.merge_into(retired)
+                    exited.append(path)
+            if exited:
+                with open(f"{retired_path}.tmp", 'w') as handle:
+                    json.dump(retired.to_json(), handle)
+                os.replace(f"{retired_path}.tmp", retired_path)
+                for path in exited:
+                    os.remove(path)
+        retired.merge_into(merged)
+        return merged
+
+    def _export_at_exit(self) -> None:
+        if self._export_path is not None:
+            self.export()
+
+    def _reinit_after_fork(self) -> None:
+        # The lock may have been held by another thread at fork time, and the
+        # parent's counts belong to the parent: each worker reports its own.
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard()
+        if self._directory is not None:
+            self._start_exporter()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._retired = _Shard()
+            for shard in self._shards:
+                shard.counters.clear()
+                shard.histograms.clear()
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        merged = self._collect_processes() if self._directory is not None else self.snapshot()
+        lines: List[str] = []
+        for name in sorted(self._metadata):
+            metric_type, help_text, buckets = self._metadata[name]
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            if metric_type == 'counter':
+                for (metric, labels), value in sorted(merged.counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                continue
+            for (metric, labels), values in sorted(merged.histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0.0
+                for bound, count in zip(buckets, values):
+                    cumulative += count
+                    bucket_labels = labels + (('le', _format_value(bound)),)
+                    lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {_format_value(cumulative)}')
+                cumulative += values[len(buckets)]
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {_format_value(cumulative)}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(values[-1])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {_format_value(cumulative)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _read_export(path: str) -> Optional[_Shard]:
+    try:
+        with open(path) as handle:
+            return _Shard.from_json(json.load(handle))
+    except (OSError, ValueError):
+        return None
+
+
+def _process_alive(pid: str) -> bool:
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    rendered = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + rendered + '}'
+
+
+def _format_value(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = MetricsRegistry()
+registry.counter('library_http_requests_total', 'HTTP requests processed, by endpoint, method and status.')
+registry.counter('library_http_request_errors_total', 'HTTP requests that raised or returned a 5xx status.')
+registry.histogram('library_http_request_duration_seconds', 'HTTP request latency by endpoint.', LATENCY_BUCKETS)
+registry.histogram('library_sql_statements_per_request', 'SQL statements executed per HTTP request.', STATEMENT_BUCKETS)
+registry.histogram('library_sqlite_seconds_per_request', 'Time spent in SQLite per HTTP request.', DB_TIME_BUCKETS)
+registry.counter('library_sql_statements_total', 'SQL statements executed.')
+registry.counter('library_sql_errors_total', 'SQL statements that raised an sqlite3 error, by kind (locked, busy, other).')
+registry.counter('library_sqlite_seconds_total', 'Total time spent executing SQL statements.')
+registry.counter('library_cache_requests_total', 'Cache lookups by cache name and result (hit or miss).')
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry._reinit_after_fork)
+atexit.register(registry._export_at_exit)
+
+# [statement_count, sqlite_seconds] for the request being handled in this context
+_request_stats: ContextVar[Optional[List[float]]] = ContextVar('library_request_stats', default=None)
+
+
+def record_cache_access(cache: str, hit: bool) -> None:
+    """Count a cache lookup so hit ratios can be derived from /metrics."""
+    registry.inc('library_cache_requests_total', (('cache', cache), ('result', 'hit' if hit else 'miss')))
+
+
+def _error_kind(error: Exception) -> str:
+    message = str(error).lower()
+    if 'locked' in message:
+        return 'locked'
+    if 'busy' in message:
+        return 'busy'
+    return 'other'
+
+
+def _on_query(sql, parameters, elapsed: float, error: Optional[Exception], conn=None) -> None:
+    registry.inc('library_sql_statements_total')
+    registry.inc('library_sqlite_seconds_total', amount=elapsed)
+    if error is not None:
+        registry.inc('library_sql_errors_total', (('kind', _error_kind(error)),))
+    stats = _request_stats.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+
+
+def _before_request() -> None:
+    g.metrics_started = time.perf_counter()
+    g.metrics_token = _request_stats.set([0, 0.0])
+
+
+def _after_request(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _teardown_request(exc: Optional[BaseException]) -> None:
+    started = g.pop('metrics_started', None)
+    token = g.pop('metrics_token', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats = _request_stats.get() or [0, 0.0]
+    if token is not None:
+        _request_stats.reset(token)
+
+    endpoint = request.endpoint or 'unknown'
+    status = 500 if exc is not None else g.pop('metrics_status', 500)
+    endpoint_labels = (('endpoint', endpoint),)
+
+    registry.inc('library_http_requests_total', (('endpoint', endpoint), ('method', request.method), ('status', str(status))))
+    if exc is not None or status >= 500:
+        registry.inc('library_http_request_errors_total', endpoint_labels)
+    registry.observe('library_http_request_duration_seconds', elapsed, endpoint_labels)
+    registry.observe('library_sql_statements_per_request', stats[0], endpoint_labels)
+    registry.observe('library_sqlite_seconds_per_request', stats[1], endpoint_labels)
+
+
+def init_app(app: Flask, multiprocess_dir: Optional[str] = None) -> None:
+    """Attach request timing hooks and the SQL statement listener to the app."""
+    if multiprocess_dir:
+        registry.enable_multiprocess(multiprocess_dir)
+    database.add_query_listener(_on_query)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
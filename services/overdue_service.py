@@ -0,0 +1,89 @@
+"""Background scanner recording newly overdue loans.
+
+A daemon thread calls ``database.scan_new_overdues`` every ``interval``
+seconds. Each scan resumes from the high-water mark stored with the loans, so
+it only touches loans that fell due since the previous one and appends them to
+the ``overdue_events`` table for notifications and reports to consume. The
+same tick passes copies whose hold pickup window has lapsed to the next patron
+in line.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Optional
+
+import database
+
+from .library_service import expire_uncollected_holds
+
+logger = logging.getLogger(__name__)
+
+
+class OverdueScanner:
+    """Runs the incremental overdue scan on a fixed schedule."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.last_recorded = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='library-overdue-scanner', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def scan(self) -> int:
+        """Run one scan now; returns the number of new overdue events."""
+        try:
+            self.last_recorded = database.scan_new_overdues()
+            expire_uncollected_holds()
+        except Exception:
+            # A busy or locked database is retried on the next tick
+            logger.exception("Overdue scan failed")
+            return 0
+        return self.last_recorded
+
+    def _run(self) -> None:
+        self.scan()
+        while not self._stop.wait(self.interval):
+            self.scan()
+
+
+_scanner: Optional[OverdueScanner] = None
+
+
+def start(interval: float) -> OverdueScanner:
+    """Scan for newly overdue loans now and then every ``interval`` seconds."""
+    global _scanner
+    stop()
+    _scanner = OverdueScanner(interval)
+    _scanner.start()
+    return _scanner
+
+
+def stop() -> None:
+    global _scanner
+    if _scanner is not None:
+        _scanner.stop()
+        _scanner = None
+
+
+def _reinit_after_fork() -> None:
+    # Threads do not survive fork; give each worker its own scanner
+    global _scanner
+    if _scanner is not None:
+        _scanner = OverdueScanner(_scanner.interval)
+        _scanner.start()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
@@ -0,0 +1,149 @@
+"""Slow-query log built on the database query listener hooks.
+
+Statements slower than the configured threshold are logged together with the
+shape of their parameters, the service/route function that issued them and
+SQLite's ``EXPLAIN QUERY PLAN`` output, and aggregated per statement.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import sqlite3
+import sys
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import database
+
+logger = logging.getLogger(__name__)
+
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE')
+_CALLER_PACKAGES = ('services.', 'routes.')
+
+
+def _normalize_sql(sql: str) -> str:
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def _params_shape(parameters) -> List[str]:
+    if parameters is None:
+        return ['<many>']
+    if isinstance(parameters, dict):
+        return [f'{key}:{type(value).__name__}' for key, value in parameters.items()]
+    return [type(value).__name__ for value in parameters]
+
+
+def _find_caller() -> str:
+    """Name the innermost service or route function on the current stack."""
+    frame = sys._getframe(1)
+    fallback = None
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith(_CALLER_PACKAGES) and module != __name__:
+            return f"{module}.{frame.f_code.co_name}"
+        if fallback is None and module not in (__name__, 'database'):
+            fallback = f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return fallback or 'unknown'
+
+
+def _explain(conn: sqlite3.Connection, sql: str, parameters) -> List[str]:
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE) or parameters is None:
+        return []
+    # On the connection that ran the statement, so shard statements see their own
+    # tables and the attached library; the base execute keeps the EXPLAIN untraced
+    try:
+        rows = sqlite3.Connection.execute(conn, f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()
+    except sqlite3.Error as exc:
+        return [f'unavailable: {exc}']
+    return [row[-1] for row in rows]
+
+
+class SlowQueryLog:
+    """Query listener that records statements slower than ``threshold_ms``."""
+
+    def __init__(self, threshold_ms: float, max_recent: int = 50) -> None:
+        self.threshold_ms = threshold_ms
+        self._lock = threading.Lock()
+        self._by_statement: Dict[str, Dict] = {}
+        self._recent: Deque[Dict] = deque(maxlen=max_recent)
+
+    def __call__(self, sql, parameters, elapsed: float, error: Optional[Exception], conn: sqlite3.Connection) -> None:
+        elapsed_ms = elapsed * 1000
+        if elapsed_ms < self.threshold_ms:
+            return
+        statement = _normalize_sql(sql)
+        entry = {
+            'sql': statement,
+            'elapsed_ms': round(elapsed_ms, 3),
+            'params_shape': _params_shape(parameters),
+            'caller': _find_caller(),
+            'database': getattr(conn, 'path', None),
+            'plan': _explain(conn, sql, parameters),
+            'error': str(error) if error else None,
+        }
+        logger.warning(
+            "Slow query (%.1f ms) from %s: %s params=%s plan=%s",
+            elapsed_ms, entry['caller'], statement, entry['params_shape'], ' | '.join(entry['plan'])
+        )
+        with self._lock:
+            self._recent.append(entry)
+            summary = self._by_statement.get(statement)
+            if summary is None:
+                summary = self._by_statement[statement] = {
+                    'sql': statement, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'callers': {}
+                }
+            summary['count'] += 1
+            summary['total_ms'] += elapsed_ms
+            summary['max_ms'] = max(summary['max_ms'], elapsed_ms)
+            summary['callers'][entry['caller']] = summary['callers'].get(entry['caller'], 0) + 1
+            summary['params_shape'] = entry['params_shape']
+            summary['plan'] = entry['plan']
+
+    def summary(self) -> Dict:
+        """Aggregated slow statements ordered by total time, plus the most recent entries."""
+        with self._lock:
+            statements = [
+                dict(item, callers=dict(item['callers']), total_ms=round(item['total_ms'], 3), max_ms=round(item['max_ms'], 3))
+                for item in self._by_statement.values()
+            ]
+            recent = list(self._recent)
+        statements.sort(key=lambda item: item['total_ms'], reverse=True)
+        return {
+            'enabled': True,
+            'threshold_ms': self.threshold_ms,
+            'total_slow_queries': sum(item['count'] for item in statements),
+            'statements': statements,
+            'recent': recent,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_statement.clear()
+            self._recent.clear()
+
+
+_slow_query_log: Optional[SlowQueryLog] = None
+
+
+def enable(threshold_ms: float) -> SlowQueryLog:
+    """Attach a slow-query log to every connection opened by get_db_connection."""
+    global _slow_query_log
+    disable()
+    _slow_query_log = SlowQueryLog(threshold_ms)
+    database.add_query_listener(_slow_query_log)
+    return _slow_query_log
+
+
+def disable() -> None:
+    global _slow_query_log
+    if _slow_query_log is not None:
+        database.remove_query_listener(_slow_query_log)
+        _slow_query_log = None
+
+
+def get_slow_query_summary() -> Dict:
+    if _slow_query_log is None:
+        return {'enabled': False, 'threshold_ms': None, 'total_slow_queries': 0, 'statements': [], 'recent': []}
+    return _slow_query_log.summary()
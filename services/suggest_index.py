@@ -0,0 +1,105 @@
+"""Prefix completions for search-as-you-type, ranked by popularity.
+
+Distinct normalized strings (titles or author names) are kept in a sorted
+list, so the completions of a prefix are one contiguous slice found with two
+binary searches. Each string carries a weight, the number of times its books
+have been borrowed. Short slices are ranked on the fly; for prefixes whose
+slice is long (``"t"``, ``"the "``) the best ``TOP_K`` strings are kept and
+updated in place as weights grow, so a borrow never forces a rescan.
+"""
+from __future__ import annotations
+
+import heapq
+from bisect import bisect_left, insort
+from typing import Dict, List, Tuple
+
+TOP_K = 50
+# Slices up to this length are ranked per request; longer ones use a kept top list
+_SCAN_LIMIT = 2000
+# Sorts after any character of a normalized string, closing the prefix range
+_END = '\U0010ffff'
+
+
+def normalize(text: str) -> str:
+    return ' '.join(text.lower().split())
+
+
+class PrefixSuggester:
+    """Sorted distinct strings with popularity weights."""
+
+    def __init__(self) -> None:
+        self._keys: List[str] = []
+        self._display: Dict[str, str] = {}
+        self._books: Dict[str, int] = {}  # books sharing the string; it is dropped at zero
+        self._weights: Dict[str, int] = {}
+        self._top: Dict[str, List[str]] = {}  # prefix -> best keys, for long slices only
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _rank(self, key: str) -> Tuple[int, str]:
+        return -self._weights[key], key
+
+    def add(self, text: str, weight: int = 0) -> None:
+        key = normalize(text)
+        if key not in self._books:
+            insort(self._keys, key)
+            self._display[key] = text
+            self._books[key] = 0
+            self._weights[key] = 0
+        self._books[key] += 1
+        self._weights[key] += weight
+        self._promote(key)
+
+    def remove(self, text: str, weight: int = 0) -> None:
+        key = normalize(text)
+        if key not in self._books:
+            return
+        self._books[key] -= 1
+        self._weights[key] -= weight
+        self._forget(key)
+        if self._books[key] <= 0:
+            del self._keys[bisect_left(self._keys, key)]
+            del self._display[key], self._books[key], self._weights[key]
+
+    def bump(self, text: str, amount: int = 1) -> None:
+        key = normalize(text)
+        if key in self._weights:
+            self._weights[key] += amount
+            if amount >= 0:
+                self._promote(key)
+            else:
+                self._forget(key)
+
+    def _promote(self, key: str) -> None:
+        # A grown weight can only move key up, so kept top lists stay exact
+        for length in range(1, len(key) + 1):
+            top = self._top.get(key[:length])
+            if top is None:
+                continue
+            if key not in top:
+                top.append(key)
+            top.sort(key=self._rank)
+            del top[TOP_K:]
+
+    def _forget(self, key: str) -> None:
+        # A shrunk weight may let an unlisted key in; rebuild those lists on demand
+        for length in range(1, len(key) + 1):
+            self._top.pop(key[:length], None)
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """Up to ``limit`` (text, weight) completions of prefix, most popular first."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        keys = self._keys
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + _END, start)
+        if end - start <= _SCAN_LIMIT or limit > TOP_K:
+            best = heapq.nsmallest(limit, keys[start:end], key=self._rank)
+        else:
+            top = self._top.get(prefix)
+            if top is None:
+                top = self._top[prefix] = heapq.nsmallest(TOP_K, keys[start:end], key=self._rank)
+            best = top[:limit]
+        return [(self._display[key], self._weights[key]) for key in best]
@@ -0,0 +1,138 @@
+"""Trigram inverted index for case-insensitive substring search.
+
+Every three-character window of a normalized string maps to a posting list of
+book ids. A query's candidates are the intersection of its trigrams' posting
+lists; callers verify each candidate against the current text, so postings
+left behind by retitled or deleted books never produce wrong results.
+"""
+from __future__ import annotations
+
+import json
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set
+
+FORMAT_VERSION = 2  # 1 was pickled; JSON cannot run code when the file is read
+# Intersect by iterating a posting list up to this many times longer than the
+# current matches; binary-search longer lists instead
+_SCAN_FACTOR = 16
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Posting lists of book ids per trigram, kept as sorted ``array('q')``."""
+
+    def __init__(self) -> None:
+        self._postings: Dict[str, array] = {}
+        # Posting lists appended to out of order; sorted and deduplicated on first query
+        self._unsorted: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._postings)
+
+    def nbytes(self) -> int:
+        """Approximate bytes held by the posting lists, their keys and the map itself."""
+        return sys.getsizeof(self._postings) + sum(
+            sys.getsizeof(gram) + sys.getsizeof(ids) for gram, ids in self._postings.items()
+        )
+
+    def add(self, book_id: int, text: str) -> None:
+        postings = self._postings
+        for gram in trigrams(text):
+            ids = postings.get(gram)
+            if ids is None:
+                postings[gram] = array('q', (book_id,))
+            elif book_id > ids[-1]:
+                ids.append(book_id)
+            elif ids[-1] != book_id:
+                ids.append(book_id)
+                self._unsorted.add(gram)
+
+    def _sorted(self, gram: str) -> Optional[array]:
+        ids = self._postings.get(gram)
+        if ids is not None and gram in self._unsorted:
+            ids = self._postings[gram] = array('q', sorted(set(ids)))
+            self._unsorted.discard(gram)
+        return ids
+
+    def candidates(self, needle: str) -> Optional[List[int]]:
+        """Book ids whose text may contain needle, or None if needle is too short to index."""
+        grams = trigrams(needle)
+        if not grams:
+            return None
+        lists = []
+        for gram in grams:
+            ids = self._sorted(gram)
+            if ids is None:
+                return []
+            lists.append(ids)
+        lists.sort(key=len)
+        matches = set(lists[0])
+        for ids in lists[1:]:
+            if not matches:
+                break
+            if len(ids) <= _SCAN_FACTOR * len(matches):
+                matches.intersection_update(ids)
+            else:
+                # Probing a long posting list beats iterating over it
+                matches = {book_id for book_id in matches if _contains(ids, book_id)}
+        return sorted(matches)
+
+    def compact(self, live_ids: Iterable[int]) -> None:
+        """Drop postings for books that no longer exist."""
+        live = set(live_ids)
+        for gram in list(self._postings):
+            ids = array('q', sorted(book_id for book_id in set(self._postings[gram]) if book_id in live))
+            if ids:
+                self._postings[gram] = ids
+            else:
+                del self._postings[gram]
+        self._unsorted.clear()
+
+
+def _contains(ids: array, book_id: int) -> bool:
+    index = bisect_left(ids, book_id)
+    return index < len(ids) and ids[index] == book_id
+
+
+def save(path: str, catalog_id: Optional[str], version: int, indexes: Dict[str, TrigramIndex]) -> None:
+    """Write indexes built up to catalog ``version`` for a warm start."""
+    for index in indexes.values():
+        for gram in list(index._unsorted):
+            index._sorted(gram)
+    payload = {
+        'format': FORMAT_VERSION,
+        'catalog_id': catalog_id,
+        'version': version,
+        'indexes': {
+            name: {gram: ids.tolist() for gram, ids in index._postings.items()}
+            for name, index in indexes.items()
+        },
+    }
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(payload, handle, separators=(',', ':'))
+
+
+def load(path: str, catalog_id: Optional[str]):
+    """Read indexes saved for this catalog; returns (version, {name: TrigramIndex}) or None."""
+    try:
+        with open(path, encoding='utf-8') as handle:
+            payload = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(payload, dict) or payload.get('format') != FORMAT_VERSION:
+        return None
+    if catalog_id is None or payload.get('catalog_id') != catalog_id:
+        return None
+    indexes = {}
+    try:
+        for name, postings in payload['indexes'].items():
+            index = indexes[name] = TrigramIndex()
+            index._postings = {gram: array('q', ids) for gram, ids in postings.items()}
+    except (AttributeError, KeyError, TypeError, OverflowError):
+        return None
+    return payload['version'], indexes
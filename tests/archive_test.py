@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+from database import archive_returned_records, get_book_by_isbn, get_db_connection
+from services.library_service import (
+    add_book_to_catalog,
+    borrow_book_by_patron,
+    calculate_late_fee_for_book,
+    get_patron_status_report,
+    return_book_by_patron
+)
+
+
+def _age_returned_records(days: int) -> None:
+    conn = get_db_connection()
+    conn.execute(
+        'UPDATE borrow_records SET return_date = ? WHERE return_date IS NOT NULL',
+        ((datetime.now() - timedelta(days=days)).isoformat(),)
+    )
+    conn.commit()
+    conn.close()
+
+
+def _table_count(table: str) -> int:
+    conn = get_db_connection()
+    try:
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _borrow_and_return(isbn: str, title: str = "Archived Book") -> int:
+    add_book_to_catalog(title, "Author", isbn, 2)
+    book_id = get_book_by_isbn(isbn)['id']
+    borrow_book_by_patron("123456", book_id)
+    return_book_by_patron("123456", book_id)
+    return book_id
+
+
+def test_archive_moves_only_old_returned_records():
+    """Test that old returned loans are archived while recent and active loans stay."""
+    old_book = _borrow_and_return("1110000000000")
+    _age_returned_records(400)
+    _borrow_and_return("1110000000001")
+    add_book_to_catalog("Active Book", "Author", "1110000000002", 2)
+    borrow_book_by_patron("123456", get_book_by_isbn("1110000000002")['id'])
+
+    assert archive_returned_records(older_than_days=365) == 1
+    assert _table_count('borrow_records') == 2
+    assert _table_count('borrow_history_archive') == 1
+
+
+def test_archive_runs_in_batches():
+    """Test that archiving works through all records in small batches."""
+    for index in range(5):
+        _borrow_and_return(f"111000000001{index}", title=f"Batch {index}")
+    _age_returned_records(400)
+
+    assert archive_returned_records(older_than_days=365, batch_size=2) == 5
+    assert _table_count('borrow_records') == 0
+
+
+def test_history_and_latest_record_include_archive():
+    """Test that the status report and late fee lookup still see archived loans."""
+    book_id = _borrow_and_return("1110000000020")
+    _age_returned_records(400)
+    archive_returned_records(older_than_days=365)
+
+    report = get_patron_status_report("123456")
+    fee = calculate_late_fee_for_book("123456", book_id)
+
+    assert [entry['title'] for entry in report['history']] == ["Archived Book"]
+    assert report['history'][0]['return_date'] is not None
+    assert fee['status'].startswith("Book returned on")
+    assert return_book_by_patron("123456", book_id) == (False, "This book has already been returned.")
+
+
+def test_archive_in_sharded_layout():
+    """Test that archiving runs in every shard and resharding carries the archive along."""
+    database.configure_shards(2)
+    database.init_database()
+    try:
+        _borrow_and_return("1110000000030")
+        for path in database.borrow_record_paths():
+            conn = database._checkout(False, path)
+            conn.execute('UPDATE borrow_records SET return_date = ? WHERE return_date IS NOT NULL',
+                         ((datetime.now() - timedelta(days=400)).isoformat(),))
+            conn.commit()
+            conn.close()
+
+        assert archive_returned_records(older_than_days=365) == 1
+        database.reshard(1)
+        assert _table_count('borrow_history_archive') == 1
+        assert len(get_patron_status_report("123456")['history']) == 1
+    finally:
+        database.configure_shards(1)
+
+
+def _age_all_shards(days: int) -> None:
+    for path in database.borrow_record_paths():
+        conn = database._checkout(False, path)
+        conn.execute('UPDATE borrow_records SET return_date = ? WHERE return_date IS NOT NULL',
+                     ((datetime.now() - timedelta(days=days)).isoformat(),))
+        conn.commit()
+        conn.close()
+
+
+def test_archive_after_reshard_does_not_collide():
+    """Test that archiving keeps working after reshard renumbers archived rows."""
+    for index in range(4):
+        _borrow_and_return(f"111000000004{index}")
+    _age_returned_records(400)
+    assert archive_returned_records(older_than_days=365) == 4
+
+    database.reshard(2)
+    try:
+        for index in range(4):
+            book_id = get_book_by_isbn(f"111000000004{index}")['id']
+            borrow_book_by_patron("123456", book_id)
+            return_book_by_patron("123456", book_id)
+        _age_all_shards(400)
+
+        assert archive_returned_records(older_than_days=365) == 4
+        assert len(get_patron_status_report("123456")['history']) == 8
+    finally:
+        database.reshard(1)
+    assert _table_count('borrow_history_archive') == 8
+
+
+def test_existing_archive_gains_source_id():
+    """Test that an archive from before source_id keeps its rows and records their origin."""
+    conn = get_db_connection()
+    conn.execute('DROP TABLE borrow_history_archive')
+    conn.execute('''
+        CREATE TABLE borrow_history_archive (
+            id INTEGER PRIMARY KEY, patron_id TEXT NOT NULL, book_id INTEGER NOT NULL,
+            borrow_date TEXT NOT NULL, due_date TEXT NOT NULL, return_date TEXT NOT NULL, archived_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute("INSERT INTO borrow_history_archive VALUES (7, '123456', 1, '2020-01-01', '2020-01-15', '2020-01-10', '2021-01-01')")
+    conn.commit()
+    conn.close()
+
+    database.init_database()
+
+    conn = get_db_connection()
+    try:
+        assert [tuple(row) for row in conn.execute('SELECT id, source_id FROM borrow_history_archive')] == [(7, 7)]
+    finally:
+        conn.close()
@@ -0,0 +1,135 @@
+import json
+
+import database
+from app import create_app
+from database import get_book_by_isbn
+from services import availability_stream
+from services.availability_stream import AvailabilityPublisher, Subscriber
+from services.library_service import add_book_to_catalog, borrow_book_by_patron
+
+
+def _book(isbn: str, copies: int = 2) -> int:
+    add_book_to_catalog("Stream Book", "Stream Author", isbn, copies)
+    return get_book_by_isbn(isbn)['id']
+
+
+def _payload(event: str) -> dict:
+    return json.loads(event.split('data: ', 1)[1])
+
+
+def test_subscriber_coalesces_per_book_and_flags_lag():
+    """Test that a slow client keeps only the latest state per book, up to its bound."""
+    subscriber = Subscriber(max_pending=2)
+    subscriber.offer({'id': 1, 'book_id': 7, 'available_copies': 1})
+    subscriber.offer({'id': 2, 'book_id': 8, 'available_copies': 4})
+    subscriber.offer({'id': 3, 'book_id': 7, 'available_copies': 0})
+
+    assert [update['id'] for update in subscriber.take(0)] == [2, 3]
+    assert subscriber.lagged is False
+
+    for update_id, book_id in ((4, 1), (5, 2), (6, 3)):
+        subscriber.offer({'id': update_id, 'book_id': book_id, 'available_copies': 0})
+    assert subscriber.lagged is True
+
+
+def test_local_borrow_is_pushed_to_every_subscriber():
+    """Test that a committed borrow wakes the publisher and reaches all streams."""
+    book_id = _book("2200000000000")
+    publisher = AvailabilityPublisher(poll_interval=60)
+    first, second = publisher.subscribe(10), publisher.subscribe(10)
+    try:
+        borrow_book_by_patron("123456", book_id)
+        updates = first.take(5)
+        assert [(update['book_id'], update['available_copies']) for update in updates] == [(book_id, 1)]
+        assert second.take(5) == updates
+    finally:
+        publisher.stop()
+
+
+def test_stream_replays_after_last_event_id_then_sends_heartbeats():
+    """Test that reconnecting streams catch up from the feed, latest state per book."""
+    book_id = _book("2200000000001")
+    last_seen = database.get_latest_change_seq()
+    borrow_book_by_patron("123456", book_id)
+    borrow_book_by_patron("654321", book_id)
+    publisher = AvailabilityPublisher(poll_interval=60)
+    try:
+        events = availability_stream.stream(publisher, last_seen, heartbeat=0.01, max_pending=10)
+        assert next(events).startswith("retry: ")
+        replayed = next(events)
+        assert replayed.startswith(f"id: {database.get_latest_change_seq()}\nevent: availability\n")
+        assert _payload(replayed) == {'book_id': book_id, 'available_copies': 0, 'total_copies': 2}
+        assert next(events) == ": heartbeat\n\n"
+        events.close()
+        assert publisher._subscribers == []
+    finally:
+        publisher.stop()
+
+
+def test_availability_endpoint_streams_uncompressed_events():
+    """Test that /api/stream/availability is SSE, resumable and never gzip-buffered."""
+    client = create_app({
+        'AVAILABILITY_STREAM_ENABLED': True,
+        'AVAILABILITY_STREAM_HEARTBEAT_SECONDS': 0.01,
+        'COMPRESSION_ENABLED': True,
+    }).test_client()
+    book_id = _book("2200000000002")
+    last_seen = database.get_latest_change_seq()
+    borrow_book_by_patron("123456", book_id)
+
+    response = client.get('/api/stream/availability', buffered=False,
+                          headers={'Last-Event-ID': str(last_seen), 'Accept-Encoding': 'gzip'})
+    assert response.mimetype == 'text/event-stream'
+    assert 'Content-Encoding' not in response.headers
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b"retry: ")
+    assert _payload(next(chunks).decode())['available_copies'] == 1
+    response.close()
+
+    page = client.get('/catalog').get_data(as_text=True)
+    assert f"let lastEventId = {database.get_latest_change_seq()};" in page
+    assert "new EventSource('/api/stream/availability?last_event_id=' + lastEventId)" in page
+    disabled = create_app().test_client()
+    assert disabled.get('/api/stream/availability').status_code == 404
+    assert "EventSource" not in disabled.get('/catalog').get_data(as_text=True)
+
+
+def test_streams_per_worker_are_capped():
+    """Test that a worker at AVAILABILITY_STREAM_MAX_CLIENTS answers 503 with a retry delay."""
+    client = create_app({
+        'AVAILABILITY_STREAM_ENABLED': True,
+        'AVAILABILITY_STREAM_MAX_CLIENTS': 1,
+    }).test_client()
+
+    first = client.get('/api/stream/availability', buffered=False)
+    assert first.status_code == 200
+    rejected = client.get('/api/stream/availability')
+    assert rejected.status_code == 503
+    assert rejected.headers['Retry-After'] == str(availability_stream.RETRY_MS // 1000)
+    assert rejected.get_data(as_text=True) == f"retry: {availability_stream.RETRY_MS}\n\n"
+
+    first.close()
+    second = client.get('/api/stream/availability', buffered=False)
+    assert second.status_code == 200
+    second.close()
+    assert availability_stream.get_publisher()._subscribers == []
+
+
+def test_catalog_rows_carry_both_actions_for_live_updates():
+    """Test that rows render Borrow and Place Hold, hiding the one availability rules out."""
+    client = create_app({'AVAILABILITY_STREAM_ENABLED': True}).test_client()
+    book_id = _book("2200000000003", copies=1)
+
+    def row_forms():
+        page = client.get('/catalog').get_data(as_text=True)
+        row = page.split(f'<tr data-book-id="{book_id}">', 1)[1].split('</tr>', 1)[0]
+        return {form: f'class="action-{form}" hidden' in row
+                for form in ('borrow', 'hold') if f'class="action-{form}"' in row}, page
+
+    forms, page = row_forms()
+    assert forms == {'borrow': False, 'hold': True}
+    assert "form.action-borrow').hidden = update.available_copies <= 0" in page
+    assert "form.action-hold').hidden = update.available_copies > 0" in page
+
+    borrow_book_by_patron("123456", book_id)
+    assert row_forms()[0] == {'borrow': True, 'hold': False}
@@ -67,4 +67,21 @@ def test_borrow_book_patron_borrow_count():
 
 
     assert "maximum borrowing" in message
-    assert success == False
\ No newline at end of file
+    assert success == False
+
+
+def test_borrow_and_return_api_report_outcome():
+    """Test that /api/borrow and /api/return answer 200 or 400 with the service message."""
+    from app import create_app
+    client = create_app().test_client()
+    add_book_to_catalog("Api Book", "Api Author", "1234567890999", 1)
+    book_id = client.get('/api/search?q=1234567890999&type=isbn').get_json()['results'][0]['id']
+
+    response = client.post('/api/borrow', json={'patron_id': "123456", 'book_id': book_id})
+    assert response.status_code == 200 and response.get_json()['success'] is True
+    response = client.post('/api/borrow', data={'patron_id': "654321", 'book_id': str(book_id)})
+    assert response.status_code == 400
+    assert response.get_json() == {'success': False, 'message': "This book is currently not available."}
+
+    assert client.post('/api/return', data={'patron_id': "654321", 'book_id': str(book_id)}).status_code == 400
+    assert client.post('/api/return', json={'patron_id': "123456", 'book_id': book_id}).status_code == 200
@@ -0,0 +1,170 @@
+import sys
+
+import database
+from app import create_app
+from database import get_all_books, get_book_by_isbn, get_db_connection
+from services import catalog_service
+from services.library_service import (
+    add_book_to_catalog,
+    borrow_book_by_patron,
+    get_catalog_books,
+    iter_catalog_books,
+    return_book_by_patron,
+    search_books_in_catalog
+)
+from tests.query_budget import count_queries
+
+
+def _add_books():
+    add_book_to_catalog("Zebra Tales", "Ann Author", "4440000000000", 2)
+    add_book_to_catalog("Apple Stories", "Ann Author", "4440000000001", 1)
+    add_book_to_catalog("Middle Book", "Bob Writer", "4440000000002", 3)
+
+
+def test_snapshot_matches_database_catalog():
+    """Test that the snapshot returns the same rows, in the same order, as get_all_books()."""
+    _add_books()
+    snapshot = catalog_service.enable()
+
+    assert snapshot.books() == get_all_books()
+    assert get_catalog_books() == get_all_books()
+
+
+def test_snapshot_refreshes_incrementally():
+    """Test that only books changed since the last refresh are reapplied."""
+    _add_books()
+    snapshot = catalog_service.enable()
+    book_id = get_book_by_isbn("4440000000002")['id']
+
+    assert snapshot.refresh() == 0
+    conn = get_db_connection()
+    conn.execute('UPDATE books SET available_copies = 2 WHERE id = ?', (book_id,))
+    conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                 "VALUES ('Another', 'Cy Author', '4440000000003', 1, 1)")
+    conn.commit()
+    conn.close()
+
+    assert snapshot.refresh() == 2
+    assert snapshot.get(book_id)['available_copies'] == 2
+    assert len(snapshot) == 4
+
+
+def test_local_book_writes_refresh_snapshot():
+    """Test that book writes made by this process are applied without waiting for a read."""
+    _add_books()
+    snapshot = catalog_service.enable()
+    book_id = get_book_by_isbn("4440000000002")['id']
+
+    assert borrow_book_by_patron("123456", book_id)[0] is True
+    add_book_to_catalog("Another", "Cy Author", "4440000000003", 1)
+
+    assert snapshot.refresh() == 0
+    assert snapshot.get(book_id)['available_copies'] == 2
+    assert len(snapshot) == 4
+
+
+def test_snapshot_reflects_updates_and_deletes():
+    """Test that title changes reorder the catalog and deleted books disappear."""
+    _add_books()
+    snapshot = catalog_service.enable()
+    conn = get_db_connection()
+    conn.execute("UPDATE books SET title = 'Aardvark' WHERE isbn = '4440000000000'")
+    conn.execute("DELETE FROM books WHERE isbn = '4440000000001'")
+    conn.commit()
+    conn.close()
+
+    assert [book['title'] for book in snapshot.books()] == ["Aardvark", "Middle Book"]
+    assert snapshot.books() == get_all_books()
+
+
+def test_unchanged_catalog_read_is_one_statement():
+    """Test that reading a current snapshot costs a single version probe."""
+    _add_books()
+    catalog_service.enable()
+
+    with count_queries() as counter:
+        get_catalog_books()
+        search_books_in_catalog("author", "author")
+
+    assert len(counter.statements) == 2
+
+
+def test_streamed_catalog_uses_snapshot():
+    """Test that the streamed catalog page reads the snapshot rather than the books table."""
+    _add_books()
+    catalog_service.enable()
+    app = create_app()
+    app.config['STREAM_TEMPLATES'] = True
+    expected = get_all_books()
+
+    with count_queries() as counter:
+        assert list(iter_catalog_books()) == expected
+
+    assert len(counter.statements) == 1
+    assert 'FROM books' not in counter.statements[0]
+    with app.test_client() as client:
+        page = client.get('/catalog').get_data(as_text=True)
+    assert page.index("Apple Stories") < page.index("Middle Book") < page.index("Zebra Tales")
+
+
+def test_search_and_returns_use_snapshot():
+    """Test that search and book lookups give the same answers through the snapshot."""
+    _add_books()
+    expected = search_books_in_catalog("ann", "author")
+    catalog_service.enable()
+    book_id = get_book_by_isbn("4440000000001")['id']
+
+    assert search_books_in_catalog("ann", "author") == expected
+    assert search_books_in_catalog("444-0000000001", "isbn")[0]['id'] == book_id
+    assert borrow_book_by_patron("123456", book_id)[0] is True
+    assert borrow_book_by_patron("654321", book_id) == (False, "This book is currently not available.")
+    assert return_book_by_patron("123456", book_id)[0] is True
+
+
+def test_memory_footprint_endpoint():
+    """Test that the debug endpoint compares the snapshot with dict-per-row storage."""
+    _add_books()
+    client = create_app({'CATALOG_SNAPSHOT_ENABLED': True, 'SEED_SAMPLE_DATA': False}).test_client()
+
+    footprint = client.get('/api/debug/catalog_snapshot').get_json()
+
+    assert footprint['enabled'] is True
+    assert footprint['books'] == 3
+    assert footprint['snapshot_bytes'] > 0 and footprint['dict_rows_bytes'] > 0
+    rows = [dict(book) for book in get_all_books()]
+    assert footprint['dict_rows_bytes'] == sys.getsizeof(rows) + sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values()) for row in rows
+    )
+
+
+def test_snapshot_rows_are_shared_until_the_book_changes():
+    """Test that repeated reads reuse each book's record and a changed book gets a new one."""
+    _add_books()
+    snapshot = catalog_service.enable()
+    first = snapshot.books()
+    book_id = get_book_by_isbn("4440000000002")['id']
+
+    assert all(a is b for a, b in zip(first, snapshot.books()))
+    borrow_book_by_patron("123456", book_id)
+    second = {book['id']: book for book in snapshot.books()}
+    assert second[book_id]['available_copies'] == 2
+    assert all(second[book['id']] is book for book in first if book['id'] != book_id)
+
+
+def test_refresh_reads_changes_outside_the_lock():
+    """Test that the book_changes query runs before the snapshot lock is taken."""
+    _add_books()
+    snapshot = catalog_service.enable()
+    held = []
+
+    def on_query(sql, parameters, elapsed, error, conn):
+        if 'book_changes' in sql:
+            held.append(snapshot._lock.locked())
+
+    database.add_query_listener(on_query)
+    try:
+        add_book_to_catalog("Locked Out", "Cy Author", "4440000000009", 1)
+        snapshot.books()
+    finally:
+        database.remove_query_listener(on_query)
+    assert held and not any(held)
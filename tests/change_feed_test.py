@@ -0,0 +1,147 @@
+import database
+from app import create_app
+from database import compact_events, get_all_books, get_book_by_isbn, get_changes
+from services.library_service import (
+    add_book_to_catalog,
+    borrow_book_by_patron,
+    get_change_feed,
+    return_book_by_patron
+)
+
+
+def _replay(since: int = 0) -> dict:
+    """Latest state per (entity, key) from replaying the feed page by page."""
+    state = {}
+    while True:
+        page = get_change_feed(since, limit=3)
+        for change in page['changes']:
+            state[(change['entity'], change['entity_key'])] = change['data']
+        since = page['next_since']
+        if not page['has_more']:
+            return state
+
+
+def test_borrow_and_return_are_logged_in_order():
+    """Test that book and loan writes append events with increasing sequence numbers."""
+    start = database.get_latest_change_seq()
+    add_book_to_catalog("Feed Book", "Feed Author", "3300000000000", 2)
+    book_id = get_book_by_isbn("3300000000000")['id']
+    borrow_book_by_patron("123456", book_id)
+    return_book_by_patron("123456", book_id)
+
+    changes = get_changes(start)
+    assert [(change['entity'], change['action']) for change in changes] == [
+        ('book', 'insert'), ('loan', 'insert'), ('book', 'update'), ('loan', 'update'), ('book', 'update'),
+    ]
+    assert [change['seq'] for change in changes] == sorted(change['seq'] for change in changes)
+    assert changes[2]['data']['available_copies'] == 1
+    assert changes[3]['data']['return_date'] is not None
+    assert changes[1]['entity_key'] == changes[3]['entity_key']
+
+
+def test_compaction_keeps_latest_state_of_every_entity():
+    """Test that compacted history still replays to the current catalog from 0."""
+    for index in range(3):
+        add_book_to_catalog(f"Compact {index}", "Feed Author", f"330000000010{index}", 3)
+        book_id = get_book_by_isbn(f"330000000010{index}")['id']
+        for _ in range(2):
+            borrow_book_by_patron("123456", book_id)
+            return_book_by_patron("123456", book_id)
+    before = _replay()
+    total = database.get_latest_change_seq()
+
+    removed = compact_events(keep_latest=0, batch_size=4)
+
+    assert removed > 0
+    assert _replay() == before
+    assert database.get_latest_change_seq() == total
+    books = {str(book['id']): book for book in get_all_books()}
+    assert {key: data for (entity, key), data in before.items() if entity == 'book'} == books
+
+
+def test_sharded_loans_are_logged_centrally():
+    """Test that loans written to shard files still reach the single change feed."""
+    database.configure_shards(3)
+    database.init_database()
+    try:
+        add_book_to_catalog("Sharded Feed", "Feed Author", "3300000000200", 5)
+        book_id = get_book_by_isbn("3300000000200")['id']
+        start = database.get_latest_change_seq()
+        patrons = [f"{100000 + i * 7919}" for i in range(3)]
+        for patron in patrons:
+            borrow_book_by_patron(patron, book_id)
+
+        loans = [change for change in get_changes(start) if change['entity'] == 'loan']
+        assert sorted(loan['data']['patron_id'] for loan in loans) == sorted(patrons)
+    finally:
+        database.configure_shards(1)
+
+
+def test_failed_feed_append_does_not_fail_shard_loans(monkeypatch):
+    """Test that loans commit when the feed is unwritable, and their queued events follow later."""
+    database.configure_shards(2)
+    database.init_database()
+    try:
+        add_book_to_catalog("Outbox Feed", "Feed Author", "3300000000201", 1)
+        book_id = get_book_by_isbn("3300000000201")['id']
+        start = database.get_latest_change_seq()
+
+        def fail(conn, events):
+            raise database.sqlite3.OperationalError("database is locked")
+
+        monkeypatch.setattr(database, '_append_loan_events', fail)
+        assert borrow_book_by_patron("123456", book_id)[0] is True
+        assert return_book_by_patron("123456", book_id)[0] is True
+        assert get_book_by_isbn("3300000000201")['available_copies'] == 1
+        assert [change for change in get_changes(start) if change['entity'] == 'loan'] == []
+
+        monkeypatch.undo()
+        assert database.drain_loan_outbox() == 2
+        loans = [change for change in get_changes(start) if change['entity'] == 'loan']
+        assert [loan['action'] for loan in loans] == ['insert', 'update']
+        assert loans[1]['data']['return_date'] is not None
+        assert database.drain_loan_outbox() == 0
+    finally:
+        database.configure_shards(1)
+
+
+def test_concurrent_outbox_drains_append_each_event_once(monkeypatch):
+    """Test that two workers draining the same outbox rows leave a single event per loan change."""
+    database.configure_shards(2)
+    database.init_database()
+    try:
+        add_book_to_catalog("Outbox Race", "Feed Author", "3300000000202", 2)
+        book_id = get_book_by_isbn("3300000000202")['id']
+        start = database.get_latest_change_seq()
+        monkeypatch.setattr(database, 'drain_loan_outbox', lambda paths=None: 0)
+        assert borrow_book_by_patron("123456", book_id)[0] is True
+        monkeypatch.undo()
+
+        shard = database.shard_path(database.shard_for_patron("123456"))
+        conn = database.connect(shard)
+        conn.row_factory = database.sqlite3.Row
+        queued = conn.execute('SELECT * FROM loan_outbox ORDER BY id').fetchall()
+        conn.close()
+        # Another worker read the same rows and appended them before this drain clears them
+        assert database._run_write(lambda conn: database._append_loan_events(conn, queued)) == 1
+
+        assert database.drain_loan_outbox() == 0
+        loans = [change for change in get_changes(start) if change['entity'] == 'loan']
+        assert [loan['action'] for loan in loans] == ['insert']
+    finally:
+        database.configure_shards(1)
+
+
+def test_changes_endpoint_pages_and_validates():
+    """Test that /api/changes pages with since/limit and rejects bad parameters."""
+    client = create_app().test_client()
+    add_book_to_catalog("Endpoint Feed", "Feed Author", "3300000000300", 1)
+
+    first = client.get('/api/changes?since=0&limit=2').get_json()
+    assert first['count'] == 2 and first['has_more'] is True
+    second = client.get(f"/api/changes?since={first['next_since']}&limit=1000").get_json()
+    assert second['changes'][0]['seq'] > first['changes'][-1]['seq']
+    assert second['changes'][-1]['data']['title'] == "Endpoint Feed"
+
+    assert client.get('/api/changes?limit=0').status_code == 400
+    assert client.get('/api/changes?since=-1').status_code == 400
@@ -0,0 +1,92 @@
+import gzip
+
+from app import create_app
+from services.compression_service import CompressedCache
+from services.library_service import add_book_to_catalog
+
+
+def _client(**config):
+    return create_app(dict({'COMPRESSION_ENABLED': True}, **config)).test_client()
+
+
+def test_catalog_gzip_when_accepted():
+    """Test that a large HTML page is gzipped only for clients that accept it."""
+    client = _client()
+    plain = client.get('/catalog')
+    compressed = client.get('/catalog', headers={'Accept-Encoding': 'gzip, deflate'})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.data) == plain.data
+    assert int(compressed.headers['Content-Length']) == len(compressed.data) < len(plain.data)
+
+
+def test_small_and_refused_responses_stay_plain():
+    """Test the size threshold and an explicit gzip;q=0."""
+    client = _client(COMPRESSION_MIN_SIZE=10_000_000)
+    assert 'Content-Encoding' not in client.get('/catalog', headers={'Accept-Encoding': 'gzip'}).headers
+
+    client = _client()
+    assert 'Content-Encoding' not in client.get('/catalog', headers={'Accept-Encoding': 'gzip;q=0'}).headers
+
+
+def test_repeated_responses_reuse_compressed_bytes():
+    """Test that a repeated search is served from the compressed cache, and a changed one is not."""
+    app = create_app({'COMPRESSION_ENABLED': True, 'COMPRESSION_MIN_SIZE': 10})
+    client = app.test_client()
+    headers = {'Accept-Encoding': 'gzip'}
+    cache = app.extensions['compressor'].cache
+
+    first = client.get('/api/search?q=the&type=title', headers=headers)
+    second = client.get('/api/search?q=the&type=title', headers=headers)
+    assert first.data == second.data
+    assert len(cache) == 1
+
+    add_book_to_catalog("The New Arrival", "Author", "9990000000000", 1)
+    third = client.get('/api/search?q=the&type=title', headers=headers)
+    assert b"The New Arrival" in gzip.decompress(third.data)
+    assert len(cache) == 2
+
+
+def test_streamed_pages_are_compressed_incrementally():
+    """Test that streamed pages stay streamed and decompress to the full page."""
+    plain = create_app().test_client().get('/catalog').data
+    response = _client(STREAM_TEMPLATES=True).get('/catalog', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.is_streamed
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == plain
+
+
+def test_compressed_cache_is_bounded_by_bytes():
+    """Test that the least recently used bodies are evicted past max_bytes."""
+    cache = CompressedCache(10)
+    cache.put(('gzip', b'a'), b'12345')
+    cache.put(('gzip', b'b'), b'12345')
+    cache.get(('gzip', b'a'))
+    cache.put(('gzip', b'c'), b'123')
+
+    assert cache.get(('gzip', b'b')) is None
+    assert cache.get(('gzip', b'a')) == b'12345'
+    assert cache.size == 8
+
+
+def test_brotli_preferred_when_installed(monkeypatch):
+    """Test that br is negotiated over gzip when the brotli package is importable."""
+    from services import compression_service
+
+    class FakeBrotli:
+        @staticmethod
+        def compress(body, quality):
+            return b'br' + bytes([quality]) + body[:10]
+
+    monkeypatch.setattr(compression_service, 'brotli', FakeBrotli)
+    client = _client(COMPRESSION_BROTLI_QUALITY=5)
+
+    response = client.get('/catalog', headers={'Accept-Encoding': 'gzip, br'})
+    gzipped = client.get('/catalog', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.data.startswith(b'br\x05')
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
@@ -1,21 +1,73 @@
 """
-This file just creates a test database before each test and deletes it after the test
+This file gives every test a fresh database and provides the query_budget
+fixture used to catch N+1 query regressions.
+
+The schema is built once per session in an in-memory template database and
+copied into a new in-memory database for each test with the SQLite backup API, so
+no test runs DDL or touches the disk. Database names include the pytest-xdist
+worker id, so ``pytest -n auto`` workers never share one. Tests marked
+``file_database`` (or every test, with LIBRARY_TEST_DATABASE=file) run
+against a database file instead.
 """
 
 import pytest
+import glob
+import itertools
 import os
-from database import init_database
+from database import copy_database, init_database
+from tests.query_budget import query_budget as _query_budget
 
+WORKER = os.environ.get('PYTEST_XDIST_WORKER', 'main')
+IN_MEMORY = os.environ.get('LIBRARY_TEST_DATABASE', 'memory') != 'file'
+# A fresh name per test: a connection leaked by one test (e.g. an unfinished
+# streamed response) cannot lock or leak rows into the next test's database
+_test_numbers = itertools.count()
 
-@pytest.fixture(autouse=True)
-def setup_test_database():
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'file_database: run the test against a database file instead of memory')
+
+
+@pytest.fixture(scope='session')
+def template_database():
+    """An initialized, empty database, built once and copied for each test."""
     import database
     original_database = database.DATABASE
-    test_database = "test_library.db"
-    database.DATABASE = test_database
+    template = f"memory:template_library-{WORKER}"
+    database.DATABASE = template
     init_database()
+    database.close_pools()
+    database.DATABASE = original_database
+    yield template
+    database.remove_database(template)
+
+
+@pytest.fixture(autouse=True)
+def setup_test_database(request, template_database):
+    import database
+    original_database = database.DATABASE
+    if IN_MEMORY and request.node.get_closest_marker('file_database') is None:
+        database.DATABASE = f"memory:test_library-{WORKER}-{next(_test_numbers)}"
+        copy_database(template_database, database.DATABASE)
+    else:
+        database.DATABASE = f"test_library-{WORKER}.db"
+        init_database()
     yield
+    from services import availability_stream, catalog_service, overdue_service
+    catalog_service.disable()
+    overdue_service.stop()
+    availability_stream.stop()
+    database.stop_write_scheduler()
+    database.close_pools()
     database.DATABASE = original_database
-    # clean up test database
-    if os.path.exists(test_database):
-        os.remove(test_database)
\ No newline at end of file
+    # drop the test databases (in memory, or files with their WAL and shard files)
+    for path in database.memory_databases():
+        if path != template_database:
+            database.remove_database(path)
+    for path in glob.glob(f"test_library-{WORKER}.*"):
+        os.remove(path)
+
+@pytest.fixture
+def query_budget():
+    """Context manager factory: ``with query_budget(4, max_connections=4): ...``"""
+    return _query_budget
@@ -0,0 +1,106 @@
+import sqlite3
+
+import pytest
+
+import database
+from database import get_book_by_isbn, get_db_connection, get_read_connection, insert_book
+
+
+def test_read_connection_is_read_only():
+    """Test that read pool connections cannot write."""
+    conn = get_read_connection()
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES ('a', 'b', '1', 1, 1)")
+    finally:
+        conn.close()
+
+
+def test_read_connections_are_reused():
+    """Test that closing a pooled connection returns it for reuse."""
+    first = get_read_connection()
+    first.close()
+    second = get_read_connection()
+    second.close()
+
+    assert first is second
+
+
+def test_pools_are_separate_and_sized_independently():
+    """Test that read and write pools keep their own idle connections."""
+    database.configure_pools(read_size=1, write_size=0)
+    try:
+        reader, writer = get_read_connection(), get_db_connection()
+        reader.close()
+        writer.close()
+
+        assert database._get_pool(True)._idle == [reader]
+        assert database._get_pool(False)._idle == []
+    finally:
+        database.configure_pools(read_size=8, write_size=2)
+
+
+@pytest.mark.file_database
+def test_open_reader_does_not_block_writer():
+    """Test that a long read transaction does not hold up a commit (WAL)."""
+    reader = get_read_connection()
+    try:
+        reader.execute("BEGIN")
+        reader.execute("SELECT COUNT(*) FROM books").fetchone()
+        assert insert_book("Concurrent", "Writer", "7770000000000", 1, 1) is True
+        # The open read transaction keeps its snapshot
+        assert reader.execute("SELECT COUNT(*) FROM books WHERE isbn = '7770000000000'").fetchone()[0] == 0
+    finally:
+        reader.close()
+    assert get_book_by_isbn("7770000000000") is not None
+
+
+def test_released_connection_is_rolled_back():
+    """Test that a connection returned mid-transaction is rolled back first."""
+    conn = get_db_connection()
+    conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES ('t', 'a', '7770000000001', 1, 1)")
+    conn.close()
+
+    assert get_book_by_isbn("7770000000001") is None
+
+
+def test_memory_database_is_shared_copied_and_removed():
+    """Test that memory: databases are shared by pooled connections until removed."""
+    source, target = "memory:pool_test_source", "memory:pool_test_target"
+    conn = database.connect(source)
+    conn.execute("CREATE TABLE items (name TEXT)")
+    conn.execute("INSERT INTO items VALUES ('kept')")
+    conn.commit()
+    conn.close()
+
+    database.copy_database(source, target)
+    copy = database.connect(target, read_only=True)
+    assert copy.execute("SELECT name FROM items").fetchall() == [('kept',)]
+    copy.close()
+
+    database.remove_database(source)
+    database.remove_database(target)
+    assert source not in database.memory_databases()
+    conn = database.connect(source)
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0
+    conn.close()
+
+
+def test_memory_reader_never_blocks_writer_but_sees_uncommitted_rows():
+    """Test the memory: trade-off: no table locks for readers, so no isolation from writers either."""
+    name = "memory:pool_test_dirty"
+    writer = database.connect(name)
+    writer.execute("CREATE TABLE items (name TEXT)")
+    writer.executemany("INSERT INTO items VALUES (?)", [(str(i),) for i in range(100)])
+    writer.commit()
+    reader = database.connect(name, read_only=True)
+    try:
+        cursor = reader.execute("SELECT name FROM items")
+        cursor.fetchone()
+        writer.execute("INSERT INTO items VALUES ('uncommitted')")
+        assert reader.execute("SELECT COUNT(*) FROM items WHERE name = 'uncommitted'").fetchone()[0] == 1
+        writer.rollback()
+    finally:
+        reader.close()
+        writer.close()
+        database.remove_database(name)
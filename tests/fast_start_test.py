@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+
+import database
+from app import create_app, precompile_templates
+from database import ensure_schema, get_all_books, get_db_connection, get_schema_version
+from tests.query_budget import count_queries
+
+
+def test_ensure_schema_is_a_single_pragma_when_current():
+    """Test that a current schema is detected without running any DDL."""
+    with count_queries() as counter:
+        assert ensure_schema() is False
+
+    assert counter.statements == ['PRAGMA user_version']
+
+
+def test_ensure_schema_initializes_outdated_database():
+    """Test that an outdated schema version triggers init_database()."""
+    conn = get_db_connection()
+    conn.execute('PRAGMA user_version = 0')
+    conn.commit()
+    conn.close()
+
+    assert ensure_schema() is True
+    assert get_schema_version() == database.SCHEMA_VERSION
+
+
+def test_fast_start_does_not_seed_sample_data(tmp_path):
+    """Test that FAST_START skips sample data unless explicitly requested."""
+    create_app({'FAST_START': True, 'TEMPLATE_CACHE_DIR': str(tmp_path)})
+    assert get_all_books() == []
+
+    create_app({'FAST_START': True, 'SEED_SAMPLE_DATA': True, 'TEMPLATE_CACHE_DIR': str(tmp_path)})
+    assert len(get_all_books()) == 3
+
+
+def test_default_start_seeds_sample_data():
+    """Test that the default start still adds the sample catalog."""
+    create_app()
+
+    assert len(get_all_books()) == 3
+
+
+def test_precompiled_templates_are_cached(tmp_path):
+    """Test that precompiling writes template bytecode to the cache directory."""
+    app = create_app({'FAST_START': True, 'TEMPLATE_CACHE_DIR': str(tmp_path)})
+    compiled = precompile_templates(app)
+
+    assert compiled == len(app.jinja_env.list_templates())
+    assert len(os.listdir(tmp_path)) == compiled
+    assert app.test_client().get('/add_book').status_code == 200
+
+
+def test_services_package_imports_lazily():
+    """Test that importing the services package does not import library_service, nor it the catalog snapshot."""
+    code = "import sys, services; print('services.library_service' in sys.modules); services.add_book_to_catalog; print('services.library_service' in sys.modules, 'services.catalog_service' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.split()
+
+    assert output == ['False', 'True', 'False']
+
+
+def test_services_package_exposes_library_service():
+    """Test that every public library_service name resolves through services, and its own API is in __all__."""
+    import services
+    from services import library_service
+
+    public = [name for name in vars(library_service) if not name.startswith('_')]
+    assert all(getattr(services, name) is getattr(library_service, name) for name in public)
+    defined = {name for name in public if getattr(getattr(library_service, name), '__module__', None) == library_service.__name__}
+    assert defined <= set(services.__all__) <= set(public)
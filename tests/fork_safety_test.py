@@ -0,0 +1,73 @@
+import multiprocessing
+import sys
+
+import pytest
+
+import database
+from database import get_book_by_isbn, get_read_connection, insert_book
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="fork is POSIX-only")
+
+
+def _child_report(queue):
+    before = dict(database._pools)
+    scheduler = database._write_schedulers.get(database.DATABASE)
+    ok = insert_book("Forked", "Worker", "8880000000000", 1, 1)
+    queue.put({
+        'inherited_pools': len(before),
+        'scheduler_restarted': scheduler is not None and scheduler._thread is not None and scheduler._thread.is_alive(),
+        'insert_ok': ok,
+    })
+    database.stop_write_scheduler()
+
+
+@pytest.mark.file_database
+def test_forked_worker_gets_fresh_pools_and_writer():
+    """Test that a forked worker starts with empty pools and its own write scheduler thread."""
+    get_read_connection().close()
+    database.start_write_scheduler()
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    process = context.Process(target=_child_report, args=(queue,))
+    process.start()
+    report = queue.get(timeout=10)
+    process.join(timeout=10)
+
+    assert report == {'inherited_pools': 0, 'scheduler_restarted': True, 'insert_ok': True}
+    assert database._pools  # parent pools untouched
+    assert get_book_by_isbn("8880000000000") is not None
+
+
+def _inherited_connection_report(queue, connection_ref):
+    import gc
+    gc.collect()
+    queue.put(connection_ref() is not None)
+
+
+@pytest.mark.file_database
+def test_inherited_connections_are_not_closed_in_child():
+    """Test that a child keeps the parent's pooled connections alive rather than finalizing them."""
+    import weakref
+    conn = get_read_connection()
+    connection_ref = weakref.ref(conn)
+    conn.close()
+    del conn  # only the pool references it now
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    process = context.Process(target=_inherited_connection_report, args=(queue, connection_ref))
+    process.start()
+    survived = queue.get(timeout=10)
+    process.join(timeout=10)
+
+    assert survived is True
+
+
+def test_app_config_from_environment(monkeypatch, tmp_path):
+    """Test that LIBRARY_* environment variables configure create_app()."""
+    from app import create_app
+
+    monkeypatch.setenv('LIBRARY_FAST_START', 'true')
+    monkeypatch.setenv('LIBRARY_TEMPLATE_CACHE_DIR', str(tmp_path))
+    app = create_app()
+
+    assert app.config['FAST_START'] is True
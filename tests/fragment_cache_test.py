@@ -0,0 +1,58 @@
+from app import create_app
+from database import get_book_by_isbn
+from services.fragment_cache import FragmentCache
+from services.library_service import add_book_to_catalog, borrow_book_by_patron
+
+
+def test_fragment_cache_rerenders_on_new_version():
+    """Test that a fragment is reused for the same version and replaced for a new one."""
+    cache = FragmentCache(10)
+    renders = []
+
+    def render(text):
+        renders.append(text)
+        return text
+
+    assert cache.get_or_render(1, 'v1', lambda: render('a')) == 'a'
+    assert cache.get_or_render(1, 'v1', lambda: render('b')) == 'a'
+    assert cache.get_or_render(1, 'v2', lambda: render('c')) == 'c'
+    assert renders == ['a', 'c']
+    assert cache.stats()['hits'] == 1
+
+
+def test_fragment_cache_evicts_least_recently_used():
+    """Test that the cache stays within max_entries."""
+    cache = FragmentCache(2)
+    cache.get_or_render(1, 0, lambda: 'one')
+    cache.get_or_render(2, 0, lambda: 'two')
+    cache.get_or_render(1, 0, lambda: 'one')
+    cache.get_or_render(3, 0, lambda: 'three')
+
+    assert len(cache) == 2
+    assert cache.get_or_render(2, 0, lambda: 'rendered again') == 'rendered again'
+
+
+def test_cached_catalog_matches_uncached_page():
+    """Test that a page assembled from fragments is the page rendered inline."""
+    plain = create_app().test_client().get('/catalog').data
+    app = create_app({'FRAGMENT_CACHE_SIZE': 100})
+    client = app.test_client()
+
+    assert client.get('/catalog').data == plain
+    assert client.get('/catalog').data == plain
+    assert app.extensions['fragment_cache'].stats() == {'entries': 3, 'max_entries': 100, 'hits': 3, 'misses': 3}
+
+
+def test_cached_row_changes_with_availability():
+    """Test that borrowing the last copy re-renders only that book's row."""
+    app = create_app({'FRAGMENT_CACHE_SIZE': 100})
+    client = app.test_client()
+    add_book_to_catalog("Single Copy", "Author", "8880000000000", 1)
+    client.get('/catalog')
+
+    borrow_book_by_patron("123456", get_book_by_isbn("8880000000000")['id'])
+    page = client.get('/catalog').get_data(as_text=True)
+
+    row = page[page.index("Single Copy"):]
+    assert "Not Available" in row[:row.index("</tr>")]
+    assert app.extensions['fragment_cache'].stats()['misses'] == 5
@@ -0,0 +1,78 @@
+from app import create_app
+from database import get_db_connection
+from services import catalog_service
+from services.fuzzy_index import FuzzyIndex, edit_distance
+from services.library_service import add_book_to_catalog, search_books_in_catalog
+
+
+def _add_books():
+    add_book_to_catalog("The Great Gatsby", "F. Scott Fitzgerald", "6660000000000", 2)
+    add_book_to_catalog("Nineteen Eighty-Four", "George Orwell", "6660000000001", 1)
+    add_book_to_catalog("Animal Farm", "George Orwell", "6660000000002", 1)
+
+
+def test_edit_distance_counts_transpositions_once():
+    """Test the optimal string alignment distance used to confirm candidates."""
+    assert edit_distance("orwel", "orwell", 2) == 1
+    assert edit_distance("fitzgerlad", "fitzgerald", 2) == 1
+    assert edit_distance("gatsby", "garden", 2) == 3
+
+
+def test_index_ranks_by_distance():
+    """Test that closer matches come first and short tokens need exact matches."""
+    index = FuzzyIndex()
+    index.add(1, 'author', "george orwell")
+    index.add(2, 'author', "george orwel")
+    index.add(3, 'title', "of mice and men")
+
+    assert index.search("orwell") == [(1, 0), (2, 1)]
+    assert index.search("if") == []
+
+
+def test_fuzzy_search_tolerates_misspellings():
+    """Test that misspelled authors and titles still find the book, nearest first."""
+    _add_books()
+    catalog_service.enable(fuzzy_index=True)
+
+    orwell = search_books_in_catalog("Orwel", "fuzzy")
+    fitzgerald = search_books_in_catalog("Fitzgerld", "fuzzy")
+    gatsby = search_books_in_catalog("grate gatbsy", "fuzzy")
+
+    assert [book['title'] for book in orwell] == ["Animal Farm", "Nineteen Eighty-Four"]
+    assert orwell[0]['distance'] == 1
+    assert fitzgerald[0]['isbn'] == "6660000000000"
+    assert gatsby[0]['title'] == "The Great Gatsby"
+
+
+def test_fuzzy_index_follows_catalog_changes():
+    """Test that added, retitled and deleted books are reflected incrementally."""
+    _add_books()
+    catalog_service.enable(fuzzy_index=True)
+    add_book_to_catalog("Brave New World", "Aldous Huxley", "6660000000003", 1)
+    conn = get_db_connection()
+    conn.execute("UPDATE books SET title = 'Homage to Catalonia' WHERE isbn = '6660000000002'")
+    conn.execute("DELETE FROM books WHERE isbn = '6660000000001'")
+    conn.commit()
+    conn.close()
+
+    assert search_books_in_catalog("Huxly", "fuzzy")[0]['title'] == "Brave New World"
+    assert search_books_in_catalog("animal farm", "fuzzy") == []
+    assert [book['title'] for book in search_books_in_catalog("orwel", "fuzzy")] == ["Homage to Catalonia"]
+
+
+def test_fuzzy_type_without_index_returns_nothing():
+    """Test that the fuzzy type is inert until FUZZY_SEARCH_ENABLED is set."""
+    _add_books()
+    assert search_books_in_catalog("Orwel", "fuzzy") == []
+
+
+def test_search_page_falls_back_to_close_matches():
+    """Test that an empty title/author search shows close matches instead of an error."""
+    client = create_app({'FUZZY_SEARCH_ENABLED': True}).test_client()
+
+    response = client.get('/search?q=Orwll&type=author')
+
+    assert response.status_code == 200
+    assert b'showing close matches' in response.data
+    assert b'1984' in response.data
+    assert b'not yet implemented' not in response.data
@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+
+from app import create_app
+from database import expire_holds, get_book_by_id, get_book_by_isbn, get_db_connection
+from services import library_service
+from services.library_service import (
+    HOLD_PICKUP_DAYS,
+    add_book_to_catalog,
+    borrow_book_by_patron,
+    place_hold,
+    return_book_by_patron
+)
+
+
+def _single_copy_on_loan(isbn: str, borrower: str = "111111") -> int:
+    add_book_to_catalog("Popular Title", "Hold Author", isbn, 1)
+    book_id = get_book_by_isbn(isbn)['id']
+    assert borrow_book_by_patron(borrower, book_id)[0] is True
+    return book_id
+
+
+def _expire_after(days: float) -> int:
+    now = datetime.now() + timedelta(days=days)
+    return expire_holds(now, now + timedelta(days=HOLD_PICKUP_DAYS))
+
+
+def test_returned_copy_goes_to_holds_in_order():
+    """Test that a return reserves the copy for the oldest hold instead of shelving it."""
+    book_id = _single_copy_on_loan("4200000000000")
+
+    assert place_hold("222222", book_id) == (True, 'Hold placed on "Popular Title". You are number 1 in line.')
+    assert place_hold("333333", book_id)[1].endswith("You are number 2 in line.")
+    assert "position 2 in line" in place_hold("333333", book_id)[1]
+
+    success, message = return_book_by_patron("111111", book_id)
+    assert success is True
+    assert message.endswith("The copy is reserved for the next patron on hold.")
+    assert get_book_by_id(book_id)['available_copies'] == 0
+
+    assert borrow_book_by_patron("333333", book_id) == (False, "This book is currently not available.")
+    assert borrow_book_by_patron("222222", book_id)[0] is True
+    assert get_book_by_id(book_id)['available_copies'] == 0
+
+    return_book_by_patron("222222", book_id)
+    assert "already reserved for you" in place_hold("333333", book_id)[1]
+    assert borrow_book_by_patron("333333", book_id)[0] is True
+
+
+def test_uncollected_copy_passes_to_next_hold_then_shelf():
+    """Test that lapsed pickups promote the next hold and finally free the copy."""
+    book_id = _single_copy_on_loan("4200000000001")
+    place_hold("222222", book_id)
+    place_hold("333333", book_id)
+    return_book_by_patron("111111", book_id)
+
+    assert _expire_after(1) == 0
+    assert _expire_after(HOLD_PICKUP_DAYS + 1) == 1
+    assert borrow_book_by_patron("222222", book_id)[0] is False
+    assert get_book_by_id(book_id)['available_copies'] == 0
+
+    assert _expire_after(2 * HOLD_PICKUP_DAYS + 2) == 1
+    assert get_book_by_id(book_id)['available_copies'] == 1
+    assert borrow_book_by_patron("222222", book_id)[0] is True
+
+
+def test_hold_rejected_when_copy_available_or_patron_invalid():
+    """Test that holds are only queued for unavailable books and valid patrons."""
+    add_book_to_catalog("Shelf Title", "Hold Author", "4200000000002", 2)
+    book_id = get_book_by_isbn("4200000000002")['id']
+
+    assert place_hold("222222", book_id) == (False, "A copy of this book is available; borrow it instead.")
+    assert place_hold("22222", book_id)[1] == "Invalid patron ID. Must be exactly 6 digits."
+    assert place_hold("222222", 999999) == (False, "Book not found.")
+
+
+def test_catalog_offers_hold_for_unavailable_books():
+    """Test that unavailable catalog rows post to /hold, which queues the patron."""
+    client = create_app().test_client()
+    book_id = _single_copy_on_loan("4200000000003")
+
+    page = client.get('/catalog').get_data(as_text=True)
+    assert 'action="/hold"' in page
+
+    response = client.post('/hold', data={'patron_id': "222222", 'book_id': str(book_id)}, follow_redirects=True)
+    assert "You are number 1 in line." in response.get_data(as_text=True)
+
+
+def test_failed_loan_keeps_reserved_copy(monkeypatch):
+    """Test that a hold claimed for a loan that could not be recorded is ready again."""
+    book_id = _single_copy_on_loan("4200000000004")
+    place_hold("222222", book_id)
+    return_book_by_patron("111111", book_id)
+    monkeypatch.setattr(library_service, 'insert_borrow_record', lambda *args: False)
+
+    assert borrow_book_by_patron("222222", book_id) == (
+        False, "Database error occurred while creating borrow record."
+    )
+
+    monkeypatch.undo()
+    assert borrow_book_by_patron("333333", book_id) == (False, "This book is currently not available.")
+    assert borrow_book_by_patron("222222", book_id)[0] is True
+
+
+def test_ready_hold_is_used_before_shelf_copies():
+    """Test that a patron with a ready hold borrows the reserved copy, leaving shelf copies alone."""
+    book_id = _single_copy_on_loan("4200000000005")
+    place_hold("222222", book_id)
+    return_book_by_patron("111111", book_id)
+    conn = get_db_connection()
+    conn.execute('UPDATE books SET total_copies = 2, available_copies = 1 WHERE id = ?', (book_id,))
+    conn.commit()
+    conn.close()
+
+    assert borrow_book_by_patron("222222", book_id)[0] is True
+    assert get_book_by_id(book_id)['available_copies'] == 1
+    assert "already reserved for you" not in place_hold("222222", book_id)[1]
+    assert borrow_book_by_patron("333333", book_id)[0] is True
+    assert get_book_by_id(book_id)['available_copies'] == 0
+
+
+def test_lapsed_hold_passes_on_when_borrowing_without_scanner():
+    """Test that a borrow releases an uncollected copy to the next hold with no background scan."""
+    book_id = _single_copy_on_loan("4200000000006")
+    place_hold("222222", book_id)
+    place_hold("333333", book_id)
+    return_book_by_patron("111111", book_id)
+    conn = get_db_connection()
+    conn.execute("UPDATE holds SET expires_at = ? WHERE book_id = ? AND status = 'ready'",
+                 ((datetime.now() - timedelta(hours=1)).isoformat(), book_id))
+    conn.commit()
+    conn.close()
+
+    assert borrow_book_by_patron("222222", book_id) == (False, "This book is currently not available.")
+    assert borrow_book_by_patron("333333", book_id)[0] is True
+    assert get_book_by_id(book_id)['available_copies'] == 0
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+
+import database
+from app import create_app
+from database import archive_returned_records, get_book_by_isbn, get_db_connection
+from services.library_service import (
+    add_book_to_catalog,
+    borrow_book_by_patron,
+    calculate_late_fee_for_book,
+    calculate_late_fees,
+    return_book_by_patron
+)
+from tests.query_budget import count_queries
+
+
+def _book(isbn: str, title: str) -> int:
+    add_book_to_catalog(title, "Fee Author", isbn, 5)
+    return get_book_by_isbn(isbn)['id']
+
+
+def _shift_loan_dates(book_id: int, days: int) -> None:
+    conn = get_db_connection()
+    conn.execute(
+        '''
+        UPDATE borrow_records
+        SET due_date = ?, return_date = CASE WHEN return_date IS NULL THEN NULL ELSE ? END
+        WHERE book_id = ?
+        ''',
+        ((datetime.now() - timedelta(days=days)).isoformat(),
+         (datetime.now() - timedelta(days=days - 3)).isoformat(), book_id)
+    )
+    conn.commit()
+    conn.close()
+
+
+def _loan_scenarios():
+    overdue = _book("6600000000000", "Overdue Loan")
+    borrow_book_by_patron("123456", overdue)
+    _shift_loan_dates(overdue, 10)
+
+    on_time = _book("6600000000001", "Current Loan")
+    borrow_book_by_patron("123456", on_time)
+
+    returned_late = _book("6600000000002", "Returned Late")
+    borrow_book_by_patron("123456", returned_late)
+    return_book_by_patron("123456", returned_late)
+    _shift_loan_dates(returned_late, 5)
+
+    archived = _book("6600000000003", "Archived Loan")
+    borrow_book_by_patron("123456", archived)
+    return_book_by_patron("123456", archived)
+    _shift_loan_dates(archived, 400)
+    archive_returned_records(older_than_days=365)
+
+    never = _book("6600000000004", "Never Borrowed")
+    return [
+        ("123456", overdue), ("123456", on_time), ("123456", returned_late),
+        ("123456", archived), ("123456", never), ("654321", overdue),
+        ("123456", 999999), ("12345", overdue), ("123456", "abc"), ("123456", 0),
+        (" 123456 ", overdue),
+    ]
+
+
+def test_batch_matches_single_lookups():
+    """Test that every pair gets the same result as calculate_late_fee_for_book."""
+    pairs = _loan_scenarios()
+
+    expected = [calculate_late_fee_for_book(patron_id, book_id) for patron_id, book_id in pairs]
+
+    assert calculate_late_fees(pairs) == expected
+    assert expected[0]['days_overdue'] == 10
+    assert "returned on" in expected[3]['status']
+
+
+def test_batch_is_one_query_for_any_number_of_pairs():
+    """Test that hundreds of lookups cost a single statement on one connection."""
+    book_id = _book("6600000000100", "Popular Loan")
+    borrow_book_by_patron("123456", book_id)
+    pairs = [("123456", book_id)] * 300 + [(f"{200000 + i}", book_id) for i in range(300)]
+
+    with count_queries() as counter:
+        results = calculate_late_fees(pairs)
+
+    assert counter.count == 1
+    assert counter.connections == 1
+    assert len(results) == 600
+    assert results[0]['status'] == "No outstanding late fees."
+    assert results[-1]['status'] == "Book is not borrowed by this patron."
+
+
+def test_batch_queries_each_shard_once():
+    """Test that pairs are grouped by the borrow_records shard of their patron."""
+    database.configure_shards(4)
+    database.init_database()
+    try:
+        book_id = _book("6600000000200", "Sharded Fee")
+        patrons = [f"{100000 + i * 7919}" for i in range(12)]
+        for patron in patrons:
+            borrow_book_by_patron(patron, book_id)
+
+        with count_queries() as counter:
+            results = calculate_late_fees([(patron, book_id) for patron in patrons])
+
+        assert counter.count == len({database.shard_for_patron(patron) for patron in patrons})
+        assert results == [calculate_late_fee_for_book(patron, book_id) for patron in patrons]
+        assert results[0]['status'] == "No outstanding late fees."
+    finally:
+        database.configure_shards(1)
+
+
+def test_late_fees_endpoint():
+    """Test that POST /api/late_fees answers each pair and rejects malformed bodies."""
+    client = create_app().test_client()
+    book_id = _book("6600000000300", "Api Fee")
+    borrow_book_by_patron("123456", book_id)
+
+    response = client.post('/api/late_fees', json={'loans': [
+        {'patron_id': "123456", 'book_id': book_id}, ["123456", 999999], [123456, book_id],
+    ]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['count'] == 3
+    assert body['results'][0]['status'] == "No outstanding late fees."
+    assert body['results'][0]['book_id'] == book_id
+    assert body['results'][1]['status'] == "Book not found."
+    assert "invalid patron id" in body['results'][2]['status'].lower()
+
+    assert client.post('/api/late_fees', json={'loans': "123456"}).status_code == 400
+    assert client.post('/api/late_fees', json=[["123456"]]).status_code == 400
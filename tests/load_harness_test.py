@@ -0,0 +1,48 @@
+import pytest
+
+from benchmarks.load_harness import LoadConfig, _Worker, parse_mix, run_load
+
+
+def test_load_harness_reports_throughput_and_percentiles(tmp_path):
+    """Test a short in-process run reports every scenario without failures."""
+    config = LoadConfig(threads=3, requests=10, books=20, database_path=str(tmp_path / "load.db"))
+    summary = run_load(config).summary()
+
+    assert summary['requests'] == 30
+    assert summary['failed_requests'] == 0
+    assert summary['throughput_rps'] > 0
+    assert set(summary['latency_ms']) == {'p50', 'p90', 'p99', 'max'}
+    assert summary['database_locked_errors'] == 0
+
+
+def test_load_harness_parse_mix():
+    """Test scenario weights are parsed and unknown scenarios rejected."""
+    assert parse_mix("borrow=3,search") == {'borrow': 3, 'search': 1}
+    with pytest.raises(ValueError):
+        parse_mix("delete=1")
+
+
+def test_load_harness_records_only_confirmed_loans():
+    """Test that a rejected borrow is not returned later and counts as rejected, not as a success."""
+    class RejectingClient:
+        def post(self, path, data):
+            return 400, '{"success": false}'
+
+    worker = _Worker(RejectingClient(), 0, LoadConfig(mix={'borrow': 1, 'return': 1}), [1])
+    assert worker.step() == ('borrow', 400)
+    assert worker.loans == []
+
+
+def test_load_harness_status_scenario_requests_patron_report():
+    """Test that the status scenario asks for one of the worker's patrons' status reports."""
+    class RecordingClient:
+        paths = []
+
+        def get(self, path):
+            self.paths.append(path)
+            return 200, '{}'
+
+    client = RecordingClient()
+    worker = _Worker(client, 0, LoadConfig(mix={'status': 1}), [1])
+    assert worker.step() == ('status', 200)
+    assert client.paths[0] in {f'/api/patron/{patron}/status' for patron in worker.patrons}
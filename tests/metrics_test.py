@@ -0,0 +1,88 @@
+import json
+
+from app import create_app
+from services.metrics_service import MetricsRegistry, record_cache_access, registry
+
+
+def test_metrics_endpoint_reports_request_latency_and_sql_counts():
+    """Test that /metrics exposes per-endpoint latency and SQL statement histograms."""
+    registry.reset()
+    client = create_app().test_client()
+    client.get('/catalog')
+    body = client.get('/metrics').get_data(as_text=True)
+
+    assert 'library_http_requests_total{endpoint="catalog.catalog",method="GET",status="200"} 1' in body
+    assert 'library_http_request_duration_seconds_count{endpoint="catalog.catalog"} 1' in body
+    assert 'library_sql_statements_per_request_sum{endpoint="catalog.catalog"} 1' in body
+    assert '# TYPE library_sqlite_seconds_per_request histogram' in body
+
+
+def test_metrics_endpoint_content_type():
+    """Test that /metrics is served in the Prometheus text format."""
+    response = create_app().test_client().get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'version=0.0.4' in response.headers['Content-Type']
+
+
+def test_metrics_disabled_records_nothing():
+    """Test that requests are not recorded when metrics are disabled."""
+    registry.reset()
+    client = create_app({'METRICS_ENABLED': False}).test_client()
+    client.get('/catalog')
+
+    assert 'endpoint="catalog.catalog"' not in registry.render()
+
+
+def test_cache_access_counts_hits_and_misses():
+    """Test that cache lookups are split by result."""
+    registry.reset()
+    record_cache_access('fragments', True)
+    record_cache_access('fragments', True)
+    record_cache_access('fragments', False)
+    body = registry.render()
+
+    assert 'library_cache_requests_total{cache="fragments",result="hit"} 2' in body
+    assert 'library_cache_requests_total{cache="fragments",result="miss"} 1' in body
+
+
+def test_histogram_buckets_are_cumulative():
+    """Test that histogram buckets are rendered cumulatively with an +Inf bucket."""
+    local_registry = MetricsRegistry()
+    local_registry.histogram('demo_seconds', 'Demo.', (0.1, 1.0))
+    local_registry.observe('demo_seconds', 0.05)
+    local_registry.observe('demo_seconds', 0.5)
+    local_registry.observe('demo_seconds', 5.0)
+    body = local_registry.render()
+
+    assert 'demo_seconds_bucket{le="0.1"} 1' in body
+    assert 'demo_seconds_bucket{le="1"} 2' in body
+    assert 'demo_seconds_bucket{le="+Inf"} 3' in body
+    assert 'demo_seconds_count 3' in body
+
+
+def test_multiprocess_scrape_sums_live_and_exited_workers(tmp_path):
+    """Test that a scrape reports the sum over every worker, keeping exited workers' counts."""
+    def worker(count):
+        worker_registry = MetricsRegistry()
+        worker_registry.counter('demo_total', 'Demo counter.')
+        for _ in range(count):
+            worker_registry.inc('demo_total')
+        return worker_registry
+
+    exited = worker(4)
+    (tmp_path / "999999999-exited.json").write_text(json.dumps(exited.snapshot().to_json()))
+    first, second = worker(1), worker(2)
+    first.enable_multiprocess(str(tmp_path), interval=60)
+    second.enable_multiprocess(str(tmp_path), interval=60)
+    try:
+        second.export()
+        assert 'demo_total 7' in first.render()
+        assert not (tmp_path / "999999999-exited.json").exists()
+        first.inc('demo_total')
+        first.export()
+        assert 'demo_total 8' in second.render()
+    finally:
+        first.disable_multiprocess()
+        second.disable_multiprocess()
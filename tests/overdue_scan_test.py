@@ -0,0 +1,90 @@
+import time
+from datetime import datetime, timedelta
+
+import database
+from app import create_app
+from database import get_book_by_isbn, get_db_connection, get_overdue_events, scan_new_overdues
+from services import overdue_service
+from services.library_service import add_book_to_catalog, borrow_book_by_patron, return_book_by_patron
+
+
+def _loan(isbn: str, patron_id: str = "123456", due_in_days: float = 14) -> int:
+    add_book_to_catalog(f"Overdue {isbn}", "Scan Author", isbn, 3)
+    book_id = get_book_by_isbn(isbn)['id']
+    borrow_book_by_patron(patron_id, book_id)
+    conn = database.get_patron_connection(patron_id)
+    conn.execute(
+        'UPDATE borrow_records SET due_date = ? WHERE patron_id = ? AND book_id = ?',
+        ((datetime.now() + timedelta(days=due_in_days)).isoformat(), patron_id, book_id)
+    )
+    conn.commit()
+    conn.close()
+    return book_id
+
+
+def test_scan_records_each_newly_overdue_loan_once():
+    """Test that scans pick up open loans as they fall due and never repeat them."""
+    overdue = _loan("5100000000000", due_in_days=-3)
+    returned = _loan("5100000000001", due_in_days=-2)
+    return_book_by_patron("123456", returned)
+    upcoming = _loan("5100000000002", due_in_days=2)
+
+    assert scan_new_overdues() == 1
+    assert scan_new_overdues() == 0
+    assert [event['book_id'] for event in get_overdue_events()] == [overdue]
+
+    later = datetime.now() + timedelta(days=3)
+    assert scan_new_overdues(later) == 1
+    events = get_overdue_events()
+    assert [event['book_id'] for event in events] == [overdue, upcoming]
+    assert get_overdue_events(events[0]['detected_at']) == events[1:]
+
+
+def test_scan_reads_only_the_open_due_range():
+    """Test that the scan statement is an index range search, not a table scan."""
+    scan_new_overdues()
+    plans = []
+
+    def explain(sql, parameters, elapsed, error, conn):
+        if sql.lstrip().startswith('INSERT OR IGNORE INTO overdue_events'):
+            conn = get_db_connection()
+            plans.extend(row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, parameters))
+            conn.close()
+
+    database.add_query_listener(explain)
+    try:
+        scan_new_overdues()
+    finally:
+        database.remove_query_listener(explain)
+
+    assert any('idx_borrow_records_open_due' in detail for detail in plans)
+    assert not any(detail.startswith('SCAN borrow_records') for detail in plans)
+
+
+def test_scan_covers_every_shard():
+    """Test that each shard keeps its own mark and events merge across shards."""
+    database.configure_shards(3)
+    database.init_database()
+    try:
+        patrons = [f"{100000 + i * 7919}" for i in range(6)]
+        for index, patron in enumerate(patrons):
+            _loan(f"510000000010{index}", patron, due_in_days=-1)
+
+        assert scan_new_overdues() == len(patrons)
+        assert scan_new_overdues() == 0
+        assert {event['patron_id'] for event in get_overdue_events()} == set(patrons)
+    finally:
+        database.configure_shards(1)
+
+
+def test_scanner_runs_on_its_schedule():
+    """Test that OVERDUE_SCAN_INTERVAL_SECONDS starts a background scanner."""
+    _loan("5100000000200", due_in_days=-1)
+    create_app({'OVERDUE_SCAN_INTERVAL_SECONDS': 0.05})
+
+    deadline = time.monotonic() + 5
+    while not get_overdue_events() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    overdue_service.stop()
+
+    assert len(get_overdue_events()) == 1
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+from app import create_app
+from database import get_book_by_isbn, get_db_connection
+from services.library_service import (
+    _calculate_overdue_metrics,
+    add_book_to_catalog,
+    borrow_book_by_patron,
+    get_patron_status_report,
+    return_book_by_patron
+)
+
+
+def _borrow(isbn: str, title: str, due_days_ago: int = None) -> int:
+    add_book_to_catalog(title, "Status Author", isbn, 3)
+    book_id = get_book_by_isbn(isbn)['id']
+    borrow_book_by_patron("123456", book_id)
+    if due_days_ago is not None:
+        conn = get_db_connection()
+        conn.execute(
+            'UPDATE borrow_records SET due_date = ? WHERE book_id = ? AND return_date IS NULL',
+            ((datetime.now() - timedelta(days=due_days_ago)).isoformat(), book_id)
+        )
+        conn.commit()
+        conn.close()
+    return book_id
+
+
+def test_status_fees_match_python_fee_rules():
+    """Test that fees computed in SQL match the per-loan Python calculation, cap included."""
+    now = datetime.now()
+    offsets = [-3, 1, 4, 7, 12, 30]
+    for index, days in enumerate(offsets):
+        _borrow(f"880000000000{index}", f"Status Book {index}", due_days_ago=days)
+
+    report = get_patron_status_report("123456")
+
+    expected = [_calculate_overdue_metrics(now - timedelta(days=days), now) for days in offsets]
+    assert [(book['days_overdue'], book['late_fee']) for book in report['borrowed_books']] == expected
+    assert report['total_borrowed'] == len(offsets)
+    assert report['total_late_fees'] == round(sum(fee for _, fee in expected), 2)
+    assert all(isinstance(book['late_fee'], float) for book in report['borrowed_books'])
+
+
+def test_status_lists_open_loans_oldest_first_and_history_newest_first():
+    """Test that returned loans appear only in history, with dates formatted as before."""
+    first = _borrow("8800000000100", "First Loan")
+    _borrow("8800000000101", "Second Loan")
+    return_book_by_patron("123456", first)
+
+    report = get_patron_status_report("123456")
+
+    assert [book['title'] for book in report['borrowed_books']] == ["Second Loan"]
+    assert [entry['title'] for entry in report['history']] == ["Second Loan", "First Loan"]
+    today = datetime.now().strftime("%Y-%m-%d")
+    assert report['history'][1]['return_date'] == today
+    assert report['history'][0]['return_date'] is None
+    assert report['history'][0]['borrow_date'] == today
+
+
+def test_patron_status_endpoint():
+    """Test that /api/patron/<id>/status returns the report and rejects bad patron ids."""
+    client = create_app().test_client()
+    _borrow("8800000000200", "Api Loan", due_days_ago=2)
+
+    response = client.get('/api/patron/123456/status')
+    assert response.status_code == 200
+    assert response.get_json() == get_patron_status_report("123456")
+    assert response.get_json()['total_late_fees'] == 1.0
+
+    response = client.get('/api/patron/12ab/status')
+    assert response.status_code == 400
+    assert "invalid patron id" in response.get_json()['status'].lower()
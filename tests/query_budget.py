@@ -0,0 +1,71 @@
+"""
+Query-count budgets for service functions (N+1 detector).
+
+Counts SQL statements, commits and connections opened through
+database.get_db_connection while a block runs, and fails when a declared
+budget is exceeded. Commits are tracked separately from statements.
+"""
+
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+import database
+
+
+class QueryCounter:
+    """Statements and connections observed while a counting block is active."""
+
+    def __init__(self) -> None:
+        self.statements: List[str] = []
+        self.connections = 0
+        self.commits = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _on_query(self, sql, parameters, elapsed, error, conn) -> None:
+        if sql == 'COMMIT':
+            self.commits += 1
+            return
+        self.statements.append(' '.join(sql.split()))
+
+    def _on_connection(self, conn) -> None:
+        self.connections += 1
+
+    def report(self) -> str:
+        lines = [f"{self.count} statement(s) and {self.commits} commit(s) over {self.connections} connection(s):"]
+        lines.extend(f"  {index}. {sql}" for index, sql in enumerate(self.statements, start=1))
+        return '\n'.join(lines)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """Count SQL statements and opened connections inside the with-block."""
+    counter = QueryCounter()
+    database.add_query_listener(counter._on_query)
+    database.add_connection_listener(counter._on_connection)
+    try:
+        yield counter
+    finally:
+        database.remove_query_listener(counter._on_query)
+        database.remove_connection_listener(counter._on_connection)
+
+
+def assert_query_budget(counter: QueryCounter, max_queries: int, max_connections: Optional[int] = None) -> None:
+    """Fail with the offending statements when a counter exceeds its budget."""
+    assert counter.count <= max_queries, (
+        f"Query budget exceeded: expected at most {max_queries}, got {counter.report()}"
+    )
+    if max_connections is not None:
+        assert counter.connections <= max_connections, (
+            f"Connection budget exceeded: expected at most {max_connections}, got {counter.report()}"
+        )
+
+
+@contextmanager
+def query_budget(max_queries: int, max_connections: Optional[int] = None) -> Iterator[QueryCounter]:
+    """Run a block and assert it stays within the declared query/connection budget."""
+    with count_queries() as counter:
+        yield counter
+    assert_query_budget(counter, max_queries, max_connections)
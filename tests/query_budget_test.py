@@ -0,0 +1,98 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+
+from database import get_book_by_isbn, get_db_connection
+from services.library_service import (
+    add_book_to_catalog,
+    borrow_book_by_patron,
+    calculate_late_fee_for_book,
+    get_patron_status_report,
+    pay_late_fees,
+    return_book_by_patron
+)
+from services.payment_service import PaymentGateway
+from tests.query_budget import assert_query_budget, count_queries
+
+
+def _borrowed_book(isbn: str, days_overdue: int = 0) -> int:
+    add_book_to_catalog("Budget Book", "Budget Author", isbn, 3)
+    book_id = get_book_by_isbn(isbn)['id']
+    borrow_book_by_patron("123456", book_id)
+    if days_overdue:
+        conn = get_db_connection()
+        conn.execute(
+            'UPDATE borrow_records SET due_date = ? WHERE book_id = ?',
+            ((datetime.now() - timedelta(days=days_overdue)).isoformat(), book_id)
+        )
+        conn.commit()
+        conn.close()
+    return book_id
+
+
+def test_count_queries_records_statements_and_connections():
+    """Test that the counter sees every statement and opened connection."""
+    with count_queries() as counter:
+        get_book_by_isbn("0000000000000")
+
+    assert counter.count == 1
+    assert counter.connections == 1
+    assert "FROM books WHERE isbn" in counter.statements[0]
+
+
+def test_assert_query_budget_fails_when_exceeded():
+    """Test that exceeding a budget fails and lists the offending statements."""
+    with count_queries() as counter:
+        get_book_by_isbn("0000000000000")
+        get_book_by_isbn("0000000000001")
+
+    with pytest.raises(AssertionError, match="Query budget exceeded"):
+        assert_query_budget(counter, 1)
+
+
+def test_borrow_book_query_budget(query_budget):
+    """Test that borrowing stays within its query budget."""
+    add_book_to_catalog("Budget Book", "Budget Author", "5550000000000", 3)
+    book_id = get_book_by_isbn("5550000000000")['id']
+
+    # book, ready hold, loan count, loan insert, availability update
+    with query_budget(5, max_connections=5):
+        borrow_book_by_patron("123456", book_id)
+
+
+def test_return_book_query_budget(query_budget):
+    """Test that returning stays within its query budget."""
+    book_id = _borrowed_book("5550000000001")
+
+    with query_budget(4, max_connections=4):
+        success, _ = return_book_by_patron("123456", book_id)
+
+    assert success is True
+
+
+def test_calculate_late_fee_query_budget(query_budget):
+    """Test that a late fee lookup stays within its query budget."""
+    book_id = _borrowed_book("5550000000002", days_overdue=3)
+
+    with query_budget(2, max_connections=2):
+        calculate_late_fee_for_book("123456", book_id)
+
+
+def test_pay_late_fees_query_budget(query_budget):
+    """Test that paying late fees stays within its query budget."""
+    book_id = _borrowed_book("5550000000003", days_overdue=3)
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = Mock(status="success", transaction_id="txn")
+
+    with query_budget(3, max_connections=3):
+        result = pay_late_fees("123456", book_id, gateway)
+
+    assert result['success'] is True
+
+
+def test_patron_status_report_query_budget(query_budget):
+    """Test that the patron status report stays within its query budget."""
+    _borrowed_book("5550000000004")
+
+    with query_budget(1, max_connections=1):
+        get_patron_status_report("123456")
@@ -0,0 +1,39 @@
+import sys
+
+from app import create_app
+from database import Book, Loan, get_all_books, get_book_by_isbn, get_patron_borrowed_books, iter_all_books
+from services.library_service import add_book_to_catalog, borrow_book_by_patron
+
+
+def test_book_records_read_like_dicts():
+    """Test that Book rows support the mapping access callers used on dicts."""
+    add_book_to_catalog("Record Book", "Record Author", "5500000000000", 2)
+    book = get_book_by_isbn("5500000000000")
+
+    assert isinstance(book, Book) and not hasattr(book, '__dict__')
+    assert book['title'] == book.title == "Record Book"
+    assert book == {'id': book.id, 'title': "Record Book", 'author': "Record Author",
+                    'isbn': "5500000000000", 'total_copies': 2, 'available_copies': 2}
+    assert dict(book) == book.to_dict() and book.get('missing') is None
+    assert [dict(row) for row in iter_all_books()] == [row.to_dict() for row in get_all_books()]
+    assert sys.getsizeof(book) < sys.getsizeof(dict(book))
+
+
+def test_loan_records_parse_dates_on_first_read():
+    """Test that open loans keep ISO text until borrow_date/due_date are read."""
+    add_book_to_catalog("Loan Record", "Record Author", "5500000000001", 1)
+    book_id = get_book_by_isbn("5500000000001")['id']
+    borrow_book_by_patron("123456", book_id)
+
+    loan, = get_patron_borrowed_books("123456")
+    assert isinstance(loan, Loan) and isinstance(loan._due_date, str)
+    assert (loan.due_date - loan['borrow_date']).days == 14
+    assert loan['is_overdue'] is False and loan['title'] == "Loan Record"
+
+
+def test_records_are_serialized_at_the_json_boundary():
+    """Test that API responses render records as plain JSON objects."""
+    add_book_to_catalog("Json Record", "Record Author", "5500000000002", 1)
+
+    results = create_app().test_client().get('/api/search?q=json record&type=title').get_json()['results']
+    assert results == [get_book_by_isbn("5500000000002").to_dict()]
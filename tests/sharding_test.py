@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+import database
+from app import create_app
+from database import (
+    get_book_by_isbn,
+    get_library_loan_summary,
+    get_patron_borrow_count,
+    reshard,
+    shard_for_patron,
+    shard_path
+)
+from services.library_service import (
+    add_book_to_catalog,
+    borrow_book_by_patron,
+    get_patron_status_report,
+    return_book_by_patron
+)
+
+PATRONS = [f"{100000 + i * 7919}" for i in range(12)]
+
+
+@pytest.fixture
+def sharded():
+    database.configure_shards(4)
+    database.init_database()
+    yield
+    database.configure_shards(1)
+
+
+def _raw_loan_count(path: str) -> int:
+    conn = database.connect(path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM borrow_records').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _borrow_for_all_patrons() -> int:
+    add_book_to_catalog("Sharded Book", "Author", "9990000000000", 50)
+    book_id = get_book_by_isbn("9990000000000")['id']
+    for patron in PATRONS:
+        assert borrow_book_by_patron(patron, book_id)[0] is True
+    return book_id
+
+
+def test_borrow_records_are_routed_to_patron_shard(sharded):
+    """Test that each patron's loans are written to the shard chosen by the router."""
+    _borrow_for_all_patrons()
+
+    for index in range(4):
+        expected = sum(1 for patron in PATRONS if shard_for_patron(patron) == index)
+        assert _raw_loan_count(shard_path(index)) == expected
+    assert _raw_loan_count(database.DATABASE) == 0
+
+
+def test_patron_queries_read_from_their_shard(sharded):
+    """Test that borrow counts, returns and status reports work across shards."""
+    book_id = _borrow_for_all_patrons()
+    patron = PATRONS[3]
+
+    assert get_patron_borrow_count(patron) == 1
+    report = get_patron_status_report(patron)
+    assert report['total_borrowed'] == 1
+    assert report['borrowed_books'][0]['title'] == "Sharded Book"
+    assert return_book_by_patron(patron, book_id)[0] is True
+    assert get_patron_borrow_count(patron) == 0
+
+
+def test_library_wide_summary_fans_out(sharded):
+    """Test that library-wide loan totals include every shard."""
+    _borrow_for_all_patrons()
+    summary = get_library_loan_summary()
+
+    assert summary == {'active_loans': 12, 'overdue_loans': 0, 'patrons_with_loans': 12}
+
+
+def test_loan_summary_endpoint_reports_every_shard():
+    """Test that /api/loans/summary serves the library-wide totals across shards."""
+    _borrow_for_all_patrons()
+    try:
+        reshard(4)
+        client = create_app({'SHARD_COUNT': 4, 'SEED_SAMPLE_DATA': False}).test_client()
+        summary = client.get('/api/loans/summary').get_json()
+    finally:
+        database.configure_shards(1)
+
+    assert summary['active_loans'] == 12
+    assert summary['patrons_with_loans'] == 12
+    assert summary['overdue_loans'] == 0
+
+
+def test_reshard_moves_records_and_keeps_loans(sharded):
+    """Test resharding 4 -> 2 -> 1 keeps every loan reachable."""
+    _borrow_for_all_patrons()
+
+    result = reshard(2)
+    assert result['shards'] == 2
+    assert not os.path.exists(shard_path(3))
+    assert sum(_raw_loan_count(shard_path(index)) for index in range(2)) == 12
+    assert all(get_patron_borrow_count(patron) == 1 for patron in PATRONS)
+
+    reshard(1)
+    assert _raw_loan_count(database.DATABASE) == 12
+    assert database.get_stored_shard_count() == 1
+    assert get_library_loan_summary()['active_loans'] == 12
+
+
+def test_create_app_rejects_mismatched_shard_count():
+    """Test that starting with a shard count different from the data on disk fails."""
+    with pytest.raises(RuntimeError, match="flask reshard"):
+        create_app({'SHARD_COUNT': 3})
+    database.configure_shards(1)
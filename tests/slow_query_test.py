@@ -0,0 +1,81 @@
+import pytest
+
+import database
+from app import create_app
+from services import slow_query_service
+from services.library_service import get_patron_status_report, search_books_in_catalog
+
+
+@pytest.fixture
+def slow_query_log():
+    log = slow_query_service.enable(0)
+    yield log
+    slow_query_service.disable()
+
+
+def test_slow_query_records_caller_params_and_plan(slow_query_log):
+    """Test that a slow statement is logged with its caller, parameter shape and plan."""
+    search_books_in_catalog("gatsby", "title")
+    summary = slow_query_service.get_slow_query_summary()
+    entry = next(item for item in summary['recent'] if 'LIKE' in item['sql'])
+
+    assert entry['caller'] == 'services.library_service.search_books_in_catalog'
+    assert entry['params_shape'] == ['str']
+    assert any('SCAN' in step for step in entry['plan'])
+
+
+def test_shard_statements_are_explained_on_their_shard(slow_query_log):
+    """Test that a borrow_records query on a shard gets that shard's plan."""
+    database.configure_shards(3)
+    database.init_database()
+    try:
+        get_patron_status_report("123456")
+        summary = slow_query_service.get_slow_query_summary()
+        shard = database.shard_path(database.shard_for_patron("123456"))
+    finally:
+        database.configure_shards(1)
+    entry = next(item for item in summary['recent'] if item['sql'].startswith('WITH loans'))
+
+    assert entry['database'] == shard
+    assert entry['plan'] and not any(step.startswith('unavailable') for step in entry['plan'])
+
+
+def test_slow_query_aggregates_repeated_statements(slow_query_log):
+    """Test that repeated statements are aggregated into one summary row."""
+    search_books_in_catalog("a", "author")
+    search_books_in_catalog("b", "author")
+    summary = slow_query_service.get_slow_query_summary()
+    statement = next(item for item in summary['statements'] if 'LOWER(author)' in item['sql'])
+
+    assert statement['count'] == 2
+    assert statement['callers'] == {'services.library_service.search_books_in_catalog': 2}
+
+
+def test_slow_query_threshold_filters_fast_statements():
+    """Test that statements under the threshold are not recorded."""
+    slow_query_service.enable(10_000)
+    try:
+        search_books_in_catalog("gatsby", "title")
+        summary = slow_query_service.get_slow_query_summary()
+    finally:
+        slow_query_service.disable()
+
+    assert summary['total_slow_queries'] == 0
+
+
+def test_slow_queries_endpoint_when_disabled():
+    """Test that the debug endpoint reports the log as disabled by default."""
+    response = create_app().test_client().get('/api/debug/slow_queries')
+
+    assert response.status_code == 200
+    assert response.get_json()['enabled'] is False
+
+
+def test_slow_queries_endpoint_configured_from_app(slow_query_log):
+    """Test that SLOW_QUERY_THRESHOLD_MS enables the log for HTTP requests."""
+    client = create_app({'SLOW_QUERY_THRESHOLD_MS': 0}).test_client()
+    client.get('/api/search?q=the&type=title')
+    data = client.get('/api/debug/slow_queries').get_json()
+
+    assert data['enabled'] is True
+    assert data['total_slow_queries'] > 0
@@ -0,0 +1,57 @@
+from app import create_app
+from database import get_db_connection, iter_query
+from services.library_service import iter_search_results, search_books_in_catalog
+
+
+def _add_books(count):
+    conn = get_db_connection()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        [(f"Streamed Title {i:05d}", f"Author {i % 7}", f"{9900000000000 + i}", 1, 1) for i in range(count)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_iter_query_fetches_in_batches():
+    """Test that iter_query yields every row as a dict and releases its connection."""
+    _add_books(25)
+    rows = list(iter_query('SELECT title FROM books ORDER BY title', batch_size=10))
+
+    assert len(rows) == 25
+    assert rows[0] == {'title': "Streamed Title 00000"}
+
+
+def test_streamed_catalog_matches_rendered_page():
+    """Test that the streamed catalog page is byte-for-byte the rendered one."""
+    _add_books(50)
+    rendered = create_app().test_client().get('/catalog')
+    streamed = create_app({'STREAM_TEMPLATES': True}).test_client().get('/catalog')
+
+    assert streamed.is_streamed
+    assert streamed.data == rendered.data
+
+
+def test_streamed_catalog_sends_head_before_last_rows():
+    """Test that the first chunk goes out before the remaining rows are rendered."""
+    _add_books(2000)
+    client = create_app({'STREAM_TEMPLATES': True, 'SEED_SAMPLE_DATA': False}).test_client()
+
+    response = client.get('/catalog', buffered=False)
+    first_chunk = next(iter(response.response)).decode()
+    response.close()
+
+    assert '<html' in first_chunk
+    assert "Streamed Title 01999" not in first_chunk
+
+
+def test_streamed_empty_catalog_and_search():
+    """Test the empty-catalog message and streamed search results."""
+    client = create_app({'STREAM_TEMPLATES': True, 'SEED_SAMPLE_DATA': False}).test_client()
+    assert b'No books in catalog' in client.get('/catalog').data
+
+    _add_books(30)
+    page = client.get('/search?q=title 0001&type=title').get_data(as_text=True)
+
+    assert page.count('Streamed Title 0001') == 10
+    assert list(iter_search_results("author 3", "author")) == search_books_in_catalog("author 3", "author")
@@ -0,0 +1,72 @@
+from app import create_app
+from database import get_book_by_isbn
+from services import suggest_index
+from services.library_service import add_book_to_catalog, borrow_book_by_patron
+from services.suggest_index import PrefixSuggester
+from tests.query_budget import count_queries
+
+
+def test_suggester_ranks_by_popularity_then_text():
+    """Test that completions are the most borrowed strings with the prefix."""
+    suggester = PrefixSuggester()
+    suggester.add("The Hobbit", 3)
+    suggester.add("The Great Gatsby", 7)
+    suggester.add("Theory of Everything", 3)
+    suggester.add("Animal Farm", 9)
+
+    assert suggester.complete("the", 2) == [("The Great Gatsby", 7), ("The Hobbit", 3)]
+    suggester.remove("The Great Gatsby", 7)
+    assert [text for text, _ in suggester.complete("THE")] == ["The Hobbit", "Theory of Everything"]
+
+
+def test_kept_top_lists_follow_weight_changes(monkeypatch):
+    """Test that long prefix slices stay exact as borrows and removals change weights."""
+    monkeypatch.setattr(suggest_index, '_SCAN_LIMIT', 2)
+    monkeypatch.setattr(suggest_index, 'TOP_K', 2)
+    suggester = PrefixSuggester()
+    for text, weight in (("Book A", 5), ("Book B", 4), ("Book C", 1)):
+        suggester.add(text, weight)
+    assert [text for text, _ in suggester.complete("book", 2)] == ["Book A", "Book B"]
+
+    suggester.bump("Book C", 10)
+    assert [text for text, _ in suggester.complete("book", 2)] == ["Book C", "Book A"]
+    suggester.remove("Book C", 11)
+    assert [text for text, _ in suggester.complete("book", 2)] == ["Book A", "Book B"]
+
+
+def test_suggest_endpoint_ranks_borrowed_titles_without_sqlite():
+    """Test that /api/suggest weights by loans and never queries the database."""
+    client = create_app({'SUGGEST_ENABLED': True}).test_client()
+    add_book_to_catalog("To Be Or Not", "Some Author", "7770000000000", 5)
+    book_id = get_book_by_isbn("7770000000000")['id']
+    borrow_book_by_patron("123456", book_id)
+    borrow_book_by_patron("654321", book_id)
+
+    with count_queries() as counter:
+        response = client.get('/api/suggest?q=to&type=title')
+
+    assert counter.statements == []
+    assert response.status_code == 200
+    assert response.get_json()['suggestions'] == [
+        {'text': "To Be Or Not", 'loans': 2},
+        {'text': "To Kill a Mockingbird", 'loans': 0},
+    ]
+
+
+def test_suggest_endpoint_authors_and_errors():
+    """Test author completions and the disabled and invalid-type responses."""
+    client = create_app({'SUGGEST_ENABLED': True}).test_client()
+
+    authors = client.get('/api/suggest?q=geo&type=author').get_json()
+    invalid = client.get('/api/suggest?q=geo&type=isbn')
+
+    assert [item['text'] for item in authors['suggestions']] == ["George Orwell"]
+    assert authors['suggestions'][0]['loans'] == 1
+    assert invalid.status_code == 400
+
+
+def test_suggest_endpoint_disabled_by_default():
+    """Test that suggestions are off unless SUGGEST_ENABLED is set."""
+    client = create_app().test_client()
+
+    assert client.get('/api/suggest?q=the').status_code == 404
@@ -26,8 +26,9 @@ def _wait_for_server(url: str, timeout: float = 15.0) -> None:
 @pytest.fixture(scope="session", autouse=True)
 def app_server():
     """Start the Flask app once for all E2E tests."""
-    if os.path.exists("library.db"):
-        os.remove("library.db")
+    for path in ("library.db", "library.db-wal", "library.db-shm"):
+        if os.path.exists(path):
+            os.remove(path)
     proc = subprocess.Popen(
         ["python", "app.py"],
         stdout=subprocess.DEVNULL,
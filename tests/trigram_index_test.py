@@ -0,0 +1,120 @@
+import json
+import pickle
+
+from database import get_all_books, get_book_by_isbn, get_db_connection
+from services import catalog_service
+from services.catalog_service import CatalogSnapshot
+from services.library_service import add_book_to_catalog, borrow_book_by_patron, search_books_in_catalog
+from services.trigram_index import TrigramIndex
+
+
+def _add_books():
+    add_book_to_catalog("The Great Gatsby", "F. Scott Fitzgerald", "5550000000000", 2)
+    add_book_to_catalog("Great Expectations", "Charles Dickens", "5550000000001", 1)
+    add_book_to_catalog("Nineteen Eighty-Four", "George Orwell", "5550000000002", 1)
+
+
+def test_index_candidates_are_intersected_posting_lists():
+    """Test that candidates contain every match and short needles are not indexed."""
+    index = TrigramIndex()
+    index.add(3, "great gatsby")
+    index.add(1, "great expectations")
+    index.add(2, "animal farm")
+
+    assert index.candidates("great") == [1, 3]
+    assert index.candidates("xyz") == []
+    assert index.candidates("gr") is None
+
+
+def test_index_reports_its_size():
+    """Test that nbytes grows with the posting lists."""
+    index = TrigramIndex()
+    empty = index.nbytes()
+    index.add(1, "great expectations")
+
+    assert index.nbytes() > empty
+
+
+def test_indexed_search_matches_scan():
+    """Test that indexed title and author search returns what the SQL scan returns."""
+    _add_books()
+    expected = {term: search_books_in_catalog(term, kind)
+                for term, kind in (("great", "title"), ("ORWELL", "author"), ("ge", "author"))}
+    catalog_service.enable(search_index=True)
+
+    for term, kind in (("great", "title"), ("ORWELL", "author"), ("ge", "author")):
+        assert search_books_in_catalog(term, kind) == expected[term]
+
+
+def test_index_follows_inserts_retitles_and_availability():
+    """Test that new books, changed titles and availability changes are searchable at once."""
+    _add_books()
+    catalog_service.enable(search_index=True)
+    add_book_to_catalog("Great Gatsby Companion", "Some Critic", "5550000000003", 1)
+    gatsby_id = get_book_by_isbn("5550000000000")['id']
+    borrow_book_by_patron("123456", gatsby_id)
+    conn = get_db_connection()
+    conn.execute("UPDATE books SET title = 'Renamed Classic' WHERE isbn = '5550000000001'")
+    conn.commit()
+    conn.close()
+
+    results = search_books_in_catalog("great", "title")
+
+    assert [book['title'] for book in results] == ["Great Gatsby Companion", "The Great Gatsby"]
+    assert results[1]['available_copies'] == 1
+    assert search_books_in_catalog("renamed", "title")[0]['isbn'] == "5550000000001"
+
+
+def test_saved_index_gives_warm_start(tmp_path):
+    """Test that a saved index is reused and books added after the save are still found."""
+    _add_books()
+    path = str(tmp_path / "search.idx")
+    catalog_service.enable(index_path=path)
+    add_book_to_catalog("Great New Release", "New Author", "5550000000004", 1)
+
+    snapshot = CatalogSnapshot()
+    assert snapshot.load_search_index(path) is True
+    snapshot.refresh()
+
+    assert [book['title'] for book in snapshot.search("great", "title")] == [
+        "Great Expectations", "Great New Release", "The Great Gatsby"
+    ]
+    assert len(snapshot.books()) == len(get_all_books())
+
+
+def test_saved_index_rejected_for_another_catalog(tmp_path):
+    """Test that an index file saved for a different database is ignored."""
+    _add_books()
+    path = str(tmp_path / "search.idx")
+    catalog_service.enable(index_path=path)
+    conn = get_db_connection()
+    conn.execute("UPDATE library_settings SET value = 'other' WHERE key = 'catalog_id'")
+    conn.commit()
+    conn.close()
+
+    assert CatalogSnapshot().load_search_index(path) is False
+
+
+_unpickled = []
+
+
+def _record_unpickle():
+    _unpickled.append(True)
+    return {}
+
+
+class _Payload:
+    def __reduce__(self):
+        return _record_unpickle, ()
+
+
+def test_saved_index_is_json_and_never_unpickled(tmp_path):
+    """Test that the index is written as JSON and a pickle at the index path is ignored, not executed."""
+    _add_books()
+    path = tmp_path / "search.idx"
+    catalog_service.enable(index_path=str(path))
+    assert json.loads(path.read_text())['indexes']['title']
+
+    path.write_bytes(pickle.dumps(_Payload()))
+    assert CatalogSnapshot().load_search_index(str(path)) is False
+    assert _unpickled == []
@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+import database
+from database import get_book_by_id, get_book_by_isbn
+from services.library_service import add_book_to_catalog, borrow_book_by_patron, return_book_by_patron
+from tests.query_budget import count_queries
+
+
+@pytest.fixture
+def write_scheduler():
+    scheduler = database.start_write_scheduler(batch_size=32, batch_window=0.02)
+    yield scheduler
+    database.stop_write_scheduler()
+
+
+def test_scheduled_borrow_and_return(write_scheduler):
+    """Test that borrow and return work unchanged through the write scheduler."""
+    add_book_to_catalog("Scheduled Book", "Writer", "6660000000000", 2)
+    book_id = get_book_by_isbn("6660000000000")['id']
+
+    borrowed, _ = borrow_book_by_patron("123456", book_id)
+    assert get_book_by_id(book_id)['available_copies'] == 1
+    returned, _ = return_book_by_patron("123456", book_id)
+
+    assert borrowed is True
+    assert returned is True
+    assert get_book_by_id(book_id)['available_copies'] == 2
+
+
+def test_concurrent_writes_are_group_committed(write_scheduler):
+    """Test that concurrent borrows share commits instead of committing one by one."""
+    add_book_to_catalog("Popular Book", "Writer", "6660000000001", 20)
+    book_id = get_book_by_isbn("6660000000001")['id']
+    patrons = [f"{200000 + i}" for i in range(10)]
+    barrier = threading.Barrier(len(patrons))
+    results = []
+
+    def borrow(patron_id):
+        barrier.wait()
+        results.append(borrow_book_by_patron(patron_id, book_id)[0])
+
+    with count_queries() as counter:
+        threads = [threading.Thread(target=borrow, args=(patron,)) for patron in patrons]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert results == [True] * len(patrons)
+    assert get_book_by_id(book_id)['available_copies'] == 10
+    # 20 write operations (record + availability per borrow) in far fewer commits
+    assert counter.commits < 10
+
+
+def test_failed_operation_does_not_abort_batch(write_scheduler):
+    """Test that a failing write is rolled back alone while the rest of its batch commits."""
+    add_book_to_catalog("Original", "Writer", "6660000000002", 1)
+    barrier = threading.Barrier(2)
+    results = {}
+
+    def insert(key, isbn):
+        barrier.wait()
+        results[key] = database.insert_book("Copy", "Writer", isbn, 1, 1)
+
+    threads = [
+        threading.Thread(target=insert, args=('duplicate', "6660000000002")),
+        threading.Thread(target=insert, args=('fresh', "6660000000003")),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {'duplicate': False, 'fresh': True}
+    assert get_book_by_isbn("6660000000003") is not None
+
+
+def test_scheduler_ignored_for_other_database(write_scheduler, tmp_path):
+    """Test that writes fall back to direct commits when DATABASE no longer matches."""
+    original = database.DATABASE
+    database.DATABASE = str(tmp_path / "other.db")
+    try:
+        database.init_database()
+        assert database.insert_book("Elsewhere", "Writer", "6660000000004", 1, 1) is True
+        assert get_book_by_isbn("6660000000004") is not None
+    finally:
+        database.DATABASE = original
+    assert get_book_by_isbn("6660000000004") is None
@@ -0,0 +1,10 @@
+"""
+WSGI entry point for production servers.
+
+Configuration comes from LIBRARY_* environment variables, for example:
+    LIBRARY_DATABASE=/data/library.db LIBRARY_FAST_START=true gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+from app import create_app
+
+app = create_app()